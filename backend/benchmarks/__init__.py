@@ -0,0 +1,5 @@
+"""
+TreasureHunt Benchmarks
+Offline performance measurements; run from the backend directory with
+`python -m benchmarks.<name>`
+"""
@@ -0,0 +1,84 @@
+"""
+Codec Benchmark - Cached search payload size and encode/decode time
+
+Usage:
+    python -m benchmarks.bench_codec [--items 20] [--iterations 2000]
+"""
+
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+from benchmarks.sample_data import make_search_results
+from services.codec import CacheCodec, SERIALIZERS, COMPRESSORS, SERIALIZER_IDS, COMPRESSOR_IDS
+
+
+def _legacy_encode(value) -> str:
+    """What CacheService.set stored before the codec: a JSON wrapper around JSON"""
+    return json.dumps({"value": json.dumps(value), "ex": 86400})
+
+
+def _legacy_decode(raw: str):
+    return json.loads(json.loads(raw)["value"])
+
+
+def _time(fn: Callable, iterations: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(items: int, iterations: int) -> Dict:
+    payload = make_search_results(items)
+    results = {}
+    
+    raw = _legacy_encode(payload)
+    results["legacy-json-wrapper"] = {
+        "bytes": len(raw.encode()),
+        "encode_us": round(_time(lambda: _legacy_encode(payload), iterations), 1),
+        "decode_us": round(_time(lambda: _legacy_decode(raw), iterations), 1),
+    }
+    
+    for serializer, serializer_id in SERIALIZER_IDS.items():
+        if serializer_id not in SERIALIZERS:
+            continue
+        for compressor, compressor_id in COMPRESSOR_IDS.items():
+            if compressor_id not in COMPRESSORS:
+                continue
+            # Threshold 0 forces the compressor; "none" keeps text form where possible
+            threshold = 0 if compressor != "none" else 1 << 30
+            codec = CacheCodec(serializer, compressor, compress_threshold=threshold)
+            encoded = codec.encode(payload)
+            assert codec.decode(encoded) == payload
+            results[f"{serializer}+{compressor}"] = {
+                "bytes": len(encoded.encode()),
+                "encode_us": round(_time(lambda: codec.encode(payload), iterations), 1),
+                "decode_us": round(_time(lambda: codec.decode(encoded), iterations), 1),
+            }
+    
+    return {"items": items, "iterations": iterations, "codecs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Print raw JSON results")
+    args = parser.parse_args()
+    
+    report = run(args.items, args.iterations)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print(f"{'codec':<22}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    for name, row in report["codecs"].items():
+        print(f"{name:<22}{row['bytes']:>10}{row['encode_us']:>12}{row['decode_us']:>12}")
+
+
+if __name__ == "__main__":
+    main()
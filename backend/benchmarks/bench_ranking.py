@@ -0,0 +1,130 @@
+"""
+Ranking Benchmark - Columnar NumPy scoring vs per-listing Python scoring
+
+Usage:
+    python -m benchmarks.bench_ranking [--sizes 20,200,2000,20000] [--k 50] [--iterations 20]
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+from benchmarks.sample_data import make_item
+from services.models import Listing, STATUS_OK
+from services.ranking import (
+    CONFIDENCE_WEIGHTS,
+    DEFAULT_WEIGHTS,
+    MAX_MARGIN,
+    ListingColumns,
+    RankingWeights,
+    rank_columns,
+    rank_listings,
+)
+
+
+def make_listings(count: int, seed: int = 7) -> List[Listing]:
+    """Analyzed and unanalyzed listings with a realistic share of repeat sellers"""
+    rng = random.Random(seed)
+    listings = []
+    for index in range(count):
+        item = make_item(index, rng)
+        item["seller"] = f"seller_{rng.randint(1, max(count // 3, 1))}"
+        item["relevance"] = round(rng.random(), 3)
+        # Deep scans analyze only the top slice; the rest stay unanalyzed
+        if rng.random() < 0.7:
+            item["reasoning"] = "Not analyzed"
+            item["analysis_status"] = "not_analyzed"
+        listings.append(Listing.from_dict(item))
+    return listings
+
+
+def python_rank(listings: List[Listing], k: int, weights: RankingWeights = DEFAULT_WEIGHTS) -> List[Listing]:
+    """The same score computed per listing in Python, then sorted"""
+    sellers = Counter(item.seller for item in listings if item.seller)
+    
+    def score(item: Listing) -> float:
+        if item.price_listed is None:
+            return -math.inf
+        price = item.price_listed
+        analysis = item.analysis if item.analysis is not None and item.analysis.status == STATUS_OK else None
+        profit = analysis.price_estimated - price if analysis else 0.0
+        margin = min(max(profit / price, -1.0), MAX_MARGIN) if price > 0 else 0.0
+        confidence = CONFIDENCE_WEIGHTS.get(analysis.confidence, 0.0) if analysis else 0.0
+        repeats = sellers[item.seller] - 1 if item.seller else 0
+        return (
+            weights.profit * profit
+            + weights.margin * margin
+            + weights.confidence * confidence
+            + weights.lot_size * math.log1p(max(item.lot_size or 0, 0))
+            + weights.seller_repeat * math.log1p(repeats)
+            + weights.price * price
+            + weights.relevance * (item.relevance or 0.0)
+        )
+    
+    return sorted(listings, key=score, reverse=True)[:k]
+
+
+def price_sort(listings: List[Listing], k: int) -> List[Listing]:
+    """The previous ranking: cheapest first"""
+    return sorted(listings, key=lambda item: item.price_listed if item.price_listed is not None else 999999)[:k]
+
+
+def _time(fn: Callable, iterations: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(sizes: List[int], k: int, iterations: int) -> Dict:
+    results = {}
+    for size in sizes:
+        listings = make_listings(size)
+        expected = [item.external_id for item in python_rank(listings, k)]
+        actual = [item.external_id for item in rank_listings(listings, k=k)]
+        assert actual == expected, "columnar ranking disagrees with the Python reference"
+        
+        # Columns kept alongside the listings (as deep scans do) skip the
+        # per-listing extraction on every re-rank
+        columns = ListingColumns(listings)
+        results[size] = {
+            "price_sort_us": round(_time(lambda: price_sort(listings, k), iterations), 1),
+            "python_score_us": round(_time(lambda: python_rank(listings, k), iterations), 1),
+            "numpy_score_us": round(_time(lambda: rank_listings(listings, k=k), iterations), 1),
+            "numpy_prebuilt_us": round(_time(lambda: rank_columns(columns, k=k), iterations), 1),
+        }
+    return {"k": k, "iterations": iterations, "sizes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="20,200,2000,20000")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print raw JSON results")
+    args = parser.parse_args()
+    
+    report = run([int(size) for size in args.sizes.split(",")], args.k, args.iterations)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print(
+        f"{'listings':>10}{'price sort us':>16}{'python score us':>18}"
+        f"{'numpy score us':>17}{'numpy prebuilt us':>20}"
+    )
+    for size, row in report["sizes"].items():
+        print(
+            f"{size:>10}{row['price_sort_us']:>16}{row['python_score_us']:>18}"
+            f"{row['numpy_score_us']:>17}{row['numpy_prebuilt_us']:>20}"
+        )
+
+
+if __name__ == "__main__":
+    main()
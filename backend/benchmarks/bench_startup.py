@@ -0,0 +1,103 @@
+"""
+Startup Benchmark - Import-time profile and cold-start-to-first-response
+
+Runs `python -X importtime -c "import main"` and lists the slowest imports
+by cumulative time, then starts serve.py (one worker, fake upstreams) a few
+times and measures how long it takes until the first request is answered.
+
+Usage:
+    python -m benchmarks.bench_startup [--top 15] [--runs 3] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.loadgen import git_commit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(top: int) -> Dict:
+    """Cumulative import time per module, slowest first"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    modules: List[Dict] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        depth = (len(line.rsplit("|", 1)[1]) - len(line.rsplit("|", 1)[1].lstrip())) // 2
+        modules.append({
+            "module": name,
+            "depth": depth,
+            "self_ms": round(int(self_us) / 1000, 1),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+        })
+    
+    total = next((m["cumulative_ms"] for m in modules if m["module"] == "main"), None)
+    slowest = sorted((m for m in modules if m["module"] != "main"), key=lambda m: -m["cumulative_ms"])
+    return {"import_main_ms": total, "slowest": slowest[:top]}
+
+
+def cold_start(port: int) -> float:
+    """Seconds from process start to the first successful response"""
+    env = {**os.environ, "CACHE_WARMER_ENABLED": "false", "FAKE_LATENCY_SCALE": "0.1"}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--app", "benchmarks.fake_app:app",
+         "--workers", "1", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client() as client:
+            while time.perf_counter() - started < 60:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    time.sleep(0.01)
+        raise RuntimeError("Server did not start within 60s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure")
+    parser.add_argument("--port", type=int, default=8150)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    profile = import_profile(args.top)
+    print(f"import main: {profile['import_main_ms']} ms")
+    for module in profile["slowest"]:
+        print(f"  {module['cumulative_ms']:8.1f} ms  {'  ' * module['depth']}{module['module']}")
+    
+    starts = [cold_start(args.port + run) for run in range(args.runs)]
+    median = statistics.median(starts)
+    print(f"cold start to first response: median {median * 1000:.0f} ms over {args.runs} runs")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                **profile,
+                "cold_start_ms": [round(s * 1000, 1) for s in starts],
+                "cold_start_median_ms": round(median * 1000, 1),
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Worker Scaling Benchmark - Requests/sec against serve.py by worker count
+
+Starts `serve.py --app benchmarks.fake_app:app` with each worker count, warms
+it up, then drives a mixed search/items load over real sockets for a fixed
+duration. Each worker has its own emulated cache, so warm-up matters more
+as the worker count grows.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--duration 15]
+        [--warmup 5] [--concurrency 64] [--latency-scale 0.1] [--output workers.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.loadgen import build_queries, git_commit, summarize, zipf_weights
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+async def drive(base_url: str, duration: float, args) -> Dict:
+    rng = random.Random(args.seed)
+    queries = build_queries(args.queries, args.seed)
+    weights = zipf_weights(len(queries), args.zipf)
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                if rng.random() < args.items_share:
+                    request = client.get("/api/items", headers={"Authorization": f"Bearer bench-{rng.randint(0, 19)}"})
+                else:
+                    request = client.get("/api/search", params={"q": rng.choices(queries, weights)[0]})
+                start = time.perf_counter()
+                try:
+                    if (await request).status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    return summarize(latencies, errors, elapsed)
+
+
+def run_one(workers: int, port: int, args) -> Dict:
+    env = {
+        **os.environ,
+        "FAKE_LATENCY_SCALE": str(args.latency_scale),
+        "CACHE_WARMER_ENABLED": "false",
+        "ACCESS_LOG": "false",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--app", "benchmarks.fake_app:app",
+         "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_ready(base_url))
+        asyncio.run(drive(base_url, args.warmup, args))
+        result = asyncio.run(drive(base_url, args.duration, args))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {"workers": workers, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=15.0, help="Measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds per run")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--items-share", type=float, default=0.2)
+    parser.add_argument("--latency-scale", type=float, default=0.1, help="Multiply fake upstream latencies")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    rows = []
+    for index, workers in enumerate(int(n) for n in args.workers.split(",")):
+        row = run_one(workers, args.port + index, args)
+        rows.append(row)
+        print(f"{workers:3d} workers: {row['throughput_rps']:8.1f} req/s  "
+              f"p50 {row['p50_ms']:7.1f} ms  p95 {row['p95_ms']:7.1f} ms  "
+              f"p99 {row['p99_ms']:7.1f} ms  errors {row['errors']}")
+    
+    base = rows[0]["throughput_rps"] or 1.0
+    for row in rows:
+        row["speedup"] = round(row["throughput_rps"] / base, 2)
+    report = {"commit": git_commit(), "cpu_count": os.cpu_count(), "runs": rows}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Fake App - The real app wired to in-process fake upstreams
+
+Import string for servers: `benchmarks.fake_app:app`. Every worker process
+gets its own fakes (including its own emulated Upstash store). Latencies are
+scaled by FAKE_LATENCY_SCALE.
+"""
+
+import os
+
+import main
+from benchmarks import fakes
+
+_profiles = fakes.default_profiles()
+for _profile in _profiles.values():
+    _profile.latency_ms *= float(os.getenv("FAKE_LATENCY_SCALE", "1.0"))
+    _profile.jitter_ms *= float(os.getenv("FAKE_LATENCY_SCALE", "1.0"))
+
+upstreams = fakes.FakeUpstreams(profiles=_profiles, seed=os.getpid())
+fakes.install(upstreams)
+
+app = main.app
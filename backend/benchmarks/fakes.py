@@ -0,0 +1,473 @@
+"""
+Fake Upstreams - In-process stand-ins for eBay, Vinted, images, Gemini, Upstash and Supabase
+
+Each upstream has a profile with latency, jitter, error rate and payload
+size. `install()` routes the shared HTTP client through a MockTransport and
+swaps the Gemini model and Supabase client for fakes, so the real app code
+runs end to end without network access.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.sample_data import TITLES
+
+
+@dataclass
+class UpstreamProfile:
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    # Listings per search page, saved items per user, or image bytes
+    payload_size: int = 10
+
+
+def default_profiles() -> Dict[str, UpstreamProfile]:
+    """Profiles roughly matching production latencies"""
+    return {
+        "ebay": UpstreamProfile(latency_ms=400, jitter_ms=150, payload_size=10),
+        "ebay_oauth": UpstreamProfile(latency_ms=250, jitter_ms=50),
+        "vinted": UpstreamProfile(latency_ms=600, jitter_ms=300, payload_size=10),
+        "images": UpstreamProfile(latency_ms=150, jitter_ms=100, payload_size=60_000),
+        "gemini": UpstreamProfile(latency_ms=2500, jitter_ms=1000),
+        "upstash": UpstreamProfile(latency_ms=8, jitter_ms=4),
+        "supabase": UpstreamProfile(latency_ms=40, jitter_ms=15, payload_size=25),
+    }
+
+
+class UpstreamError(Exception):
+    pass
+
+
+@dataclass
+class FakeUpstreams:
+    profiles: Dict[str, UpstreamProfile] = field(default_factory=default_profiles)
+    seed: int = 0
+    calls: Dict[str, int] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+        # Upstash emulation: key -> (value, expires_at or None)
+        self.store: Dict[str, tuple] = {}
+        self.supabase = FakeSupabaseService(self)
+    
+    def _delay(self, name: str) -> float:
+        profile = self.profiles[name]
+        jitter = self.rng.uniform(-profile.jitter_ms, profile.jitter_ms)
+        return max(profile.latency_ms + jitter, 0.0) / 1000
+    
+    def _should_fail(self, name: str) -> bool:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.rng.random() < self.profiles[name].error_rate:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return True
+        return False
+    
+    async def wait(self, name: str) -> None:
+        """Async upstream latency; raises UpstreamError on injected failure"""
+        failed = self._should_fail(name)
+        await asyncio.sleep(self._delay(name))
+        if failed:
+            raise UpstreamError(f"Injected {name} failure")
+    
+    def wait_blocking(self, name: str) -> None:
+        """Blocking latency, for SDKs that make synchronous calls"""
+        failed = self._should_fail(name)
+        time.sleep(self._delay(name))
+        if failed:
+            raise UpstreamError(f"Injected {name} failure")
+    
+    # -- HTTP upstreams -------------------------------------------------
+    
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """MockTransport handler dispatching on host and path"""
+        host = request.url.host
+        path = request.url.path
+        
+        if host == "api.ebay.com":
+            name = "ebay_oauth" if path.startswith("/identity") else "ebay"
+        elif host.startswith("www.vinted."):
+            name = "vinted"
+        elif host == "upstash.fake":
+            name = "upstash"
+        else:
+            name = "images"
+        
+        try:
+            await self.wait(name)
+        except UpstreamError:
+            return httpx.Response(503, json={"error": "unavailable"}, headers={"Retry-After": "1"})
+        
+        if name == "ebay_oauth":
+            return httpx.Response(200, json={"access_token": uuid.uuid4().hex, "expires_in": 7200})
+        if name == "ebay":
+            if path == "/buy/browse/v1/item/":
+                return httpx.Response(200, json=self._ebay_items(request))
+            return httpx.Response(200, json=self._ebay_search(request))
+        if name == "vinted":
+            if path.startswith("/api/v2/catalog/items"):
+                return httpx.Response(200, json=self._vinted_search(request))
+            if path.startswith("/api/v2/items/"):
+                return httpx.Response(200, json=self._vinted_item(path.rsplit("/", 1)[-1]))
+            return httpx.Response(200, headers={"Set-Cookie": "_vinted_fr_session=fake; Path=/"})
+        if name == "upstash":
+            return self._upstash(request)
+        return httpx.Response(
+            200,
+            content=self.rng.randbytes(self.profiles["images"].payload_size),
+            headers={"content-type": "image/jpeg"}
+        )
+    
+    def _listing_seed(self, request: httpx.Request) -> random.Random:
+        # Same query and page -> same listings, so repeated searches look like real ones
+        params = request.url.params
+        page = params.get("offset") or params.get("page") or ""
+        if page in ("0", "1"):
+            page = ""
+        return random.Random(str(params.get("q") or params.get("search_text")) + page)
+    
+    def _price_limit(self, request: httpx.Request) -> float:
+        params = request.url.params
+        if "price_to" in params:
+            return float(params["price_to"])
+        match = re.search(r"price:\[\.\.(\d+(?:\.\d+)?)\]", params.get("filter", ""))
+        return float(match.group(1)) if match else 100.0
+    
+    def _ebay_search(self, request: httpx.Request) -> Dict:
+        rng = self._listing_seed(request)
+        top = min(self._price_limit(request), 100.0)
+        count = self.profiles["ebay"].payload_size
+        return {
+            "total": count,
+            "itemSummaries": [
+                {
+                    "itemId": f"v1|{rng.randint(10**11, 10**12)}|0",
+                    "title": rng.choice(TITLES),
+                    "price": {"value": f"{rng.uniform(min(5, top), top):.2f}", "currency": "USD"},
+                    "image": {"imageUrl": f"https://i.ebayimg.fake/images/{rng.getrandbits(48):x}.jpg"},
+                    "itemWebUrl": f"https://www.ebay.com/itm/{rng.randint(10**11, 10**12)}",
+                    "condition": "Used",
+                    "seller": {"username": f"seller_{rng.randint(1, 5000)}"},
+                }
+                for _ in range(count)
+            ]
+        }
+    
+    def _vinted_search(self, request: httpx.Request) -> Dict:
+        rng = self._listing_seed(request)
+        top = min(self._price_limit(request), 100.0)
+        count = self.profiles["vinted"].payload_size
+        return {
+            "items": [
+                {
+                    "id": rng.randint(10**9, 10**10),
+                    "title": rng.choice(TITLES),
+                    "price": {"amount": f"{rng.uniform(min(5, top), top):.2f}", "currency_code": "USD"},
+                    "photo": {"url": f"https://images.vinted.fake/{rng.getrandbits(48):x}.jpg"},
+                    "brand_title": rng.choice(["Canon", "Nikon", "", "Sony"]),
+                    "user": {"login": f"vinted_{rng.randint(1, 5000)}"},
+                }
+                for _ in range(count)
+            ]
+        }
+    
+    def _item_rng(self, item_id: str) -> random.Random:
+        # Per-item state drifts every ten minutes of wall-clock time
+        return random.Random(f"{item_id}:{int(time.time() // 600)}")
+    
+    def _ebay_items(self, request: httpx.Request) -> Dict:
+        items = []
+        for item_id in request.url.params.get("item_ids", "").split(","):
+            rng = self._item_rng(item_id)
+            roll = rng.random()
+            if roll < 0.05:
+                # Ended listings are left out of the response
+                continue
+            items.append({
+                "itemId": item_id,
+                "price": {"value": f"{rng.uniform(5, 100):.2f}", "currency": "USD"},
+                "estimatedAvailabilities": [
+                    {"estimatedAvailabilityStatus": "OUT_OF_STOCK" if roll < 0.1 else "IN_STOCK"}
+                ],
+            })
+        return {"items": items}
+    
+    def _vinted_item(self, item_id: str) -> Dict:
+        rng = self._item_rng(item_id)
+        roll = rng.random()
+        return {
+            "item": {
+                "id": item_id,
+                "price": {"amount": f"{rng.uniform(5, 100):.2f}", "currency_code": "USD"},
+                "is_closed": roll < 0.05,
+                "is_reserved": 0.05 <= roll < 0.1,
+                "is_hidden": False,
+            }
+        }
+    
+    def _lookup(self, key: str) -> Optional[tuple]:
+        entry = self.store.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.store[key]
+            entry = None
+        return entry
+    
+    def _upstash(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/pipeline":
+            # Commands posted as a JSON array of arrays; only SET is needed
+            results = []
+            for command, *args in json.loads(request.content):
+                if command.upper() != "SET":
+                    results.append({"error": f"Unsupported command {command}"})
+                    continue
+                key, value, *options = args
+                expires = None
+                if len(options) == 2 and str(options[0]).upper() == "EX":
+                    expires = time.monotonic() + int(options[1])
+                self.store[key] = (value, expires)
+                results.append({"result": "OK"})
+            return httpx.Response(200, json=results)
+        
+        if request.url.path in ("", "/"):
+            # Command posted as a JSON array, e.g. ["MGET", "k1", "k2"]
+            command, *args = json.loads(request.content)
+            if command.upper() == "MGET":
+                values = [entry[0] if entry else None for entry in map(self._lookup, args)]
+                return httpx.Response(200, json={"result": values})
+            return httpx.Response(400, json={"error": f"Unsupported command {command}"})
+        
+        parts = request.url.path.strip("/").split("/", 1)
+        command = parts[0].lower()
+        key = parts[1] if len(parts) > 1 else ""
+        now = time.monotonic()
+        entry = self._lookup(key)
+        
+        if command == "ping":
+            return httpx.Response(200, json={"result": "PONG"})
+        if command == "get":
+            return httpx.Response(200, json={"result": entry[0] if entry else None})
+        if command == "set":
+            ex = request.url.params.get("EX")
+            self.store[key] = (request.content.decode(), now + int(ex) if ex else None)
+            return httpx.Response(200, json={"result": "OK"})
+        if command == "del":
+            existed = self.store.pop(key, None) is not None
+            return httpx.Response(200, json={"result": int(existed)})
+        if command == "ttl":
+            if not entry:
+                return httpx.Response(200, json={"result": -2})
+            ttl = -1 if entry[1] is None else int(entry[1] - now)
+            return httpx.Response(200, json={"result": ttl})
+        return httpx.Response(400, json={"error": f"Unsupported command {command}"})
+
+
+class FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel; blocks like the sync SDK call does"""
+    
+    def __init__(self, upstreams: FakeUpstreams):
+        self.upstreams = upstreams
+    
+    def _response(self) -> FakeGeminiResponse:
+        rng = self.upstreams.rng
+        return FakeGeminiResponse(json.dumps({
+            "main_item": "Canon EOS Camera Bundle with Lenses",
+            "hidden_gems": ["Canon EF 50mm f/1.8 STM Lens (Worth $125)"],
+            "estimated_breakup_value": round(rng.uniform(20, 400), 2),
+            "confidence": rng.choice(["high", "medium", "low"]),
+            "reasoning": "Fake analysis for benchmarking"
+        }))
+    
+    def generate_content(self, contents) -> FakeGeminiResponse:
+        self.upstreams.wait_blocking("gemini")
+        return self._response()
+    
+    async def generate_content_async(self, contents) -> FakeGeminiResponse:
+        await self.upstreams.wait("gemini")
+        return self._response()
+
+
+class FakeSupabaseService:
+    """Stand-in for SupabaseService with an in-memory saved_items table"""
+    
+    def __init__(self, upstreams: FakeUpstreams):
+        self.upstreams = upstreams
+        self.items: Dict[str, List[Dict]] = {}
+        self.saved_searches: List[Dict] = []
+        self.alerts: List[Dict] = []
+    
+    def _seed_user(self, user_id: str) -> List[Dict]:
+        if user_id not in self.items:
+            rng = random.Random(user_id)
+            self.items[user_id] = [
+                {
+                    "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                    "user_id": user_id,
+                    "external_id": str(rng.randint(10**9, 10**10)),
+                    "title_vague": rng.choice(TITLES),
+                    "title_real": rng.choice(TITLES),
+                    "price_listed": round(rng.uniform(5, 100), 2),
+                    "price_estimated": round(rng.uniform(20, 400), 2),
+                    "image_url": "https://images.vinted.fake/item.jpg",
+                    "market_url": "https://www.vinted.com/items/1",
+                    "marketplace": "vinted",
+                    "created_at": "2024-01-01T00:00:00+00:00",
+                }
+                for _ in range(self.upstreams.profiles["supabase"].payload_size)
+            ]
+        return self.items[user_id]
+    
+    def verify_user(self, token: str) -> Optional[str]:
+        # Auth is a synchronous SDK call in the real service
+        self.upstreams.wait_blocking("supabase")
+        return f"user-{token}" if token else None
+    
+    async def save_item(self, user_id: str, item_data: Dict) -> Dict:
+        await self.upstreams.wait("supabase")
+        record = {"id": uuid.uuid4().hex, "user_id": user_id, **item_data}
+        self._seed_user(user_id).insert(0, record)
+        return record
+    
+    async def get_user_items(self, user_id: str) -> List[Dict]:
+        await self.upstreams.wait("supabase")
+        return list(self._seed_user(user_id))
+    
+    async def delete_item(self, user_id: str, item_id: str) -> bool:
+        await self.upstreams.wait("supabase")
+        items = self._seed_user(user_id)
+        before = len(items)
+        self.items[user_id] = [item for item in items if item["id"] != item_id]
+        return len(self.items[user_id]) < before
+    
+    async def check_item_exists(self, user_id: str, external_id: str) -> bool:
+        await self.upstreams.wait("supabase")
+        return any(item["external_id"] == external_id for item in self._seed_user(user_id))
+    
+    async def claim_price_checks(self, batch_size: int, lease_seconds: int) -> List[Dict]:
+        await self.upstreams.wait("supabase")
+        now = datetime.now(timezone.utc)
+        due = [
+            item
+            for items in self.items.values()
+            for item in items
+            if item.get("availability", "available") in ("available", "reserved")
+            and datetime.fromisoformat(item.get("next_check_at") or item["created_at"]) <= now
+        ]
+        due.sort(key=lambda item: item.get("next_check_at") or item["created_at"])
+        claimed = due[:batch_size]
+        for item in claimed:
+            item["next_check_at"] = (now + timedelta(seconds=lease_seconds)).isoformat()
+        return [dict(item) for item in claimed]
+    
+    async def create_saved_search(self, user_id: str, search_data: Dict) -> Dict:
+        await self.upstreams.wait("supabase")
+        now = datetime.now(timezone.utc).isoformat()
+        record = {
+            "id": uuid.uuid4().hex, "user_id": user_id, **search_data,
+            "last_run_at": None, "next_run_at": now, "created_at": now,
+        }
+        self.saved_searches.append(record)
+        return dict(record)
+    
+    async def get_user_saved_searches(self, user_id: str) -> List[Dict]:
+        await self.upstreams.wait("supabase")
+        return [dict(search) for search in reversed(self.saved_searches) if search["user_id"] == user_id]
+    
+    async def delete_saved_search(self, user_id: str, search_id: str) -> bool:
+        await self.upstreams.wait("supabase")
+        before = len(self.saved_searches)
+        self.saved_searches = [
+            search for search in self.saved_searches
+            if not (search["id"] == search_id and search["user_id"] == user_id)
+        ]
+        self.alerts = [alert for alert in self.alerts if alert["saved_search_id"] != search_id]
+        return len(self.saved_searches) < before
+    
+    async def claim_saved_searches(self, batch_size: int, lease_seconds: int) -> List[Dict]:
+        await self.upstreams.wait("supabase")
+        now = datetime.now(timezone.utc)
+        due: Dict[str, str] = {}
+        for search in self.saved_searches:
+            if datetime.fromisoformat(search["next_run_at"]) <= now:
+                key = search["canonical_query"]
+                due[key] = min(due.get(key, search["next_run_at"]), search["next_run_at"])
+        keys = set(sorted(due, key=due.get)[:batch_size])
+        lease = (now + timedelta(seconds=lease_seconds)).isoformat()
+        claimed = [search for search in self.saved_searches if search["canonical_query"] in keys]
+        for search in claimed:
+            search["next_run_at"] = lease
+        return [dict(search) for search in claimed]
+    
+    async def reschedule_saved_searches(self, search_ids: List[str], last_run_at: str, next_run_at: str) -> None:
+        await self.upstreams.wait("supabase")
+        for search in self.saved_searches:
+            if search["id"] in search_ids:
+                search.update(last_run_at=last_run_at, next_run_at=next_run_at)
+    
+    async def insert_alerts(self, alerts: List[Dict]) -> None:
+        await self.upstreams.wait("supabase")
+        existing = {(alert["saved_search_id"], alert["external_id"]) for alert in self.alerts}
+        now = datetime.now(timezone.utc).isoformat()
+        for alert in alerts:
+            if (alert["saved_search_id"], alert["external_id"]) not in existing:
+                self.alerts.append({"id": uuid.uuid4().hex, **alert, "created_at": now})
+    
+    async def get_user_alerts(self, user_id: str, limit: int = 50) -> List[Dict]:
+        await self.upstreams.wait("supabase")
+        return [alert for alert in reversed(self.alerts) if alert["user_id"] == user_id][:limit]
+    
+    async def apply_price_checks(self, updates: List[Dict]) -> None:
+        await self.upstreams.wait("supabase")
+        by_id = {update["id"]: update for update in updates}
+        for items in self.items.values():
+            for item in items:
+                if item["id"] in by_id:
+                    item.update({key: value for key, value in by_id[item["id"]].items() if key != "id"})
+
+
+def install(upstreams: FakeUpstreams) -> None:
+    """
+    Point every service at the fakes
+    
+    Must run after the app has been imported; it patches the service
+    singletons in place.
+    """
+    from routers import items, saved_searches as saved_searches_router
+    from services import health, price_monitor, saved_items, saved_searches
+    from services.ai import ai_service
+    from services.cache import cache_service
+    from services.cache_backends import UpstashBackend
+    from services.ebay import ebay_service
+    from services.http import set_transport
+    from services.vinted import vinted_service
+    
+    set_transport(httpx.MockTransport(upstreams.handle))
+    
+    cache_service.backend = UpstashBackend("https://upstash.fake", "fake")
+    
+    ai_service.model = FakeGeminiModel(upstreams)
+    
+    items.get_supabase_client = lambda: upstreams.supabase
+    health.get_supabase_client = lambda: upstreams.supabase
+    saved_items.get_supabase_client = lambda: upstreams.supabase
+    price_monitor.get_supabase_client = lambda: upstreams.supabase
+    saved_searches.get_supabase_client = lambda: upstreams.supabase
+    saved_searches_router.get_supabase_client = lambda: upstreams.supabase
+    
+    ebay_service.token = None
+    ebay_service.token_expiry = None
+    vinted_service.session_cookie = None
@@ -0,0 +1,192 @@
+"""
+Load Generator - Drive the real app in-process against fake upstreams
+
+Sends a mixed /api/search and /api/items workload through an ASGI transport
+(no sockets) with a Zipf-skewed query pool, then reports throughput and
+latency percentiles per endpoint as JSON so runs can be compared between
+commits.
+
+Usage:
+    python -m benchmarks.loadgen [--requests 500] [--concurrency 20]
+        [--queries 50] [--zipf 1.1] [--items-share 0.2]
+        [--latency-scale 1.0] [--error-rate 0.0]
+        [--output run.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks import fakes
+
+QUERY_WORDS = ["camera", "lens", "vintage", "lot", "bundle", "lego", "pokemon", "guitar",
+               "nintendo", "watch", "vinyl", "tools", "books", "jewelry", "kitchen"]
+
+
+def build_queries(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    queries = set()
+    while len(queries) < count:
+        queries.add(" ".join(rng.sample(QUERY_WORDS, rng.randint(1, 3))))
+    return sorted(queries)
+
+
+def zipf_weights(count: int, s: float) -> List[float]:
+    return [1 / (rank ** s) for rank in range(1, count + 1)]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args) -> Dict:
+    # Import after argument parsing so --help stays fast
+    import main
+    
+    profiles = fakes.default_profiles()
+    for profile in profiles.values():
+        profile.latency_ms *= args.latency_scale
+        profile.jitter_ms *= args.latency_scale
+        profile.error_rate = args.error_rate
+    upstreams = fakes.FakeUpstreams(profiles=profiles, seed=args.seed)
+    fakes.install(upstreams)
+    
+    rng = random.Random(args.seed)
+    queries = build_queries(args.queries, args.seed)
+    weights = zipf_weights(len(queries), args.zipf)
+    tokens = [f"bench-{n}" for n in range(args.users)]
+    
+    latencies: Dict[str, List[float]] = {"search": [], "items": []}
+    errors: Dict[str, int] = {"search": 0, "items": 0}
+    remaining = args.requests
+    
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                if rng.random() < args.items_share:
+                    endpoint = "items"
+                    request = client.get(
+                        "/api/items",
+                        headers={"Authorization": f"Bearer {rng.choice(tokens)}"}
+                    )
+                else:
+                    endpoint = "search"
+                    query = rng.choices(queries, weights)[0]
+                    request = client.get("/api/search", params={"q": query, "max_price": args.max_price})
+                
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    if response.status_code >= 400:
+                        errors[endpoint] += 1
+                except Exception:
+                    errors[endpoint] += 1
+                latencies[endpoint].append(time.perf_counter() - start)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    all_latencies = latencies["search"] + latencies["items"]
+    return {
+        "commit": git_commit(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "queries": args.queries,
+            "zipf": args.zipf,
+            "items_share": args.items_share,
+            "latency_scale": args.latency_scale,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": summarize(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": {
+            name: summarize(samples, errors[name], elapsed)
+            for name, samples in latencies.items()
+        },
+        "upstream_calls": dict(sorted(upstreams.calls.items())),
+        "upstream_errors": dict(sorted(upstreams.errors.items())),
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> None:
+    """Print per-endpoint change against a previous report"""
+    print(f"\nvs {baseline.get('commit') or 'baseline'}:")
+    for name, current in {"overall": report["overall"], **report["endpoints"]}.items():
+        previous = baseline["endpoints"].get(name) if name != "overall" else baseline.get("overall")
+        if not previous:
+            continue
+        changes = []
+        for field in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            before, after = previous[field], current[field]
+            delta = (after - before) / before * 100 if before else 0.0
+            changes.append(f"{field} {before} -> {after} ({delta:+.1f}%)")
+        print(f"  {name:8s} " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50, help="Distinct search queries in the pool")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Query popularity skew")
+    parser.add_argument("--users", type=int, default=20, help="Distinct users for /api/items")
+    parser.add_argument("--items-share", type=float, default=0.2, help="Fraction of requests to /api/items")
+    parser.add_argument("--max-price", type=float, default=100)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected upstream failure rate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
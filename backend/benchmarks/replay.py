@@ -0,0 +1,195 @@
+"""
+Query Log Replay - Re-issue captured traffic against the app in-process
+
+Reads a query log written with QUERY_LOG_ENABLED=true and replays it at the
+original pacing (or scaled by --speed, 0 = back to back). Marketplace
+responses come from an upstream log recorded with
+QUERY_LOG_RECORD_UPSTREAMS=true when given, falling back to the fakes for
+anything unrecorded (and for Gemini, Upstash and Supabase, which are never
+recorded). Reports cache hit rates, how many misses could have been
+coalesced with an identical in-flight request, and latency distributions.
+
+Usage:
+    python -m benchmarks.replay query_log.jsonl [--upstreams upstream_log.jsonl]
+        [--speed 1.0] [--concurrency 0] [--latency-scale 1.0] [--output replay.json]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks import fakes
+from benchmarks.loadgen import git_commit, summarize
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class PlaybackUpstreams(fakes.FakeUpstreams):
+    """Fakes that answer recorded requests with the recorded responses"""
+    
+    def __init__(self, recordings: List[Dict], latency_scale: float, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_scale = latency_scale
+        self.recorded: Dict[str, List[Dict]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        for entry in recordings:
+            self.recorded[entry["k"]].append(entry)
+        self.played = 0
+    
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        from services.querylog import upstream_key
+        
+        key = upstream_key(request)
+        responses = self.recorded.get(key)
+        if not responses:
+            return await super().handle(request)
+        
+        # Cycle through repeated recordings of the same request in order
+        entry = responses[self._cursor[key] % len(responses)]
+        self._cursor[key] += 1
+        self.played += 1
+        name = "ebay" if request.url.host == "api.ebay.com" else "vinted"
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(entry["ms"] / 1000 * self.latency_scale)
+        return httpx.Response(entry["s"], content=base64.b64decode(entry["b"]))
+
+
+async def run(args) -> Dict:
+    import main
+    from services.cache import cache_service
+    
+    entries = sorted(load_jsonl(args.log), key=lambda entry: entry["t"])
+    if not entries:
+        raise SystemExit("Query log is empty")
+    
+    profiles = fakes.default_profiles()
+    for profile in profiles.values():
+        profile.latency_ms *= args.latency_scale
+        profile.jitter_ms *= args.latency_scale
+    if args.upstreams:
+        upstreams = PlaybackUpstreams(load_jsonl(args.upstreams), args.latency_scale, profiles=profiles)
+    else:
+        upstreams = fakes.FakeUpstreams(profiles=profiles)
+    fakes.install(upstreams)
+    
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    inflight: Dict[str, int] = defaultdict(int)
+    coalescable = 0
+    misses = 0
+    limit = asyncio.Semaphore(args.concurrency) if args.concurrency > 0 else None
+    
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        async def issue(entry: Dict, offset: float, started: float):
+            nonlocal coalescable, misses
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            if entry["e"] == "items":
+                request = client.get("/api/items", headers={"Authorization": f"Bearer replay-{entry['u']}"})
+                key = None
+            else:
+                request = client.get("/api/search", params={"q": entry["q"], "max_price": entry["p"]})
+                key = cache_service.build_search_key(entry["q"], entry["p"])
+            
+            overlapped = key is not None and inflight[key] > 0
+            if key is not None:
+                inflight[key] += 1
+            start = time.perf_counter()
+            try:
+                response = await request
+                if response.status_code >= 400:
+                    errors[entry["e"]] += 1
+                elif key is not None:
+                    outcome = "hit" if response.json()["cached"] else "miss"
+                    latencies[f"search_{outcome}"].append(time.perf_counter() - start)
+                    if outcome == "miss":
+                        misses += 1
+                        coalescable += overlapped
+            except Exception:
+                errors[entry["e"]] += 1
+            finally:
+                if key is not None:
+                    inflight[key] -= 1
+            latencies[entry["e"]].append(time.perf_counter() - start)
+        
+        async def limited(entry: Dict, offset: float, started: float):
+            if limit is None:
+                return await issue(entry, offset, started)
+            async with limit:
+                await issue(entry, offset, started)
+        
+        first = entries[0]["t"]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            limited(entry, (entry["t"] - first) / args.speed if args.speed > 0 else 0.0, started)
+            for entry in entries
+        ))
+        elapsed = time.perf_counter() - started
+    
+    searches = [entry for entry in entries if entry["e"] == "search"]
+    recorded_hits = sum(1 for entry in searches if entry.get("c") == "hit")
+    replay_hits = len(latencies["search_hit"])
+    marketplace_calls = upstreams.calls.get("ebay", 0) + upstreams.calls.get("vinted", 0)
+    return {
+        "commit": git_commit(),
+        "log": args.log,
+        "config": {
+            "speed": args.speed,
+            "concurrency": args.concurrency,
+            "latency_scale": args.latency_scale,
+            "recorded_upstreams": bool(args.upstreams),
+        },
+        "requests": len(entries),
+        "recorded_span_seconds": round(entries[-1]["t"] - first, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "cache": {
+            "recorded_hit_rate": round(recorded_hits / len(searches), 3) if searches else None,
+            "replay_hit_rate": round(replay_hits / len(searches), 3) if searches else None,
+        },
+        "coalescing": {
+            "misses": misses,
+            "coalescable_misses": coalescable,
+            "marketplace_calls": marketplace_calls,
+            # Each coalesced miss would have skipped its own marketplace fan-out
+            "marketplace_calls_saved": round(marketplace_calls * coalescable / misses) if misses else 0,
+        },
+        "endpoints": {
+            name: summarize(samples, errors.get(name, 0), elapsed)
+            for name, samples in sorted(latencies.items())
+        },
+        "upstream_calls": dict(sorted(upstreams.calls.items())),
+        "played_recordings": getattr(upstreams, "played", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="Query log (QUERY_LOG_PATH)")
+    parser.add_argument("--upstreams", help="Recorded upstream log (QUERY_LOG_UPSTREAM_PATH)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pacing multiplier; 2 = twice as fast, 0 = no pacing")
+    parser.add_argument("--concurrency", type=int, default=0, help="Max requests in flight (0 = unlimited)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply upstream latencies")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Sample Data - Realistic search payloads for benchmarks
+"""
+
+import random
+from typing import Dict, List
+
+
+TITLES = [
+    "Job lot of vintage film cameras and lenses spares repairs",
+    "Canon camera bundle with 3 lenses flash and bag",
+    "Mixed electronics box junk drawer clear out",
+    "Collection of Nikon lenses and filters estate sale",
+    "Bulk lot retro video games and consoles untested",
+    "Bundle of designer clothes size M mixed brands",
+]
+
+REASONINGS = [
+    "Identified 2 professional L-series Canon lenses in excellent condition based on "
+    "red ring markings visible in photos. These alone are worth $2,000+. Listed bundle "
+    "price represents strong profit potential after accounting for fees and shipping.",
+    "The photo shows a mix of consumer point-and-shoot cameras with one Olympus OM-1 "
+    "body that carries most of the value. Remaining items are generic filler.",
+    "Not analyzed",
+]
+
+
+def make_item(index: int, rng: random.Random) -> Dict:
+    """Build one analyzed search result shaped like the pipeline output"""
+    marketplace = rng.choice(["ebay", "vinted"])
+    external_id = f"v1|{rng.randint(10**11, 10**12)}|0" if marketplace == "ebay" else str(rng.randint(10**9, 10**10))
+    price_listed = round(rng.uniform(5, 100), 2)
+    price_estimated = round(price_listed * rng.uniform(0.5, 4), 2)
+    return {
+        "external_id": external_id,
+        "title_vague": rng.choice(TITLES),
+        "price_listed": price_listed,
+        "image_url": f"https://i.ebayimg.com/images/g/{rng.getrandbits(64):x}/s-l1600.jpg",
+        "market_url": f"https://www.ebay.com/itm/{rng.randint(10**11, 10**12)}?hash=item{rng.getrandbits(40):x}",
+        "marketplace": marketplace,
+        "condition": "Used",
+        "seller": f"seller_{rng.randint(1, 5000)}",
+        "lot_size": rng.choice([None, 3, 10, 25]),
+        "title_real": rng.choice(TITLES),
+        "hidden_gems": [
+            "Canon EF 24-70mm f/2.8L II USM Lens (Worth $1,400)",
+            "Hoya UV Filter 77mm (Worth $30)",
+        ] if index < 5 else [],
+        "price_estimated": price_estimated,
+        "profit_potential": round(price_estimated - price_listed, 2),
+        "confidence": rng.choice(["high", "medium", "low"]),
+        "reasoning": REASONINGS[min(index // 3, 2)] if index < 5 else REASONINGS[2],
+        "is_bundle": True,
+    }
+
+
+def make_search_results(count: int = 20, seed: int = 42) -> List[Dict]:
+    """Build a full result set as cached by /api/search"""
+    rng = random.Random(seed)
+    return [make_item(index, rng) for index in range(count)]
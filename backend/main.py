@@ -3,16 +3,39 @@ TreasureHunt Backend - FastAPI Application
 Main entry point for the API server
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import Optional
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
-from routers import search, items
+# Load environment before importing services, which read config at import time
+load_dotenv()
+
+from routers import search, items, deepscan, saved_searches
+from services.analysis_queue import analysis_queue
 from services.supabase import get_supabase_client
+from services.cache import cache_service
+from services.deepscan import deep_scan_service
+from services.ebay import ebay_service
+from services.health import health_checker
+from services.http import close_http_client
+from services.log import setup_logging, shutdown_logging
+from services.metrics import metrics
+from services.price_monitor import price_monitor
+from services.querylog import query_log
+from services.relevance import relevance_scorer
+from services.saved_searches import saved_search_evaluator
+from services.retry import deadline
+from services.tracing import tracer
+from services.vinted import vinted_service
+from services.warmer import cache_warmer
 
-load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="TreasureHunt API",
@@ -33,9 +56,142 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "25"))
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """
+    Trace each request and record latency and response size per route
+    
+    Stage timings go out in the Server-Timing header; slow requests are
+    sampled into the trace log. Upstream calls made while handling the
+    request, retries included, must finish within REQUEST_DEADLINE_SECONDS.
+    """
+    trace = tracer.start(request.method, request.url.path, request.headers.get("x-request-id"))
+    with deadline(REQUEST_DEADLINE_SECONDS):
+        response = await call_next(request)
+    
+    route = request.scope.get("route")
+    path = route.path if route else "unmatched"
+    metrics.request_latency.observe(trace.elapsed(), route=path)
+    
+    content_length = response.headers.get("content-length")
+    if content_length:
+        metrics.response_size.observe(int(content_length), route=path)
+    
+    response.headers["X-Request-ID"] = trace.request_id
+    if tracer.server_timing:
+        response.headers["Server-Timing"] = trace.server_timing()
+    if tracer.should_log(trace):
+        await asyncio.to_thread(tracer.write, trace)
+    
+    return response
+
+
 # Include routers
 app.include_router(search.router, prefix="/api", tags=["Search"])
 app.include_router(items.router, prefix="/api", tags=["Items"])
+app.include_router(deepscan.router, prefix="/api", tags=["Deep Scan"])
+app.include_router(saved_searches.router, prefix="/api", tags=["Saved Searches"])
+
+
+PREWARM_TIMEOUT = 10.0
+
+
+async def prewarm_upstreams() -> None:
+    """
+    Fetch upstream credentials and open pooled connections
+    
+    Runs before the worker accepts traffic so the first searches don't pay
+    for the eBay OAuth exchange, the Vinted session or TLS handshakes.
+    """
+    names = ["ebay", "vinted", "cache"]
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                ebay_service.get_oauth_token(),
+                vinted_service.warm_up(),
+                cache_service.ping(),
+                return_exceptions=True
+            ),
+            timeout=PREWARM_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Pre-warm timed out; continuing startup")
+        return
+    
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.warning("Pre-warm %s failed: %s", name, result)
+
+
+# Held for the life of the process by the worker that runs the singleton loops
+_background_lock = None
+
+
+def claim_background_role() -> bool:
+    """
+    Whether this process runs the singleton background loops
+    
+    serve.py starts several workers; the cache warmer, price monitor and
+    saved-search evaluator must run in only one of them or they repeat the
+    same work and spend the upstream budgets several times over. The first
+    worker to lock BACKGROUND_LOCK_FILE runs them. The lock is released when
+    that process exits, so its replacement takes over.
+    """
+    global _background_lock
+    if _background_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): serve.py's multi-worker mode isn't used there
+        return True
+    
+    lock_file = open(os.getenv("BACKGROUND_LOCK_FILE", "/tmp/treasurehunt-background.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _background_lock = lock_file
+    return True
+
+
+@app.on_event("startup")
+async def startup():
+    """Pre-warm upstreams and start background workers"""
+    query_log.start()
+    cache_service.start_writer()
+    if os.getenv("PREWARM_ON_STARTUP", "true").lower() == "true":
+        await prewarm_upstreams()
+    # Fed by this process's own requests, so every worker runs these
+    analysis_queue.start()
+    deep_scan_service.start()
+    relevance_scorer.start()
+    if claim_background_role():
+        cache_warmer.start()
+        price_monitor.start()
+        saved_search_evaluator.start()
+    else:
+        logger.info("Background loops run in another worker")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background workers and close upstream connections"""
+    await cache_warmer.stop()
+    await analysis_queue.stop()
+    await deep_scan_service.stop()
+    await price_monitor.stop()
+    await saved_search_evaluator.stop()
+    await relevance_scorer.stop()
+    await query_log.stop()
+    # Flush queued cache writes while the HTTP client is still open
+    await cache_service.close()
+    await close_http_client()
+    shutdown_logging()
 
 
 @app.get("/")
@@ -50,12 +206,14 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "cache": "connected"
-    }
+    """Detailed health check with cached dependency probes"""
+    return await health_checker.check()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 # Authentication dependency
@@ -84,6 +242,7 @@ async def verify_token(authorization: Optional[str] = Header(None)):
 
 
 if __name__ == "__main__":
+    # Development server; use serve.py in production
     import uvicorn
     uvicorn.run(
         "main:app",
@@ -0,0 +1,123 @@
+"""
+Deep Scan Router - Submit, poll, stream and cancel long-running searches
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import AsyncIterator, Dict, Set
+import asyncio
+import os
+import time
+
+import orjson
+
+from services.deepscan import deep_scan_service, DeepScanUnavailable, TERMINAL_STATUSES
+from services.models import STATUS_NOT_ANALYZED
+
+router = APIRouter()
+
+# How often the event stream checks a job for progress
+STREAM_INTERVAL = float(os.getenv("DEEP_SCAN_STREAM_INTERVAL_SECONDS", "1"))
+# Comment lines keep idle proxies from closing the stream
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+class DeepScanRequest(BaseModel):
+    """Request model for starting a deep scan"""
+    q: str
+    max_price: int = 100
+    pages: int = 5
+    max_analyzed: int = 20
+
+
+@router.post("/deep-scans", status_code=202, response_class=ORJSONResponse)
+async def submit_deep_scan(request: DeepScanRequest) -> Dict:
+    """
+    Start a deep scan across several marketplace pages
+    
+    Returns immediately with the job ID; poll GET /deep-scans/{id} or
+    stream GET /deep-scans/{id}/events for progress and partial results.
+    """
+    try:
+        job = await deep_scan_service.submit(request.q, request.max_price, request.pages, request.max_analyzed)
+    except DeepScanUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    return {"id": job["id"], "status": job["status"], "progress": job["progress"]}
+
+
+@router.get("/deep-scans/{job_id}", response_class=ORJSONResponse)
+async def get_deep_scan(job_id: str) -> Dict:
+    """Get a deep scan's status, progress and results so far"""
+    job = await deep_scan_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Deep scan not found")
+    return job
+
+
+@router.delete("/deep-scans/{job_id}", response_class=ORJSONResponse)
+async def cancel_deep_scan(job_id: str) -> Dict:
+    """
+    Cancel a deep scan
+    
+    Results gathered before cancellation stay available until the job expires.
+    """
+    job = await deep_scan_service.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Deep scan not found")
+    
+    status = job["status"] if job["status"] in TERMINAL_STATUSES else "cancelling"
+    return {"id": job_id, "status": status}
+
+
+@router.get("/deep-scans/{job_id}/events")
+async def stream_deep_scan(job_id: str) -> StreamingResponse:
+    """
+    Stream a deep scan's progress as server-sent events
+    
+    Each "progress" event carries the job status and counters plus the
+    listings analyzed since the previous event. The stream ends with the
+    job; reconnecting clients get everything analyzed so far in their
+    first event.
+    """
+    if await deep_scan_service.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Deep scan not found")
+    
+    return StreamingResponse(
+        _progress_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _progress_events(job_id: str) -> AsyncIterator[bytes]:
+    sent_ids: Set[str] = set()
+    last_update = None
+    last_write = time.monotonic()
+    
+    while True:
+        job = await deep_scan_service.get(job_id)
+        if job is None:
+            yield b"event: expired\ndata: {}\n\n"
+            return
+        
+        if job["updated_at"] != last_update:
+            last_update = job["updated_at"]
+            new_results = [
+                item for item in job["results"]
+                if item.get("analysis_status") != STATUS_NOT_ANALYZED and item.get("external_id") not in sent_ids
+            ]
+            sent_ids.update(item.get("external_id") for item in new_results)
+            
+            event = {key: value for key, value in job.items() if key != "results"}
+            event["new_results"] = new_results
+            yield b"event: progress\ndata: " + orjson.dumps(event) + b"\n\n"
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= STREAM_KEEPALIVE_SECONDS:
+            yield b": keepalive\n\n"
+            last_write = time.monotonic()
+        
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(STREAM_INTERVAL)
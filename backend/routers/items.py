@@ -2,13 +2,17 @@
 Items Router - Handle saved items operations
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from typing import List, Dict, Optional
 from pydantic import BaseModel
+import logging
 
+from services.querylog import query_log
+from services.saved_items import saved_items_cache
 from services.supabase import get_supabase_client
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 class SaveItemRequest(BaseModel):
@@ -28,6 +32,18 @@ class DeleteItemRequest(BaseModel):
     item_id: str
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers the current ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
 async def get_current_user(authorization: Optional[str] = Header(None)) -> str:
     """
     Dependency to extract and verify user from JWT token
@@ -80,6 +96,7 @@ async def save_item(
             user_id=user_id,
             item_data=item.dict()
         )
+        await saved_items_cache.invalidate(user_id)
         
         return {
             "success": True,
@@ -90,23 +107,33 @@ async def save_item(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Save item error: {str(e)}")
+        logger.exception("Save item error")
         raise HTTPException(status_code=500, detail=f"Failed to save item: {str(e)}")
 
 
 @router.get("/items")
 async def get_saved_items(
-    user_id: str = Depends(get_current_user)
-) -> Dict:
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Get all saved items for authenticated user
     
-    Returns items sorted by creation date (newest first)
+    Returns items sorted by creation date (newest first). Served from the
+    saved-items cache; a matching If-None-Match gets 304 Not Modified.
     """
+    query_log.record_items(user_id)
+    
     try:
-        supabase = get_supabase_client()
-        items = await supabase.get_user_items(user_id)
+        saved = await saved_items_cache.get(user_id)
+        etag = f'"{saved["version"]}"'
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
         
+        items = saved["items"]
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
         return {
             "success": True,
             "count": len(items),
@@ -114,7 +141,7 @@ async def get_saved_items(
         }
     
     except Exception as e:
-        print(f"Get items error: {str(e)}")
+        logger.exception("Get items error")
         raise HTTPException(status_code=500, detail=f"Failed to fetch items: {str(e)}")
 
 
@@ -137,6 +164,7 @@ async def delete_item(
                 status_code=404,
                 detail="Item not found or already deleted"
             )
+        await saved_items_cache.invalidate(user_id)
         
         return {
             "success": True,
@@ -146,29 +174,37 @@ async def delete_item(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Delete item error: {str(e)}")
+        logger.exception("Delete item error")
         raise HTTPException(status_code=500, detail=f"Failed to delete item: {str(e)}")
 
 
 @router.get("/items/check/{external_id}")
 async def check_item_saved(
     external_id: str,
-    user_id: str = Depends(get_current_user)
-) -> Dict:
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Check if an item is already saved by user
     
-    Useful for UI to show "saved" state
+    Useful for UI to show "saved" state. Answered from the saved-items
+    cache and shares its ETag, so it revalidates together with GET /items.
     """
     try:
-        supabase = get_supabase_client()
-        exists = await supabase.check_item_exists(user_id, external_id)
+        saved = await saved_items_cache.get(user_id)
+        etag = f'"{saved["version"]}"'
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
         
+        exists = external_id in saved["ids"]
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
         return {
             "external_id": external_id,
             "is_saved": exists
         }
     
     except Exception as e:
-        print(f"Check item error: {str(e)}")
+        logger.exception("Check item error")
         raise HTTPException(status_code=500, detail=f"Failed to check item: {str(e)}")
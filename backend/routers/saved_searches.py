@@ -0,0 +1,148 @@
+"""
+Saved Searches Router - Manage saved searches and read their alerts
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Dict
+from pydantic import BaseModel
+import logging
+import os
+
+from routers.items import get_current_user
+from services.querykey import canonical_query
+from services.supabase import get_supabase_client
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_SAVED_SEARCHES = int(os.getenv("SAVED_SEARCH_MAX_PER_USER", "20"))
+
+
+class SavedSearchRequest(BaseModel):
+    """Request model for saving a search"""
+    query: str
+    max_price: int = 100
+    # Only listings at least this far below their estimated value alert
+    min_profit: float = 0.0
+
+
+@router.post("/saved-searches")
+async def create_saved_search(
+    search: SavedSearchRequest,
+    user_id: str = Depends(get_current_user)
+) -> Dict:
+    """
+    Save a search to be re-run in the background
+    
+    New listings that fit max_price and min_profit show up in GET /alerts.
+    """
+    canonical = canonical_query(search.query)
+    if not canonical:
+        raise HTTPException(status_code=422, detail="Query has no searchable words")
+    
+    try:
+        supabase = get_supabase_client()
+        
+        existing = await supabase.get_user_saved_searches(user_id)
+        if len(existing) >= MAX_SAVED_SEARCHES:
+            raise HTTPException(
+                status_code=409,
+                detail=f"At most {MAX_SAVED_SEARCHES} saved searches allowed"
+            )
+        if any(
+            row["canonical_query"] == canonical and row["max_price"] == search.max_price
+            and float(row.get("min_profit") or 0) == search.min_profit
+            for row in existing
+        ):
+            raise HTTPException(status_code=409, detail="Search already saved")
+        
+        saved_search = await supabase.create_saved_search(
+            user_id=user_id,
+            search_data={
+                "query": search.query,
+                "canonical_query": canonical,
+                "max_price": search.max_price,
+                "min_profit": search.min_profit,
+            }
+        )
+        
+        return {
+            "success": True,
+            "message": "Search saved successfully",
+            "saved_search": saved_search
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Save search error")
+        raise HTTPException(status_code=500, detail=f"Failed to save search: {str(e)}")
+
+
+@router.get("/saved-searches")
+async def get_saved_searches(
+    user_id: str = Depends(get_current_user)
+) -> Dict:
+    """Get all saved searches for authenticated user (newest first)"""
+    try:
+        supabase = get_supabase_client()
+        searches = await supabase.get_user_saved_searches(user_id)
+        
+        return {
+            "success": True,
+            "count": len(searches),
+            "saved_searches": searches
+        }
+    
+    except Exception as e:
+        logger.exception("Get saved searches error")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch saved searches: {str(e)}")
+
+
+@router.delete("/saved-searches/{search_id}")
+async def delete_saved_search(
+    search_id: str,
+    user_id: str = Depends(get_current_user)
+) -> Dict:
+    """Delete a saved search and its alerts"""
+    try:
+        supabase = get_supabase_client()
+        success = await supabase.delete_saved_search(user_id, search_id)
+        
+        if not success:
+            raise HTTPException(
+                status_code=404,
+                detail="Saved search not found or already deleted"
+            )
+        
+        return {
+            "success": True,
+            "message": "Saved search deleted successfully"
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Delete saved search error")
+        raise HTTPException(status_code=500, detail=f"Failed to delete saved search: {str(e)}")
+
+
+@router.get("/alerts")
+async def get_alerts(
+    limit: int = Query(50, ge=1, le=200, description="Maximum alerts to return"),
+    user_id: str = Depends(get_current_user)
+) -> Dict:
+    """Get new listings found by the user's saved searches (newest first)"""
+    try:
+        supabase = get_supabase_client()
+        alerts = await supabase.get_user_alerts(user_id, limit)
+        
+        return {
+            "success": True,
+            "count": len(alerts),
+            "alerts": alerts
+        }
+    
+    except Exception as e:
+        logger.exception("Get alerts error")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch alerts: {str(e)}")
@@ -3,191 +3,176 @@ Search Router - Handle search requests with caching
 """
 
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Dict
-import asyncio
+from fastapi.responses import ORJSONResponse
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
 
-from services.ebay import ebay_service
-from services.vinted import vinted_service
-from services.ai import ai_service
+from services.admission import search_admission, AdmissionRejected
+from services.analysis_queue import analysis_queue
 from services.cache import cache_service
+from services.metrics import metrics
+from services.models import Listing, STATUS_FAILED
+from services.pipeline import run_search, refresh_search, retry_failed, SearchResult
+from services.popularity import popularity_tracker
+from services.querykey import price_bucket, higher_buckets
+from services.querylog import query_log
+from services.tracing import span
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
+# Higher price buckets checked on a miss; their results are filtered down locally
+SUPERSET_LOOKUPS = int(os.getenv("SEARCH_SUPERSET_LOOKUPS", "2"))
+# A superset is only used if it still has this many results after filtering
+# (or all of its results, if it has fewer)
+SUPERSET_MIN_RESULTS = int(os.getenv("SEARCH_SUPERSET_MIN_RESULTS", "5"))
 
-@router.get("/search")
+
+@router.get("/search", response_class=ORJSONResponse)
 async def search_items(
     q: str = Query(..., description="Search query"),
-    max_price: int = Query(100, description="Maximum price filter")
-) -> Dict:
+    max_price: int = Query(100, description="Maximum price filter"),
+    refresh: bool = Query(False, description="Fetch listings posted since the cached results")
+) -> ORJSONResponse:
     """
     Search for undervalued items using eBay, Vinted, and AI analysis
     
     Flow:
-    1. Check cache for existing results
+    1. Check cache for existing results (optionally refreshing them incrementally);
+       queries are canonicalized and max_price rounded up to a price bucket,
+       and a cached higher bucket can answer by filtering locally
     2. If cache miss, search eBay AND Vinted in parallel
     3. Merge and sort results by potential profit
     4. Analyze top items with AI
-    5. Cache results for 24 hours
+    5. Cache results for 24 hours (briefly for empty or degraded results)
     6. Return merged data
+    
+    Cache misses and refreshes are admission-controlled: past
+    SEARCH_MAX_CONCURRENT_MISSES they wait briefly for a slot and are then
+    shed with 503 and Retry-After, while cache hits are always served.
+    
+    Bundles beyond the top few are analyzed in the background and written
+    into the cached results, so repeat searches see progressively more
+    analyses. Cached results with failed analyses have those bundles
+    re-analyzed on the next hit; good analyses are reused.
     """
     try:
-        # 1. Check cache (TEMPORARILY DISABLED FOR TESTING)
-        cache_key = cache_service.build_search_key(q, max_price)
-        cached_result = None  # await cache_service.get(cache_key)
-        
-        if cached_result:
-            return {
-                "query": q,
-                "max_price": max_price,
-                "cached": True,
-                "results": cached_result
-            }
-        
-        # 2. BUNDLE BREAKER: Inject bundle keywords into search query
-        bundle_keywords = "(job lot OR bundle OR lot OR estate OR collection OR junk drawer OR spares repairs OR bulk OR mixed)"
-        enhanced_query = f"{q} {bundle_keywords}"
-        
-        print(f"[BUNDLE BREAKER] Original query: '{q}' -> Enhanced: '{enhanced_query}'")
-        
-        # 3. Search both marketplaces in parallel with BUNDLE query
-        ebay_task = ebay_service.search_items(query=enhanced_query, max_price=max_price, limit=10)
-        vinted_task = vinted_service.search_items(query=enhanced_query, max_price=max_price, limit=10)
-        
-        ebay_items, vinted_items = await asyncio.gather(ebay_task, vinted_task, return_exceptions=True)
-        
-        # Handle errors from marketplace searches
-        if isinstance(ebay_items, Exception):
-            print(f"eBay search failed: {ebay_items}")
-            ebay_items = []
-        if isinstance(vinted_items, Exception):
-            print(f"Vinted search failed: {vinted_items}")
-            vinted_items = []
-        
-        # Combine results from both marketplaces
-        all_items = (ebay_items or []) + (vinted_items or [])
-        
-        if not all_items:
-            return {
-                "query": q,
-                "max_price": max_price,
-                "cached": False,
-                "results": []
-            }
-        
-        # Sort by price (lowest first for best bundle deals)
-        all_items.sort(key=lambda x: x.get("price_listed", 999999))
-        
-        # 4. BUNDLE BREAKER: AI Analysis on top 5 bundles with images
-        analyzed_items = []
-        
-        # Create analysis tasks for bundles with images
-        analysis_tasks = []
-        for item in all_items[:5]:
-            if item.get("image_url"):
-                task = analyze_bundle_async(item, q)
-                analysis_tasks.append(task)
-            else:
-                # Skip bundles without images
-                analyzed_items.append({
-                    **item,
-                    "title_real": item["title_vague"],
-                    "hidden_gems": [],
-                    "price_estimated": 0.0,
-                    "profit_potential": 0.0,
-                    "confidence": "low",
-                    "reasoning": "No image available for bundle analysis",
-                    "is_bundle": True
-                })
-        
-        # Run AI bundle analysis in parallel
-        if analysis_tasks:
-            analyzed_results = await asyncio.gather(*analysis_tasks, return_exceptions=True)
+        # 1. Check cache
+        bucket = price_bucket(max_price)
+        cache_key = cache_service.build_search_key(q, bucket)
+        popularity_tracker.record(cache_key, q, bucket)
+        with span("cache_lookup"):
+            cached_key, cached_result = await _lookup_cached(q, bucket)
+        # An empty list is a cached "no matches", not a miss
+        is_hit = cached_result is not None
+        if not is_hit:
+            metrics.cache_requests.inc(tier="search", result="miss")
+        else:
+            metrics.cache_requests.inc(tier="search", result="hit" if cached_key == cache_key else "superset_hit")
+        
+        if is_hit and refresh:
+            query_log.record_search(q, max_price, "refresh")
+            # Incremental refresh: only new listings are fetched and analyzed
+            cached_items = [Listing.from_dict(item) for item in _within_price(cached_result, bucket)]
+            # The refreshed entry expires with the one it was built from
+            expires_in = await cache_service.ttl(cached_key)
+            async with search_admission.slot():
+                search_result = await refresh_search(q, bucket, cached_items, expires_in)
+                results = await _cache_results(cache_key, q, search_result)
+            return _search_response(q, max_price, False, results)
+        
+        if is_hit:
+            query_log.record_search(q, max_price, "hit")
+            # Retries only run when a miss slot is free; hits never wait
+            if any(item.get("analysis_status") == STATUS_FAILED for item in cached_result) \
+                    and await search_admission.try_acquire():
+                try:
+                    listings = [Listing.from_dict(item) for item in cached_result]
+                    if await retry_failed(listings, q):
+                        expires_in = await cache_service.ttl(cached_key)
+                        cached_result = await _cache_results(
+                            cached_key, q, SearchResult(listings, expires_in=expires_in)
+                        )
+                finally:
+                    search_admission.release()
+            # Picks up background analyses lost to a restart or a full queue
+            analysis_queue.submit_cached(cached_key, q, cached_result)
+            # Cached dicts go straight back out without being rebuilt
+            return _search_response(q, max_price, True, cached_result)
+        
+        query_log.record_search(q, max_price, "miss")
+        
+        # 2-4. Search marketplaces and analyze bundles (at the bucket ceiling)
+        async with search_admission.slot():
+            search_result = await run_search(q, bucket)
             
-            for result in analyzed_results:
-                if isinstance(result, Exception):
-                    print(f"Bundle analysis error: {result}")
-                elif result:
-                    analyzed_items.append(result)
-        
-        # Add remaining bundles without AI analysis
-        for item in all_items[len(analyzed_items):]:
-            analyzed_items.append({
-                **item,
-                "title_real": item["title_vague"],
-                "hidden_gems": [],
-                "price_estimated": 0.0,
-                "profit_potential": 0.0,
-                "confidence": "low",
-                "reasoning": "Not analyzed",
-                "is_bundle": True
-            })
+            # 5. Cache results
+            results = await _cache_results(cache_key, q, search_result)
         
-        # 4. Cache results
-        await cache_service.set(cache_key, analyzed_items, ttl=86400)
-        
-        # 5. Return results
-        return {
-            "query": q,
-            "max_price": max_price,
-            "cached": False,
-            "results": analyzed_items
-        }
+        # 6. Return results
+        return _search_response(q, max_price, False, results)
     
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Search is busy, try again shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
-        print(f"Search error: {str(e)}")
+        logger.exception("Search error")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
-async def analyze_bundle_async(item: Dict, original_query: str) -> Dict:
+async def _lookup_cached(q: str, bucket: int) -> Tuple[str, Optional[List[Dict]]]:
     """
-    BUNDLE BREAKER: Analyze a bundle/job lot with AI to find hidden gems
-    
-    Args:
-        item: Bundle item data from marketplace
-        original_query: Original search query (e.g., "Camera")
+    Find cached results for a query's bucket or a usable higher bucket
     
     Returns:
-        Bundle with AI analysis including hidden gems and breakup value
+        The key the results came from and the results (None on a miss)
     """
-    try:
-        # Get AI bundle analysis
-        image_urls = [item["image_url"]] if item.get("image_url") else []
-        
-        analysis = await ai_service.analyze_bundle(
-            image_urls=image_urls,
-            bundle_title=item["title_vague"],
-            listed_price=item.get("price_listed", 0),
-            search_category=original_query
-        )
-        
-        # Calculate profit potential (breakup value vs listing price)
-        price_listed = item.get("price_listed", 0) or 0
-        price_estimated = analysis.get("estimated_breakup_value", 0) or 0
-        profit_potential = price_estimated - price_listed
-        
-        # Merge item and bundle analysis
-        return {
-            **item,
-            "title_real": analysis.get("main_item", item["title_vague"]),
-            "hidden_gems": analysis.get("hidden_gems", []),
-            "price_estimated": round(price_estimated, 2),
-            "profit_potential": round(profit_potential, 2),
-            "confidence": analysis.get("confidence", "low"),
-            "reasoning": analysis.get("reasoning", ""),
-            "lot_size": item.get("lot_size"),
-            "is_bundle": True
-        }
+    keys = [cache_service.build_search_key(q, value) for value in [bucket] + higher_buckets(bucket, SUPERSET_LOOKUPS)]
+    if len(keys) == 1:
+        return keys[0], await cache_service.get(keys[0])
     
-    except Exception as e:
-        print(f"Bundle analysis error: {str(e)}")
-        # Return bundle with no analysis on error
-        return {
-            **item,
-            "title_real": item["title_vague"],
-            "hidden_gems": [],
-            "price_estimated": 0.0,
-            "profit_potential": 0.0,
-            "confidence": "low",
-            "reasoning": f"Bundle analysis failed: {str(e)}",
-            "is_bundle": True
-        }
+    values = await cache_service.get_many(keys)
+    if values[0] is not None:
+        return keys[0], values[0]
+    
+    for key, value in zip(keys[1:], values[1:]):
+        if value is None:
+            continue
+        # Nothing under a higher limit means nothing under a lower one either
+        if not value or len(_within_price(value, bucket)) >= min(SUPERSET_MIN_RESULTS, len(value)):
+            return key, value
+    
+    return keys[0], None
+
+
+def _within_price(results: List[Dict], max_price: int) -> List[Dict]:
+    """Drop listings above max_price (results may come from a higher bucket)"""
+    return [item for item in results if (item.get("price_listed") or 0) <= max_price]
+
+
+async def _cache_results(cache_key: str, q: str, search_result: SearchResult) -> List[Dict]:
+    """
+    Serialize results and queue them for caching as long as their quality allows
+    
+    The write happens in the background, off the response path. Pending
+    bundles are queued for background analysis into the same entry.
+    """
+    results = [listing.to_dict() for listing in search_result.listings]
+    ttl = search_result.cache_ttl
+    if ttl and cache_service.set_background(cache_key, results, ttl=ttl):
+        analysis_queue.submit(cache_key, q, search_result.pending)
+    return results
+
+
+def _search_response(q: str, max_price: int, cached: bool, results: List[Dict]) -> ORJSONResponse:
+    """Serialize search results directly, skipping FastAPI's generic encoder"""
+    return ORJSONResponse({
+        "query": q,
+        "max_price": max_price,
+        "cached": cached,
+        "results": _within_price(results, max_price)
+    })
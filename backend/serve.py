@@ -0,0 +1,71 @@
+"""
+TreasureHunt Backend - Production server
+Multi-worker uvicorn launcher with uvloop/httptools and tuned connection handling
+
+Usage:
+    python serve.py [--workers N] [--port 8000] [--app main:app]
+
+Each worker pre-warms upstream credentials and connection pools during
+startup, before it begins accepting connections. On SIGTERM workers stop
+accepting, finish in-flight requests (up to GRACEFUL_TIMEOUT_SECONDS) and
+then run shutdown hooks, which flush the query log and close the pools.
+
+Workers are separate processes, so upstream rate budgets are divided by the
+worker count (passed down as SERVE_WORKERS) and the singleton background
+loops (cache warmer, price monitor, saved-search alerts) run in only one
+worker, elected through a lock file (BACKGROUND_LOCK_FILE).
+"""
+
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+
+def default_workers() -> int:
+    """One worker per core; the app is async, so more would just contend"""
+    return int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+
+def build_config(args) -> dict:
+    # uvicorn[standard] ships both; fall back rather than crash if a slim
+    # install is missing them
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    if loop != "uvloop" or http != "httptools":
+        print(f"Running with loop={loop} http={http}; install uvicorn[standard] for uvloop/httptools")
+    
+    return {
+        "host": args.host,
+        "port": args.port,
+        "workers": args.workers,
+        "loop": loop,
+        "http": http,
+        # Outlive the load balancer's idle timeout (60s on most) so it never
+        # sends on a connection we are closing
+        "timeout_keep_alive": int(os.getenv("KEEPALIVE_TIMEOUT_SECONDS", "75")),
+        "backlog": int(os.getenv("LISTEN_BACKLOG", "2048")),
+        "timeout_graceful_shutdown": int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30")),
+        "access_log": os.getenv("ACCESS_LOG", "false").lower() == "true",
+        "proxy_headers": True,
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "lifespan": "on",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with production settings")
+    parser.add_argument("--app", default="main:app", help="ASGI app import string")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    args = parser.parse_args()
+    
+    # Inherited by the worker processes; see services/ratelimit.py
+    os.environ["SERVE_WORKERS"] = str(max(args.workers, 1))
+    uvicorn.run(args.app, **build_config(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Admission Service - Concurrency limits for expensive requests
+Caps concurrent cache-miss searches per worker, queues briefly and sheds the excess
+"""
+
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from services.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; retry_after is a suggested wait in seconds"""
+    
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semaphore with a bounded wait queue
+    
+    Up to `limit` requests run at once. Up to `max_waiting` more wait at most
+    `max_wait` seconds for a slot; anything beyond that is rejected
+    immediately, so a spike queues for seconds instead of piling up behind
+    Gemini until every request times out.
+    """
+    
+    def __init__(self, name: str, limit: int, max_waiting: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.inflight = 0
+        self.waiting = 0
+        # Smoothed time a request holds its slot, for Retry-After estimates
+        self.avg_service_time = 5.0
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        return max(1, math.ceil(self.avg_service_time * (self.waiting + 1) / self.limit))
+    
+    async def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now; pair with release()"""
+        if self._semaphore.locked():
+            metrics.admission_decisions.inc(pool=self.name, outcome="skipped")
+            return False
+        # Acquiring a free semaphore never waits
+        await self._semaphore.acquire()
+        metrics.admission_decisions.inc(pool=self.name, outcome="admitted")
+        self.inflight += 1
+        metrics.admission_inflight.set(self.inflight, pool=self.name)
+        return True
+    
+    def release(self) -> None:
+        self.inflight -= 1
+        metrics.admission_inflight.set(self.inflight, pool=self.name)
+        self._semaphore.release()
+    
+    async def acquire(self) -> None:
+        """
+        Wait for a slot
+        
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait times out
+        """
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            metrics.admission_decisions.inc(pool=self.name, outcome="admitted")
+        else:
+            if self.waiting >= self.max_waiting:
+                metrics.admission_decisions.inc(pool=self.name, outcome="rejected_queue_full")
+                raise AdmissionRejected(f"{self.name}: too many requests waiting", self.retry_after())
+            
+            self.waiting += 1
+            metrics.admission_waiting.set(self.waiting, pool=self.name)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                metrics.admission_decisions.inc(pool=self.name, outcome="rejected_timeout")
+                raise AdmissionRejected(f"{self.name}: timed out waiting for capacity", self.retry_after())
+            finally:
+                self.waiting -= 1
+                metrics.admission_waiting.set(self.waiting, pool=self.name)
+                metrics.admission_wait.observe(time.perf_counter() - start, pool=self.name)
+            metrics.admission_decisions.inc(pool=self.name, outcome="admitted_after_wait")
+        
+        self.inflight += 1
+        metrics.admission_inflight.set(self.inflight, pool=self.name)
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block (see acquire())"""
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * (time.perf_counter() - start)
+            self.release()
+
+
+# Cache-miss searches: each runs two marketplace calls and up to five Gemini calls
+search_admission = AdmissionController(
+    "search_miss",
+    limit=int(os.getenv("SEARCH_MAX_CONCURRENT_MISSES", "8")),
+    max_waiting=int(os.getenv("SEARCH_ADMISSION_MAX_WAITING", "32")),
+    max_wait=float(os.getenv("SEARCH_ADMISSION_MAX_WAIT_SECONDS", "5"))
+)
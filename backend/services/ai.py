@@ -4,17 +4,58 @@ Analyzes product images to identify specific models and estimate value
 """
 
 import os
-import google.generativeai as genai
 from typing import List, Dict, Optional
 import json
+import logging
+
+from services.http import get_http_client
+from services.metrics import metrics
+from services.ratelimit import rate_limits
+from services.retry import with_retry
+
+logger = logging.getLogger(__name__)
 
 
 class AIService:
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=api_key)
-        # Use Gemini 2.5 Flash - latest and most capable
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+        # Created on first use: importing the Gemini SDK takes longer than
+        # the rest of the app combined
+        self._model = None
+    
+    @property
+    def model(self):
+        """Gemini model, importing and configuring the SDK on first access"""
+        if self._model is None:
+            import google.generativeai as genai
+            
+            api_key = os.getenv("GOOGLE_API_KEY")
+            genai.configure(api_key=api_key)
+            # Use Gemini 2.5 Flash - latest and most capable
+            self._model = genai.GenerativeModel('models/gemini-2.5-flash')
+        return self._model
+    
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+    
+    async def _generate(self, contents):
+        """Call Gemini without blocking the event loop, retrying transient errors"""
+        async def generate():
+            rate_limits["gemini"].consume()
+            with metrics.track("gemini"):
+                return await self.model.generate_content_async(contents)
+        
+        return await with_retry("gemini", generate)
+    
+    async def _fetch_image(self, url: str):
+        """Download one image, retrying transient failures"""
+        client = get_http_client()
+        
+        async def fetch():
+            with metrics.track("image_fetch"):
+                return await client.get(url, timeout=5.0)
+        
+        return await with_retry("image_fetch", fetch)
     
     def _generate_fallback_estimate(self, listed_price: float, category: str) -> float:
         """Generate a reasonable fallback price estimate based on category"""
@@ -139,7 +180,7 @@ Return JSON:
             # For now, use text-only analysis since we need to handle image URLs
             # In production, you'd download images and pass them directly
             # This is a simplified version using text prompt only
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt)
             
             # Parse JSON from response
             response_text = response.text.strip()
@@ -156,6 +197,7 @@ Return JSON:
             price_estimated = float(analysis.get("price_estimated", 0))
             if price_estimated == 0:
                 # If AI didn't provide estimate, generate fallback
+                metrics.ai_analyses.inc(kind="item", outcome="fallback")
                 category = self._detect_category(vague_title)
                 # Assume a reasonable base price if not available
                 price_estimated = self._generate_fallback_estimate(50.0, category)
@@ -168,7 +210,8 @@ Return JSON:
             }
         
         except Exception as e:
-            print(f"AI Analysis Error: {str(e)}")
+            logger.warning("AI analysis error: %s", e)
+            metrics.ai_analyses.inc(kind="item", outcome="fallback")
             # Return fallback estimate on error
             category = self._detect_category(vague_title)
             return {
@@ -188,8 +231,6 @@ Return JSON:
         Enhanced version that downloads and analyzes actual images
         This is the production-ready version
         """
-        import httpx
-        
         category = self._detect_category(vague_title)
         
         if category == 'fashion':
@@ -265,25 +306,24 @@ Return JSON:
         try:
             # Download images
             image_parts = []
-            async with httpx.AsyncClient() as client:
-                for url in image_urls[:3]:
-                    try:
-                        response = await client.get(url, timeout=5.0)
-                        if response.status_code == 200:
-                            image_parts.append({
-                                'mime_type': response.headers.get('content-type', 'image/jpeg'),
-                                'data': response.content
-                            })
-                    except Exception as e:
-                        print(f"Failed to download image {url}: {e}")
-                        continue
+            for url in image_urls[:3]:
+                try:
+                    response = await self._fetch_image(url)
+                    if response.status_code == 200:
+                        image_parts.append({
+                            'mime_type': response.headers.get('content-type', 'image/jpeg'),
+                            'data': response.content
+                        })
+                except Exception as e:
+                    logger.warning("Failed to download image: %s", e, extra={"url": url})
+                    continue
             
             if not image_parts:
                 # Fallback to text-only if no images downloaded
                 return await self.analyze_item(image_urls, vague_title)
             
             # Generate content with images
-            response = self.model.generate_content([prompt] + image_parts)
+            response = await self._generate([prompt] + image_parts)
             response_text = response.text.strip()
             
             # Extract JSON
@@ -298,6 +338,7 @@ Return JSON:
             price_estimated = float(analysis.get("price_estimated", 0))
             if price_estimated == 0:
                 # Use fallback based on listed price or category
+                metrics.ai_analyses.inc(kind="item", outcome="fallback")
                 category = self._detect_category(vague_title)
                 base_price = listed_price if listed_price > 0 else 50.0
                 price_estimated = self._generate_fallback_estimate(base_price, category)
@@ -310,7 +351,8 @@ Return JSON:
             }
         
         except Exception as e:
-            print(f"AI Analysis Error: {str(e)}")
+            logger.warning("AI analysis error: %s", e)
+            metrics.ai_analyses.inc(kind="item", outcome="fallback")
             # Use fallback estimate on error
             category = self._detect_category(vague_title)
             base_price = listed_price if listed_price > 0 else 50.0
@@ -340,6 +382,7 @@ Return JSON:
         
         Returns:
             Dict with main_item, hidden_gems, and estimated_breakup_value
+            ("failed" is set when images or Gemini were unavailable)
         """
         prompt = f"""
 You are an EXPERT APPRAISER specializing in analyzing JOB LOTS, BUNDLES, and COLLECTIONS of used items.
@@ -406,34 +449,33 @@ Return JSON:
 """
         
         try:
-            import httpx
-            
             # Download images
             image_parts = []
-            async with httpx.AsyncClient() as client:
-                for url in image_urls[:5]:  # Analyze up to 5 images for bundles
-                    try:
-                        response = await client.get(url, timeout=5.0)
-                        if response.status_code == 200:
-                            image_parts.append({
-                                'mime_type': response.headers.get('content-type', 'image/jpeg'),
-                                'data': response.content
-                            })
-                    except Exception as e:
-                        print(f"Failed to download bundle image {url}: {e}")
-                        continue
+            for url in image_urls[:5]:  # Analyze up to 5 images for bundles
+                try:
+                    response = await self._fetch_image(url)
+                    if response.status_code == 200:
+                        image_parts.append({
+                            'mime_type': response.headers.get('content-type', 'image/jpeg'),
+                            'data': response.content
+                        })
+                except Exception as e:
+                    logger.warning("Failed to download bundle image: %s", e, extra={"url": url})
+                    continue
             
             if not image_parts:
+                metrics.ai_analyses.inc(kind="bundle", outcome="fallback")
                 return {
                     "main_item": bundle_title,
                     "hidden_gems": [],
                     "estimated_breakup_value": 0.0,
                     "confidence": "low",
-                    "reasoning": "No images available for bundle analysis"
+                    "reasoning": "No images available for bundle analysis",
+                    "failed": True
                 }
             
             # Generate content with images
-            response = self.model.generate_content([prompt] + image_parts)
+            response = await self._generate([prompt] + image_parts)
             response_text = response.text.strip()
             
             # Extract JSON
@@ -444,6 +486,8 @@ Return JSON:
             
             analysis = json.loads(response_text)
             
+            metrics.ai_analyses.inc(kind="bundle", outcome="ok")
+            
             # Ensure we have required fields
             return {
                 "main_item": analysis.get("main_item", bundle_title),
@@ -454,13 +498,15 @@ Return JSON:
             }
         
         except Exception as e:
-            print(f"Bundle AI Analysis Error: {str(e)}")
+            logger.warning("Bundle AI analysis error: %s", e)
+            metrics.ai_analyses.inc(kind="bundle", outcome="fallback")
             return {
                 "main_item": bundle_title,
                 "hidden_gems": [],
                 "estimated_breakup_value": 0.0,
                 "confidence": "low",
-                "reasoning": f"Bundle analysis failed: {str(e)}"
+                "reasoning": f"Bundle analysis failed: {str(e)}",
+                "failed": True
             }
 
 
@@ -0,0 +1,186 @@
+"""
+Analysis Queue - Background AI analysis beyond the first MAX_ANALYZED bundles
+Scores unanalyzed bundles by expected value and patches cached results as analyses finish
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.cache import cache_service
+from services.metrics import metrics
+from services.models import Listing, STATUS_NOT_ANALYZED
+from services.pipeline import analyze_bundle_async
+from services.ranking import rank_listings
+from services.ratelimit import rate_limits, TokenBucket
+from services.relevance import relevance_scorer
+
+logger = logging.getLogger(__name__)
+
+
+# Title words that tend to mark lots worth breaking up
+VALUE_KEYWORDS = {
+    "estate": 1.0, "collection": 1.0, "untested": 0.8, "vintage": 0.8, "job lot": 0.8,
+    "bulk": 0.6, "mixed": 0.6, "bundle": 0.5, "spares": 0.5, "repairs": 0.5, "joblot": 0.8,
+}
+
+
+def expected_value(listing: Listing) -> float:
+    """
+    Heuristic priority for analyzing a bundle; higher goes first
+    
+    Bigger lots, value keywords and a known brand raise the score; a higher
+    asking price lowers it, since the margin left for resale shrinks.
+    """
+    title = (listing.title_vague or "").lower()
+    score = math.log1p(max(listing.lot_size or 1, 1))
+    score += sum(weight for keyword, weight in VALUE_KEYWORDS.items() if keyword in title)
+    if listing.brand:
+        score += 0.5
+    price = listing.price_listed or 0
+    return score / (1 + price / 50)
+
+
+class AnalysisQueue:
+    def __init__(self):
+        self.enabled = os.getenv("ANALYSIS_QUEUE_ENABLED", "true").lower() == "true"
+        self.workers = int(os.getenv("ANALYSIS_QUEUE_WORKERS", "2"))
+        self.max_size = int(os.getenv("ANALYSIS_QUEUE_MAX_SIZE", "500"))
+        
+        # Share of the Gemini budget background analysis may use
+        share = float(os.getenv("ANALYSIS_QUEUE_GEMINI_SHARE", "0.3"))
+        gemini = rate_limits["gemini"]
+        self.gemini_budget = TokenBucket(gemini.rate * 60 * share, capacity=max(gemini.capacity * share, 1))
+        
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pending: Set[Tuple[str, str]] = set()
+        self._order = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._patch_lock = asyncio.Lock()
+    
+    def start(self) -> None:
+        """Start the worker pool"""
+        if not self.enabled or not cache_service.enabled or self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self) -> None:
+        """Stop the workers; queued analyses are dropped"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+        metrics.analysis_queue_depth.set(0)
+    
+    def submit(self, cache_key: str, q: str, listings: List[Listing]) -> int:
+        """
+        Queue bundles for background analysis
+        
+        Args:
+            cache_key: Search cache entry the results should be written into
+            q: Original search query (passed to the analysis prompt)
+            listings: Unanalyzed cluster representatives
+        
+        Returns:
+            Number of bundles queued (duplicates and a full queue are skipped)
+        """
+        if self._queue is None:
+            return 0
+        
+        queued = 0
+        for listing in listings:
+            job_id = (cache_key, listing.external_id)
+            if job_id in self._pending or not listing.image_url:
+                continue
+            try:
+                self._queue.put_nowait((-expected_value(listing), next(self._order), cache_key, q, listing))
+            except asyncio.QueueFull:
+                metrics.analysis_queue_dropped.inc()
+                break
+            self._pending.add(job_id)
+            queued += 1
+        
+        metrics.analysis_queue_depth.set(self._queue.qsize())
+        return queued
+    
+    def submit_cached(self, cache_key: str, q: str, results: List[Dict]) -> int:
+        """
+        Queue the unanalyzed bundles of a cached result set
+        
+        Lets a cache hit pick up work lost to a restart or a full queue.
+        
+        Args:
+            cache_key: Key the results were read from
+            q: Original search query
+            results: Cached result dicts
+        
+        Returns:
+            Number of bundles queued
+        """
+        if self._queue is None:
+            return 0
+        candidates = [
+            Listing.from_dict(item) for item in results
+            if item.get("analysis_status") == STATUS_NOT_ANALYZED
+            and item.get("image_url") and not item.get("duplicate_of")
+            and relevance_scorer.is_relevant(item.get("relevance"))
+            and (cache_key, item.get("external_id")) not in self._pending
+        ]
+        return self.submit(cache_key, q, candidates)
+    
+    def _has_budget(self) -> bool:
+        # Peek at the shared bucket so foreground searches keep priority
+        return rate_limits["gemini"].available() >= 1 and self.gemini_budget.try_acquire()
+    
+    async def _worker(self) -> None:
+        while True:
+            _, _, cache_key, q, listing = await self._queue.get()
+            try:
+                while not self._has_budget():
+                    await asyncio.sleep(60 / max(self.gemini_budget.rate * 60, 1))
+                
+                analysis = await analyze_bundle_async(listing, q)
+                await self._patch_cache(cache_key, listing.external_id, analysis)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Background analysis failed: %s", e, extra={"external_id": listing.external_id})
+            finally:
+                self._pending.discard((cache_key, listing.external_id))
+                metrics.analysis_queue_depth.set(self._queue.qsize())
+    
+    async def _patch_cache(self, cache_key: str, representative_id: str, analysis) -> bool:
+        """
+        Write an analysis into a cached result set, keeping its remaining TTL
+        
+        The analysis is applied to the representative and every listing
+        marked as its duplicate, and the set is re-ranked so a bundle that
+        turns out profitable moves up. Returns False if the entry has expired.
+        """
+        async with self._patch_lock:
+            cached = await cache_service.get(cache_key)
+            ttl = await cache_service.ttl(cache_key)
+            if not cached or not ttl or ttl <= 0:
+                return False
+            
+            listings = [Listing.from_dict(item) for item in cached]
+            changed = False
+            for listing in listings:
+                if representative_id in (listing.external_id, listing.duplicate_of):
+                    listing.analysis = analysis
+                    changed = True
+            
+            if changed:
+                cached = [listing.to_dict() for listing in rank_listings(listings)]
+                cache_service.set_background(cache_key, cached, ttl=ttl)
+            return changed
+
+
+# Singleton instance
+analysis_queue = AnalysisQueue()
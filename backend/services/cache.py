@@ -1,55 +1,96 @@
 """
-Cache Service - Upstash Redis Integration
-Handles caching for search results and other data
+Cache Service - Cache access for search results and other data
+Encodes values, queues write-behind writes and delegates storage to the configured backend
 """
 
+import asyncio
+import contextvars
+import logging
 import os
-import json
-from typing import Optional, Any
-import httpx
+import time
+from typing import Optional, Any, Dict, List, Tuple
+
+from services.cache_backends import CacheBackend, create_backend
+from services.codec import cache_codec
+from services.metrics import metrics
+from services.querykey import canonical_query, price_bucket
+
+logger = logging.getLogger(__name__)
 
 
 class CacheService:
-    def __init__(self):
-        self.redis_url = os.getenv("UPSTASH_REDIS_REST_URL")
-        self.redis_token = os.getenv("UPSTASH_REDIS_REST_TOKEN")
-        self.enabled = bool(self.redis_url and self.redis_token)
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend
+        
+        # Write-behind queue: keys waiting to be written, latest value per key
+        self.write_queue_size = int(os.getenv("CACHE_WRITE_QUEUE_SIZE", "1000"))
+        self.write_batch_size = int(os.getenv("CACHE_WRITE_BATCH_SIZE", "32"))
+        self.write_flush_timeout = float(os.getenv("CACHE_WRITE_FLUSH_TIMEOUT_SECONDS", "5"))
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        # key -> (value, ttl, queued at)
+        self._pending: Dict[str, Tuple[Any, int, float]] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
     
     async def get(self, key: str) -> Optional[Any]:
         """
         Get value from cache
         
+        Writes still waiting in the write-behind queue are visible.
+        
         Args:
             key: Cache key
         
         Returns:
-            Cached value (parsed from JSON) or None if not found
+            Cached value (decoded by the cache codec) or None if not found
         """
         if not self.enabled:
             return None
         
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[0]
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.redis_url}/get/{key}",
-                    headers={"Authorization": f"Bearer {self.redis_token}"},
-                    timeout=2.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    result = data.get("result")
-                    
-                    if result:
-                        # Parse JSON string back to object
-                        return json.loads(result)
-                
-                return None
+            with metrics.track(self.backend.name):
+                result = await self.backend.get(key)
+            return cache_codec.decode(result) if result else None
         
         except Exception as e:
-            print(f"Cache GET error: {str(e)}")
+            logger.warning("Cache GET error: %s", e)
             return None
     
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Get several values in one round trip (MGET)
+        
+        Args:
+            keys: Cache keys
+        
+        Returns:
+            Decoded values in key order, None for missing keys
+        """
+        if not self.enabled or not keys:
+            return [None] * len(keys)
+        
+        if all(key in self._pending for key in keys):
+            return [self._pending[key][0] for key in keys]
+        
+        try:
+            with metrics.track(self.backend.name):
+                results = await self.backend.get_many(keys)
+            return [
+                self._pending[key][0] if key in self._pending else cache_codec.decode(result) if result else None
+                for key, result in zip(keys, results)
+            ]
+        
+        except Exception as e:
+            logger.warning("Cache MGET error: %s", e)
+            return [None] * len(keys)
+    
     async def set(
         self,
         key: str,
@@ -61,7 +102,7 @@ class CacheService:
         
         Args:
             key: Cache key
-            value: Value to cache (will be JSON serialized)
+            value: Value to cache (JSON-compatible, encoded by the cache codec)
             ttl: Time to live in seconds (default: 24 hours)
         
         Returns:
@@ -70,25 +111,148 @@ class CacheService:
         if not self.enabled:
             return False
         
+        # A direct write supersedes anything still queued for the key
+        self._pending.pop(key, None)
         try:
-            # Serialize value to JSON
-            json_value = json.dumps(value)
+            # Serialize (and compress large values)
+            encoded_value = cache_codec.encode(value)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.redis_url}/set/{key}",
-                    headers={
-                        "Authorization": f"Bearer {self.redis_token}",
-                        "Content-Type": "application/json"
-                    },
-                    json={"value": json_value, "ex": ttl},
-                    timeout=2.0
-                )
-                
-                return response.status_code == 200
+            with metrics.track(self.backend.name):
+                return await self.backend.set(key, encoded_value, ttl)
         
         except Exception as e:
-            print(f"Cache SET error: {str(e)}")
+            logger.warning("Cache SET error: %s", e)
+            return False
+    
+    def set_background(self, key: str, value: Any, ttl: int = 86400) -> bool:
+        """
+        Queue a write for the background writer without waiting for it
+        
+        Later writes to a key still in the queue replace the queued value.
+        When the queue is full the write is dropped (and counted) rather than
+        holding up the caller.
+        
+        Args:
+            key: Cache key
+            value: Value to cache (JSON-compatible)
+            ttl: Time to live in seconds, counted from now
+        
+        Returns:
+            True if queued, False if dropped or the cache is disabled
+        """
+        if not self.enabled:
+            return False
+        if self._writer is None:
+            self.start_writer()
+        
+        if key in self._pending:
+            self._pending[key] = (value, ttl, time.monotonic())
+            metrics.cache_writes.inc(outcome="coalesced")
+            return True
+        
+        try:
+            self._write_queue.put_nowait(key)
+        except asyncio.QueueFull:
+            metrics.cache_writes.inc(outcome="dropped")
+            return False
+        
+        self._pending[key] = (value, ttl, time.monotonic())
+        metrics.cache_write_queue_depth.set(self._write_queue.qsize())
+        return True
+    
+    def start_writer(self) -> None:
+        """Start the background writer (also started by the first queued write)"""
+        if self._writer is None and self.enabled:
+            self._write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+            # A fresh context, so a writer started lazily from a request handler
+            # doesn't record its upstream calls into that request's trace
+            self._writer = asyncio.create_task(self._write_loop(), context=contextvars.Context())
+    
+    async def stop_writer(self) -> None:
+        """Stop the background writer and flush whatever is still queued"""
+        if self._writer is None:
+            return
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        
+        keys = list(self._pending)
+        try:
+            await asyncio.wait_for(self._flush_all(keys), timeout=self.write_flush_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cache flush timed out with %d writes pending", len(self._pending))
+        self._pending.clear()
+        self._write_queue = None
+    
+    async def close(self) -> None:
+        """Flush queued writes and release the backend's connections"""
+        await self.stop_writer()
+        if self.backend is not None:
+            await self.backend.close()
+    
+    async def _flush_all(self, keys: List[str]) -> None:
+        for start in range(0, len(keys), self.write_batch_size):
+            await self._write_batch(keys[start:start + self.write_batch_size])
+    
+    async def _write_loop(self) -> None:
+        while True:
+            keys = [await self._write_queue.get()]
+            while len(keys) < self.write_batch_size and not self._write_queue.empty():
+                keys.append(self._write_queue.get_nowait())
+            metrics.cache_write_queue_depth.set(self._write_queue.qsize())
+            
+            try:
+                await self._write_batch(keys)
+            except Exception as e:
+                logger.warning("Cache write-behind error: %s", e)
+    
+    async def _write_batch(self, keys: List[str]) -> None:
+        """Write queued keys in one pipelined request"""
+        entries = {key: self._pending[key] for key in keys if key in self._pending}
+        if not entries:
+            return
+        
+        now = time.monotonic()
+        ok = await self.set_many([
+            (key, value, max(int(ttl - (now - queued_at)), 1))
+            for key, (value, ttl, queued_at) in entries.items()
+        ])
+        metrics.cache_writes.inc(len(entries), outcome="written" if ok else "failed")
+        
+        for key, entry in entries.items():
+            if self._pending.get(key) is not entry:
+                # Replaced while the write was in flight; write again
+                try:
+                    self._write_queue.put_nowait(key)
+                    continue
+                except (asyncio.QueueFull, AttributeError):
+                    pass
+            self._pending.pop(key, None)
+    
+    async def set_many(self, entries: List[Tuple[str, Any, int]]) -> bool:
+        """
+        Set several keys in one round trip where the backend supports it
+        
+        Args:
+            entries: (key, value, ttl seconds) tuples
+        
+        Returns:
+            True if every write succeeded, False otherwise
+        """
+        if not self.enabled or not entries:
+            return False
+        
+        try:
+            encoded = [(key, cache_codec.encode(value), ttl) for key, value, ttl in entries]
+            
+            with metrics.track(self.backend.name):
+                return await self.backend.set_many(encoded)
+        
+        except Exception as e:
+            logger.warning("Cache batch SET error: %s", e)
             return False
     
     async def delete(self, key: str) -> bool:
@@ -104,24 +268,66 @@ class CacheService:
         if not self.enabled:
             return False
         
+        self._pending.pop(key, None)
+        try:
+            with metrics.track(self.backend.name):
+                return await self.backend.delete(key)
+        
+        except Exception as e:
+            logger.warning("Cache DELETE error: %s", e)
+            return False
+    
+    async def ttl(self, key: str) -> Optional[int]:
+        """
+        Get remaining time to live for a key
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Seconds until expiry, -1 if the key has no expiry, -2 if it
+            does not exist, or None if the cache is unavailable
+        """
+        if not self.enabled:
+            return None
+        
+        pending = self._pending.get(key)
+        if pending is not None:
+            return max(int(pending[1] - (time.monotonic() - pending[2])), 1)
+        
+        try:
+            with metrics.track(self.backend.name):
+                return await self.backend.ttl(key)
+        
+        except Exception as e:
+            logger.warning("Cache TTL error: %s", e)
+            return None
+    
+    async def ping(self) -> bool:
+        """
+        Check the cache is reachable
+        
+        Returns:
+            True if the backend answered, False otherwise
+        """
+        if not self.enabled:
+            return False
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.redis_url}/del/{key}",
-                    headers={"Authorization": f"Bearer {self.redis_token}"},
-                    timeout=2.0
-                )
-                
-                return response.status_code == 200
+            with metrics.track(self.backend.name):
+                return await self.backend.ping()
         
         except Exception as e:
-            print(f"Cache DELETE error: {str(e)}")
+            logger.warning("Cache PING error: %s", e)
             return False
     
     def build_search_key(self, query: str, max_price: int) -> str:
         """
         Build consistent cache key for search results
         
+        Equivalent queries ("Canon camera", "camera  canon") and price limits
+        in the same bucket share a key.
+        
         Args:
             query: Search query
             max_price: Maximum price filter
@@ -129,10 +335,8 @@ class CacheService:
         Returns:
             Cache key string
         """
-        # Normalize query to lowercase and strip whitespace
-        normalized_query = query.lower().strip()
-        return f"search:{normalized_query}:{max_price}"
+        return f"search:{canonical_query(query)}:{price_bucket(max_price)}"
 
 
 # Singleton instance
-cache_service = CacheService()
+cache_service = CacheService(create_backend())
@@ -0,0 +1,332 @@
+"""
+Cache Backends - Storage behind the cache service
+In-memory, SQLite, native Redis and Upstash REST stores with the same TTL semantics
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from services.http import get_http_client
+
+
+class CacheBackend:
+    """
+    Key-value store for encoded cache entries
+    
+    Values are the cache codec's strings; the cache service handles
+    encoding, error handling and metrics. `ttl` follows Redis: seconds
+    left, -1 for no expiry, -2 for a missing key.
+    """
+    
+    name = "cache"
+    
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+    
+    async def set(self, key: str, value: str, ttl: int) -> bool:
+        raise NotImplementedError
+    
+    async def set_many(self, entries: List[Tuple[str, str, int]]) -> bool:
+        results = [await self.set(key, value, ttl) for key, value, ttl in entries]
+        return all(results)
+    
+    async def delete(self, key: str) -> bool:
+        raise NotImplementedError
+    
+    async def ttl(self, key: str) -> int:
+        raise NotImplementedError
+    
+    async def ping(self) -> bool:
+        return True
+    
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Per-process LRU store with expiry
+    
+    Nothing is shared between workers or survives a restart; meant for local
+    development, benchmarks and single-worker deployments.
+    """
+    
+    name = "cache_memory"
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (value, monotonic expiry or None)
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+    
+    def _lookup(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+    
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._lookup(key)
+        return entry[0] if entry else None
+    
+    async def set(self, key: str, value: str, ttl: int) -> bool:
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+    
+    async def delete(self, key: str) -> bool:
+        self._entries.pop(key, None)
+        return True
+    
+    async def ttl(self, key: str) -> int:
+        entry = self._lookup(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return max(int(entry[1] - time.monotonic()), 0)
+
+
+class SqliteBackend(CacheBackend):
+    """
+    Single-file store that survives restarts
+    
+    Expiry uses wall-clock time so entries keep their TTL across restarts.
+    Queries run on a worker thread; one connection is shared behind a lock
+    (SQLite serializes writers anyway). Expired rows are removed when read
+    and swept every `sweep_every` writes.
+    """
+    
+    name = "cache_sqlite"
+    
+    def __init__(self, path: str, sweep_every: int = 500):
+        self.path = path
+        self.sweep_every = sweep_every
+        self._writes = 0
+        self._lock = asyncio.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+    
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+    
+    def _get_many(self, keys: List[str]) -> List[Optional[str]]:
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, now)
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+    
+    def _set_many(self, entries: List[Tuple[str, str, int]]) -> None:
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, now + ttl if ttl else None) for key, value, ttl in entries]
+            )
+        self._writes += len(entries)
+        if self._writes >= self.sweep_every:
+            self._writes = 0
+            self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+    
+    def _ttl(self, key: str) -> int:
+        row = self._conn.execute("SELECT expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return -2
+        if row[0] is None:
+            return -1
+        left = row[0] - time.time()
+        return int(left) if left > 0 else -2
+    
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.get_many([key]))[0]
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return await self._run(self._get_many, keys)
+    
+    async def set(self, key: str, value: str, ttl: int) -> bool:
+        return await self.set_many([(key, value, ttl)])
+    
+    async def set_many(self, entries: List[Tuple[str, str, int]]) -> bool:
+        await self._run(self._set_many, entries)
+        return True
+    
+    async def delete(self, key: str) -> bool:
+        await self._run(self._conn.execute, "DELETE FROM cache WHERE key = ?", (key,))
+        return True
+    
+    async def ttl(self, key: str) -> int:
+        return await self._run(self._ttl, key)
+    
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Native Redis over RESP with a connection pool
+    
+    Requires the optional `redis` package (redis-py 5+). Batches go out as a
+    non-transactional pipeline, reads as MGET.
+    """
+    
+    name = "cache_redis"
+    
+    def __init__(self, url: str, max_connections: int):
+        import redis.asyncio as redis
+        
+        self._client = redis.from_url(url, max_connections=max_connections, decode_responses=True)
+    
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return await self._client.mget(keys)
+    
+    async def set(self, key: str, value: str, ttl: int) -> bool:
+        return bool(await self._client.set(key, value, ex=ttl or None))
+    
+    async def set_many(self, entries: List[Tuple[str, str, int]]) -> bool:
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value, ttl in entries:
+                pipe.set(key, value, ex=ttl or None)
+            results = await pipe.execute()
+        return all(results)
+    
+    async def delete(self, key: str) -> bool:
+        await self._client.delete(key)
+        return True
+    
+    async def ttl(self, key: str) -> int:
+        return int(await self._client.ttl(key))
+    
+    async def ping(self) -> bool:
+        return bool(await self._client.ping())
+    
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class UpstashBackend(CacheBackend):
+    """Upstash Redis over its REST API (one HTTPS request per command or pipeline)"""
+    
+    name = "upstash"
+    
+    def __init__(self, url: str, token: str):
+        self.url = url
+        self.token = token
+    
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+    
+    async def get(self, key: str) -> Optional[str]:
+        client = get_http_client()
+        response = await client.get(f"{self.url}/get/{key}", headers=self._headers, timeout=2.0)
+        response.raise_for_status()
+        return response.json().get("result") or None
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        client = get_http_client()
+        response = await client.post(self.url, headers=self._headers, json=["MGET", *keys], timeout=2.0)
+        response.raise_for_status()
+        results = response.json().get("result") or [None] * len(keys)
+        return [result or None for result in results]
+    
+    async def set(self, key: str, value: str, ttl: int) -> bool:
+        client = get_http_client()
+        # Upstash stores the raw request body as the value; the TTL goes in
+        # the query string
+        response = await client.post(
+            f"{self.url}/set/{key}",
+            headers=self._headers,
+            params={"EX": ttl} if ttl else None,
+            content=value,
+            timeout=2.0
+        )
+        return response.status_code == 200
+    
+    async def set_many(self, entries: List[Tuple[str, str, int]]) -> bool:
+        commands = [
+            ["SET", key, value, "EX", ttl] if ttl else ["SET", key, value]
+            for key, value, ttl in entries
+        ]
+        client = get_http_client()
+        response = await client.post(f"{self.url}/pipeline", headers=self._headers, json=commands, timeout=2.0)
+        if response.status_code != 200:
+            return False
+        return all("error" not in result for result in response.json())
+    
+    async def delete(self, key: str) -> bool:
+        client = get_http_client()
+        response = await client.get(f"{self.url}/del/{key}", headers=self._headers, timeout=2.0)
+        return response.status_code == 200
+    
+    async def ttl(self, key: str) -> int:
+        client = get_http_client()
+        response = await client.get(f"{self.url}/ttl/{key}", headers=self._headers, timeout=2.0)
+        response.raise_for_status()
+        return int(response.json().get("result"))
+    
+    async def ping(self) -> bool:
+        client = get_http_client()
+        response = await client.get(f"{self.url}/ping", headers=self._headers, timeout=2.0)
+        return response.status_code == 200
+
+
+def create_backend(kind: Optional[str] = None) -> Optional[CacheBackend]:
+    """
+    Build the backend selected by CACHE_BACKEND
+    
+    Args:
+        kind: "memory", "sqlite", "redis", "upstash" or "none". Defaults to
+            CACHE_BACKEND, or "upstash" when Upstash credentials are set and
+            "memory" otherwise.
+    
+    Returns:
+        The backend, or None when caching is disabled
+    
+    Raises:
+        ValueError: For an unknown backend or missing settings
+    """
+    upstash_url = os.getenv("UPSTASH_REDIS_REST_URL")
+    upstash_token = os.getenv("UPSTASH_REDIS_REST_TOKEN")
+    kind = (kind or os.getenv("CACHE_BACKEND") or ("upstash" if upstash_url and upstash_token else "memory")).lower()
+    
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryBackend(int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "10000")))
+    if kind == "sqlite":
+        return SqliteBackend(os.getenv("CACHE_SQLITE_PATH", "cache.sqlite3"))
+    if kind == "redis":
+        url = os.getenv("REDIS_URL")
+        if not url:
+            raise ValueError("CACHE_BACKEND=redis needs REDIS_URL")
+        return RedisBackend(url, int(os.getenv("REDIS_MAX_CONNECTIONS", "20")))
+    if kind == "upstash":
+        if not (upstash_url and upstash_token):
+            raise ValueError("CACHE_BACKEND=upstash needs UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN")
+        return UpstashBackend(upstash_url, upstash_token)
+    raise ValueError(f"Unknown CACHE_BACKEND '{kind}'")
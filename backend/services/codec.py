@@ -0,0 +1,173 @@
+"""
+Cache Codec - Compact serialization for cached payloads
+Encodes values as versioned strings: serializer + optional compression
+"""
+
+import base64
+import json
+import os
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Encoded values start with MAGIC + VERSION + serializer id + compressor id + ":".
+# Anything without the header is a legacy plain-JSON entry.
+MAGIC = "TH"
+VERSION = "1"
+HEADER_LENGTH = len(MAGIC) + len(VERSION) + 3
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+# id -> (dumps, loads); entries are only registered when the library exists
+SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "j": (_json_dumps, _json_loads),
+}
+if orjson is not None:
+    SERIALIZERS["o"] = (orjson.dumps, orjson.loads)
+if msgpack is not None:
+    SERIALIZERS["m"] = (
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+# id -> (compress, decompress)
+COMPRESSORS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "n": (lambda data: data, lambda data: data),
+    "z": (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    COMPRESSORS["s"] = (_zstd_compressor.compress, _zstd_decompressor.decompress)
+
+# orjson and json produce identical bytes, so they share the text form
+_TEXT_SERIALIZERS = {"j", "o"}
+
+SERIALIZER_IDS = {"json": "j", "orjson": "o", "msgpack": "m"}
+COMPRESSOR_IDS = {"none": "n", "zlib": "z", "zstd": "s"}
+
+
+class CacheCodec:
+    """
+    Versioned encoder for cache values
+    
+    Small payloads are stored as readable JSON. Payloads above
+    `compress_threshold` bytes are compressed and base64 encoded, since the
+    Upstash REST API only carries strings.
+    """
+    
+    def __init__(
+        self,
+        serializer: str = "orjson",
+        compressor: str = "zlib",
+        compress_threshold: int = 1024
+    ):
+        serializer_id = SERIALIZER_IDS.get(serializer, "j")
+        if serializer_id not in SERIALIZERS:
+            serializer_id = "o" if "o" in SERIALIZERS else "j"
+        compressor_id = COMPRESSOR_IDS.get(compressor, "z")
+        if compressor_id not in COMPRESSORS:
+            compressor_id = "z"
+        
+        self.serializer_id = serializer_id
+        self.compressor_id = compressor_id
+        self.compress_threshold = compress_threshold
+    
+    def encode(self, value: Any) -> str:
+        """
+        Encode a value for storage
+        
+        Args:
+            value: JSON-compatible value
+        
+        Returns:
+            Header-prefixed string
+        """
+        dumps = SERIALIZERS[self.serializer_id][0]
+        data = dumps(value)
+        
+        if len(data) < self.compress_threshold or self.compressor_id == "n":
+            if self.serializer_id in _TEXT_SERIALIZERS:
+                return f"{MAGIC}{VERSION}{self.serializer_id}n:" + data.decode()
+            compressor_id = "n"
+        else:
+            compressor_id = self.compressor_id
+            data = COMPRESSORS[compressor_id][0](data)
+        
+        return (
+            f"{MAGIC}{VERSION}{self.serializer_id}{compressor_id}:"
+            + base64.b64encode(data).decode()
+        )
+    
+    def decode(self, raw: str) -> Any:
+        """
+        Decode a stored value, including entries written before the codec
+        
+        Args:
+            raw: String as returned by the cache
+        
+        Returns:
+            Decoded value
+        
+        Raises:
+            ValueError: If the entry needs a library that is not installed
+        """
+        if len(raw) < HEADER_LENGTH or not raw.startswith(MAGIC + VERSION) or raw[HEADER_LENGTH - 1] != ":":
+            return _decode_legacy(raw)
+        
+        serializer_id = raw[3]
+        compressor_id = raw[4]
+        body = raw[HEADER_LENGTH:]
+        
+        if serializer_id not in SERIALIZERS or compressor_id not in COMPRESSORS:
+            raise ValueError(f"Unsupported cache encoding '{raw[:HEADER_LENGTH]}'")
+        
+        loads = SERIALIZERS[serializer_id][1]
+        if compressor_id == "n" and serializer_id in _TEXT_SERIALIZERS:
+            return loads(body)
+        
+        data = COMPRESSORS[compressor_id][1](base64.b64decode(body))
+        return loads(data)
+
+
+def _decode_legacy(raw: str) -> Any:
+    """
+    Decode a pre-codec entry
+    
+    Early versions posted {"value": <json string>, "ex": ttl} as the body,
+    so Upstash stored the wrapper itself; unwrap it.
+    """
+    value = json.loads(raw)
+    if isinstance(value, dict) and set(value) == {"value", "ex"} and isinstance(value["value"], str):
+        return json.loads(value["value"])
+    return value
+
+
+# Singleton instance
+cache_codec = CacheCodec(
+    serializer=os.getenv("CACHE_SERIALIZER", "orjson"),
+    compressor=os.getenv("CACHE_COMPRESSION", "zlib"),
+    compress_threshold=int(os.getenv("CACHE_COMPRESSION_THRESHOLD", "1024"))
+)
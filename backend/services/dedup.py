@@ -0,0 +1,216 @@
+"""
+Dedup Service - Cross-marketplace near-duplicate detection
+Clusters listings cross-posted on eBay and Vinted so each is analyzed once
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from services.http import get_http_client
+from services.metrics import metrics
+from services.models import Listing
+from services.retry import with_retry
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image
+except ImportError:  # Image confirmation is skipped without Pillow
+    Image = None
+
+
+# MinHash signature: NUM_BANDS bands of ROWS_PER_BAND rows for LSH bucketing
+NUM_BANDS = 8
+ROWS_PER_BAND = 4
+NUM_HASHES = NUM_BANDS * ROWS_PER_BAND
+
+# Estimated title Jaccard at or above which listings are merged outright
+TITLE_DUPLICATE_THRESHOLD = 0.8
+# Between this and the duplicate threshold the primary images decide
+TITLE_CANDIDATE_THRESHOLD = 0.5
+# Max differing bits (of 64) between dHashes of the same photo
+IMAGE_HASH_DISTANCE = 10
+# Cross-posted lots are priced alike; ignore pairs further apart than this
+MAX_PRICE_RATIO = 2.0
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME | 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_HASHES)
+]
+
+
+def _shingles(title: str, size: int = 4) -> set:
+    """Character shingles over the normalized title"""
+    text = " ".join(re.findall(r"[a-z0-9]+", (title or "").lower()))
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(title: str) -> Tuple[int, ...]:
+    """
+    MinHash signature of a title
+    
+    Args:
+        title: Listing title
+    
+    Returns:
+        NUM_HASHES minimum hash values, one per permutation
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+        for s in _shingles(title)
+    ]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity from two signatures"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_HASHES
+
+
+def _prices_compatible(a: Listing, b: Listing) -> bool:
+    price_a = a.price_listed or 0
+    price_b = b.price_listed or 0
+    if price_a <= 0 or price_b <= 0:
+        return True
+    return max(price_a, price_b) / min(price_a, price_b) <= MAX_PRICE_RATIO
+
+
+def title_candidates(items: List[Listing]) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Fast first pass over titles only
+    
+    Listings sharing any LSH band become candidate pairs; their estimated
+    Jaccard similarity then sorts them into definite duplicates and pairs
+    that need an image check.
+    
+    Args:
+        items: Listings to compare
+    
+    Returns:
+        (duplicate pairs, ambiguous pairs) as index tuples
+    """
+    signatures = [minhash(item.title_vague) for item in items]
+    
+    buckets: Dict[Tuple, List[int]] = {}
+    for index, signature in enumerate(signatures):
+        for band in range(NUM_BANDS):
+            start = band * ROWS_PER_BAND
+            key = (band,) + signature[start:start + ROWS_PER_BAND]
+            buckets.setdefault(key, []).append(index)
+    
+    pairs = set()
+    for members in buckets.values():
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                pairs.add((members[i], members[j]))
+    
+    duplicates, ambiguous = [], []
+    for i, j in sorted(pairs):
+        if not _prices_compatible(items[i], items[j]):
+            continue
+        similarity = _similarity(signatures[i], signatures[j])
+        if similarity >= TITLE_DUPLICATE_THRESHOLD:
+            duplicates.append((i, j))
+        elif similarity >= TITLE_CANDIDATE_THRESHOLD:
+            ambiguous.append((i, j))
+    
+    return duplicates, ambiguous
+
+
+def _dhash(data: bytes) -> Optional[int]:
+    """64-bit difference hash of an image"""
+    try:
+        image = Image.open(io.BytesIO(data)).convert("L").resize((9, 8))
+        pixels = list(image.getdata())
+    except Exception:
+        return None
+    
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return bits
+
+
+async def _image_hashes(items: List[Listing], indices: set) -> Dict[int, int]:
+    """Download primary images for the given listings and hash them"""
+    async def fetch(client: httpx.AsyncClient, index: int) -> Tuple[int, Optional[int]]:
+        async def download():
+            with metrics.track("image_fetch"):
+                return await client.get(items[index].image_url, timeout=5.0)
+        
+        try:
+            response = await with_retry("image_fetch", download)
+            if response.status_code == 200:
+                # PIL decode and resize are CPU-bound; keep them off the event loop
+                return index, await asyncio.to_thread(_dhash, response.content)
+        except Exception as e:
+            logger.warning("Failed to download dedup image: %s", e, extra={"url": items[index].image_url})
+        return index, None
+    
+    client = get_http_client()
+    results = await asyncio.gather(*[
+        fetch(client, index) for index in indices if items[index].image_url
+    ])
+    
+    return {index: value for index, value in results if value is not None}
+
+
+async def find_duplicate_clusters(items: List[Listing]) -> List[List[int]]:
+    """
+    Cluster near-duplicate listings
+    
+    Args:
+        items: Ranked listings
+    
+    Returns:
+        Clusters as lists of indices into items. Clusters are ordered by
+        their best-ranked member, which comes first in each cluster.
+    """
+    parent = list(range(len(items)))
+    
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    def union(i: int, j: int) -> None:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    
+    duplicates, ambiguous = title_candidates(items)
+    for i, j in duplicates:
+        union(i, j)
+    
+    # Second pass: only ambiguous pairs not already merged need their images
+    ambiguous = [(i, j) for i, j in ambiguous if find(i) != find(j)]
+    if ambiguous and Image is not None:
+        hashes = await _image_hashes(items, {index for pair in ambiguous for index in pair})
+        for i, j in ambiguous:
+            if i in hashes and j in hashes and bin(hashes[i] ^ hashes[j]).count("1") <= IMAGE_HASH_DISTANCE:
+                union(i, j)
+    
+    clusters: Dict[int, List[int]] = {}
+    for index in range(len(items)):
+        clusters.setdefault(find(index), []).append(index)
+    
+    return sorted(clusters.values(), key=lambda members: members[0])
@@ -0,0 +1,283 @@
+"""
+Deep Scan Service - Long-running multi-page searches
+Runs deep-scan jobs on a bounded worker pool and persists their progress in the cache
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+from services.cache import cache_service
+from services.metrics import metrics
+from services.models import Listing
+from services.pipeline import analyze_bundle_async, cluster_listings, relevant_clusters, search_page
+from services.ranking import ListingColumns, rank_columns, rank_listings
+from services.ratelimit import rate_limits
+from services.relevance import relevance_scorer
+
+logger = logging.getLogger(__name__)
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+TERMINAL_STATUSES = frozenset({JOB_DONE, JOB_FAILED, JOB_CANCELLED})
+
+
+class DeepScanUnavailable(Exception):
+    """Raised when a job can't be accepted (queue full or workers not running)"""
+    pass
+
+
+class DeepScanService:
+    def __init__(self):
+        self.workers = int(os.getenv("DEEP_SCAN_WORKERS", "2"))
+        self.max_queued = int(os.getenv("DEEP_SCAN_MAX_QUEUED", "20"))
+        self.max_pages = int(os.getenv("DEEP_SCAN_MAX_PAGES", "10"))
+        self.page_size = int(os.getenv("DEEP_SCAN_PAGE_SIZE", "50"))
+        self.max_analyzed = int(os.getenv("DEEP_SCAN_MAX_ANALYZED", "50"))
+        self.batch_size = int(os.getenv("DEEP_SCAN_ANALYSIS_BATCH", "5"))
+        self.max_results = int(os.getenv("DEEP_SCAN_MAX_RESULTS", "500"))
+        self.job_ttl = int(os.getenv("DEEP_SCAN_JOB_TTL_SECONDS", "86400"))
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs owned by this process; other workers' jobs are read from the cache
+        self._jobs: Dict[str, Dict] = {}
+        self._cancelled: Set[str] = set()
+    
+    def start(self) -> None:
+        """Start the worker pool"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self) -> None:
+        """Stop the workers, marking unfinished jobs as failed"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        
+        for job in list(self._jobs.values()):
+            if job["status"] not in TERMINAL_STATUSES:
+                await self._finish(job, JOB_FAILED, "Server restarted before the scan finished")
+        self._jobs.clear()
+    
+    async def submit(self, q: str, max_price: int, pages: int, max_analyzed: int) -> Dict:
+        """
+        Queue a deep-scan job
+        
+        Args:
+            q: Search query
+            max_price: Maximum price filter
+            pages: Marketplace pages to walk (capped at DEEP_SCAN_MAX_PAGES)
+            max_analyzed: Bundles to analyze (capped at DEEP_SCAN_MAX_ANALYZED)
+        
+        Returns:
+            The new job's state
+        
+        Raises:
+            DeepScanUnavailable: If the job queue is full or not running
+        """
+        if self._queue is None or self._queue.full():
+            raise DeepScanUnavailable("Too many deep scans queued, try again later")
+        
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "query": q,
+            "max_price": max_price,
+            "status": JOB_QUEUED,
+            "error": None,
+            "partial": False,
+            "progress": {
+                "pages_done": 0,
+                "pages_total": max(1, min(pages, self.max_pages)),
+                "listings": 0,
+                "analyzed": 0,
+                # Upper bound until the listings are clustered; lowered then,
+                # with skipped_irrelevant saying how many clusters were dropped
+                "to_analyze": max(0, min(max_analyzed, self.max_analyzed)),
+                "skipped_irrelevant": 0,
+            },
+            "created_at": now,
+            "updated_at": now,
+            "results": [],
+        }
+        self._jobs[job["id"]] = job
+        self._queue.put_nowait(job)
+        await self._persist(job)
+        metrics.deep_scans.inc(outcome="submitted")
+        return job
+    
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Look up a job's state
+        
+        Args:
+            job_id: Job ID returned by submit()
+        
+        Returns:
+            Job state, or None if unknown or expired
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        return await cache_service.get(self._key(job_id))
+    
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Request cancellation of a job
+        
+        The running worker stops at its next page or analysis batch; work
+        already done stays in the job's results.
+        
+        Args:
+            job_id: Job ID returned by submit()
+        
+        Returns:
+            Job state, or None if unknown or expired
+        """
+        job = await self.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return job
+        
+        if job_id in self._jobs:
+            self._cancelled.add(job_id)
+        else:
+            # Owned by another worker process; it checks this flag between steps
+            await cache_service.set(self._cancel_key(job_id), True, ttl=self.job_ttl)
+        return job
+    
+    def _key(self, job_id: str) -> str:
+        return f"deepscan:{job_id}"
+    
+    def _cancel_key(self, job_id: str) -> str:
+        return f"deepscan:{job_id}:cancel"
+    
+    async def _persist(self, job: Dict) -> None:
+        job["updated_at"] = time.time()
+        # Progress updates for the same job coalesce while queued
+        cache_service.set_background(self._key(job["id"]), job, ttl=self.job_ttl)
+    
+    async def _finish(self, job: Dict, status: str, error: Optional[str] = None) -> None:
+        job["status"] = status
+        job["error"] = error
+        self._cancelled.discard(job["id"])
+        await self._persist(job)
+        metrics.deep_scans.inc(outcome=status)
+    
+    async def _is_cancelled(self, job_id: str) -> bool:
+        if job_id in self._cancelled:
+            return True
+        return bool(await cache_service.get(self._cancel_key(job_id)))
+    
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Deep scan failed", extra={"job_id": job["id"]})
+                await self._finish(job, JOB_FAILED, str(e))
+            finally:
+                # Without a cache, finished jobs can only be served from memory
+                if job["status"] in TERMINAL_STATUSES and cache_service.enabled:
+                    self._jobs.pop(job["id"], None)
+    
+    async def _run(self, job: Dict) -> None:
+        """Walk the marketplace pages, then analyze bundles in batches"""
+        progress = job["progress"]
+        q, max_price = job["query"], job["max_price"]
+        
+        if await self._is_cancelled(job["id"]):
+            await self._finish(job, JOB_CANCELLED)
+            return
+        job["status"] = JOB_RUNNING
+        await self._persist(job)
+        
+        # 1. Collect listings page by page
+        listings: List[Listing] = []
+        columns = ListingColumns()
+        seen_ids: Set[str] = set()
+        for page in range(1, progress["pages_total"] + 1):
+            if await self._is_cancelled(job["id"]):
+                await self._finish(job, JOB_CANCELLED)
+                return
+            
+            items, partial = await search_page(q, max_price, page, self.page_size)
+            job["partial"] = job["partial"] or partial
+            new_items = [item for item in items if item.external_id not in seen_ids]
+            seen_ids.update(item.external_id for item in new_items)
+            listings.extend(new_items)
+            
+            # Only the new page is scored and loaded into the ranking columns
+            relevance_scorer.score_listings(q, new_items)
+            columns.extend(new_items)
+            selected = rank_columns(columns, k=self.max_results)
+            listings = [listings[index] for index in selected]
+            columns = columns.take(selected)
+            progress["pages_done"] = page
+            progress["listings"] = len(listings)
+            job["results"] = [listing.to_dict() for listing in listings]
+            await self._persist(job)
+            
+            if not new_items:
+                # Both marketplaces ran out of results
+                break
+        
+        # 2. Analyze the best-ranked distinct bundles, persisting after each batch
+        all_clusters = await cluster_listings(listings)
+        clusters = relevant_clusters(listings, all_clusters)
+        progress["skipped_irrelevant"] = len(all_clusters) - len(clusters)
+        clusters = [cluster for cluster in clusters if listings[cluster[0]].image_url][:progress["to_analyze"]]
+        progress["to_analyze"] = len(clusters)
+        # Publish the final count (and why it dropped) before analysis starts
+        job["results"] = [listing.to_dict() for listing in listings]
+        await self._persist(job)
+        
+        for start in range(0, len(clusters), self.batch_size):
+            batch = clusters[start:start + self.batch_size]
+            if not await self._wait_for_gemini(job["id"], len(batch)):
+                await self._finish(job, JOB_CANCELLED)
+                return
+            
+            analyses = await asyncio.gather(*[analyze_bundle_async(listings[cluster[0]], q) for cluster in batch])
+            for cluster, analysis in zip(batch, analyses):
+                for index in cluster:
+                    listings[index].analysis = analysis
+            
+            progress["analyzed"] += len(batch)
+            job["results"] = [listing.to_dict() for listing in listings]
+            await self._persist(job)
+        
+        # Analyzed bundles move up by profit once cluster indices are no longer needed
+        job["results"] = [listing.to_dict() for listing in rank_listings(listings)]
+        await self._finish(job, JOB_DONE)
+    
+    async def _wait_for_gemini(self, job_id: str, needed: int) -> bool:
+        """
+        Wait until the shared Gemini budget has room for a batch
+        
+        Deep scans yield to regular searches rather than pushing the budget
+        into debt. Returns False if the job was cancelled while waiting.
+        """
+        while rate_limits["gemini"].available() < needed:
+            if await self._is_cancelled(job_id):
+                return False
+            await asyncio.sleep(1)
+        return not await self._is_cancelled(job_id)
+
+
+# Singleton instance
+deep_scan_service = DeepScanService()
@@ -3,12 +3,29 @@ eBay Service - Browse API Integration
 Handles OAuth authentication and item search
 """
 
+import logging
 import os
-import httpx
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 from datetime import datetime, timedelta
 import base64
 
+from services.http import get_http_client
+from services.metrics import metrics
+from services.models import (
+    AVAILABILITY_AVAILABLE,
+    AVAILABILITY_ENDED,
+    AVAILABILITY_SOLD,
+    Listing,
+    ListingStatus,
+)
+from services.ratelimit import rate_limits
+from services.retry import with_retry
+
+logger = logging.getLogger(__name__)
+
+# Browse API getItems accepts at most 20 item IDs per call
+GET_ITEMS_BATCH = 20
+
 
 class EbayService:
     def __init__(self):
@@ -25,8 +42,11 @@ class EbayService:
         """
         # Return cached token if still valid
         if self.token and self.token_expiry and datetime.now() < self.token_expiry:
+            metrics.cache_requests.inc(tier="ebay_token", result="hit")
             return self.token
         
+        metrics.cache_requests.inc(tier="ebay_token", result="miss")
+        
         # Generate credentials
         credentials = f"{self.app_id}:{self.cert_id}"
         b64_credentials = base64.b64encode(credentials.encode()).decode()
@@ -41,22 +61,29 @@ class EbayService:
             "scope": "https://api.ebay.com/oauth/api_scope"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/identity/v1/oauth2/token",
-                headers=headers,
-                data=data
-            )
-            response.raise_for_status()
-            
-            token_data = response.json()
-            self.token = token_data["access_token"]
-            
-            # Set expiry to 5 minutes before actual expiry for safety
-            expires_in = token_data.get("expires_in", 7200)
-            self.token_expiry = datetime.now() + timedelta(seconds=expires_in - 300)
-            
-            return self.token
+        client = get_http_client()
+        
+        async def request_token():
+            with metrics.track("ebay_oauth"):
+                response = await client.post(
+                    f"{self.base_url}/identity/v1/oauth2/token",
+                    headers=headers,
+                    data=data
+                )
+                response.raise_for_status()
+                return response
+        
+        # Issuing a client-credentials token has no side effects, so the POST is safe to resend
+        response = await with_retry("ebay_oauth", request_token)
+        
+        token_data = response.json()
+        self.token = token_data["access_token"]
+        
+        # Set expiry to 5 minutes before actual expiry for safety
+        expires_in = token_data.get("expires_in", 7200)
+        self.token_expiry = datetime.now() + timedelta(seconds=expires_in - 300)
+        
+        return self.token
     
     async def get_market_price(self, item_title: str) -> Optional[float]:
         """
@@ -84,52 +111,59 @@ class EbayService:
                 "fieldgroups": "EXTENDED"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/buy/browse/v1/item_summary/search",
-                    headers=headers,
-                    params=params,
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    return None
-                
-                data = response.json()
-                items = data.get("itemSummaries", [])
-                
-                if not items:
-                    return None
-                
-                # Calculate average price from sold listings
-                prices = []
-                for item in items:
-                    if item.get("price"):
-                        try:
-                            price = float(item["price"].get("value", 0))
-                            if price > 0:
-                                prices.append(price)
-                        except (ValueError, TypeError):
-                            continue
-                
-                if prices:
-                    # Return median price (more robust than average)
-                    prices.sort()
-                    median_idx = len(prices) // 2
-                    return prices[median_idx]
-                
+            client = get_http_client()
+            
+            async def search():
+                rate_limits["ebay"].consume()
+                with metrics.track("ebay_search"):
+                    return await client.get(
+                        f"{self.base_url}/buy/browse/v1/item_summary/search",
+                        headers=headers,
+                        params=params,
+                        timeout=10.0
+                    )
+            
+            response = await with_retry("ebay_search", search)
+            if response.status_code != 200:
+                return None
+            
+            data = response.json()
+            items = data.get("itemSummaries", [])
+            
+            if not items:
                 return None
+            
+            # Calculate average price from sold listings
+            prices = []
+            for item in items:
+                if item.get("price"):
+                    try:
+                        price = float(item["price"].get("value", 0))
+                        if price > 0:
+                            prices.append(price)
+                    except (ValueError, TypeError):
+                        continue
+            
+            if prices:
+                # Return median price (more robust than average)
+                prices.sort()
+                median_idx = len(prices) // 2
+                return prices[median_idx]
+            
+            return None
         
         except Exception as e:
-            print(f"Market price lookup error: {e}")
+            logger.warning("Market price lookup error: %s", e)
             return None
     
     async def search_items(
         self,
         query: str,
         max_price: int = 100,
-        limit: int = 10
-    ) -> List[Dict]:
+        limit: int = 10,
+        sort: str = "price",
+        offset: int = 0
+    ) -> List[Listing]:
         """
         Search for used items on eBay
         
@@ -137,9 +171,11 @@ class EbayService:
             query: Search query string
             max_price: Maximum price filter
             limit: Number of results to return
+            sort: Browse API sort order ("price" or "newlyListed")
+            offset: Number of results to skip (for paging)
         
         Returns:
-            List of item dictionaries with relevant fields
+            List of listings
         """
         token = await self.get_oauth_token()
         
@@ -153,31 +189,126 @@ class EbayService:
             "q": query,
             "limit": limit,
             "filter": f"price:[..{max_price}],priceCurrency:USD,conditions:{{USED}}",
-            "sort": "price"  # Sort by price ascending (best deals first)
+            "sort": sort  # Default: price ascending (best deals first)
         }
+        if offset:
+            params["offset"] = offset
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/buy/browse/v1/item_summary/search",
-                headers=headers,
-                params=params,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            items = data.get("itemSummaries", [])
-            
-            # Filter out "Brand New" or "Sealed" items
-            filtered_items = []
-            for item in items:
-                title = item.get("title", "").lower()
-                if "brand new" not in title and "sealed" not in title:
-                    filtered_items.append(self._format_item(item))
+        client = get_http_client()
+        
+        async def search():
+            rate_limits["ebay"].consume()
+            with metrics.track("ebay_search"):
+                response = await client.get(
+                    f"{self.base_url}/buy/browse/v1/item_summary/search",
+                    headers=headers,
+                    params=params,
+                    timeout=10.0
+                )
+                response.raise_for_status()
+                return response
+        
+        response = await with_retry("ebay_search", search)
+        
+        data = response.json()
+        items = data.get("itemSummaries", [])
+        
+        # Filter out "Brand New" or "Sealed" items
+        filtered_items = []
+        for item in items:
+            title = item.get("title", "").lower()
+            if "brand new" not in title and "sealed" not in title:
+                filtered_items.append(self._format_item(item))
+        
+        return filtered_items
+    
+    async def search_new_items(
+        self,
+        query: str,
+        seen_ids: Set[str],
+        max_price: int = 100,
+        limit: int = 10
+    ) -> List[Listing]:
+        """
+        Search for listings newer than the ones already seen
+        
+        Args:
+            query: Search query string
+            seen_ids: External IDs already in the cached result set
+            max_price: Maximum price filter
+            limit: Number of results to request
+        
+        Returns:
+            Newly listed items not in seen_ids
+        """
+        items = await self.search_items(query, max_price=max_price, limit=limit, sort="newlyListed")
+        return [item for item in items if item.external_id not in seen_ids]
+    
+    async def get_item_statuses(self, item_ids: List[str]) -> Dict[str, ListingStatus]:
+        """
+        Look up current price and availability for up to 20 listings in one call
+        
+        Args:
+            item_ids: Browse API item IDs (e.g. "v1|1234567890|0")
+        
+        Returns:
+            Status per ID the API returned; all requested IDs are ended on a
+            404. An ID missing from a successful response is left out, since
+            partial responses (with warnings) omit live items too.
+        
+        Raises:
+            httpx.HTTPStatusError: If the lookup fails
+        """
+        token = await self.get_oauth_token()
+        
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "X-EBAY-C-MARKETPLACE-ID": "EBAY_US"
+        }
+        params = {"item_ids": ",".join(item_ids[:GET_ITEMS_BATCH])}
+        
+        client = get_http_client()
+        
+        async def lookup():
+            rate_limits["ebay"].consume()
+            with metrics.track("ebay_items"):
+                response = await client.get(
+                    f"{self.base_url}/buy/browse/v1/item/",
+                    headers=headers,
+                    params=params,
+                    timeout=10.0
+                )
+                # 404 means none of the IDs exist any more
+                if response.status_code != 404:
+                    response.raise_for_status()
+                return response
+        
+        response = await with_retry("ebay_items", lookup)
+        if response.status_code == 404:
+            return {
+                item_id: ListingStatus(price=None, availability=AVAILABILITY_ENDED)
+                for item_id in item_ids[:GET_ITEMS_BATCH]
+            }
+        
+        statuses = {}
+        for item in response.json().get("items", []):
+            price = None
+            if item.get("price"):
+                try:
+                    price = float(item["price"].get("value"))
+                except (ValueError, TypeError):
+                    pass
             
-            return filtered_items
+            availabilities = item.get("estimatedAvailabilities") or [{}]
+            in_stock = availabilities[0].get("estimatedAvailabilityStatus", "IN_STOCK") != "OUT_OF_STOCK"
+            statuses[item.get("itemId")] = ListingStatus(
+                price=price,
+                availability=AVAILABILITY_AVAILABLE if in_stock else AVAILABILITY_SOLD
+            )
+        
+        return statuses
     
-    def _format_item(self, item: Dict) -> Dict:
+    def _format_item(self, item: Dict) -> Listing:
         """
         Format eBay item to standardized structure
         BUNDLE BREAKER: Extract lot_size/quantity for bundles
@@ -197,17 +328,17 @@ class EbayService:
         # BUNDLE BREAKER: Extract lot size/quantity if available
         lot_size = item.get("buyingOptions", {}).get("quantity") or item.get("lotSize")
         
-        return {
-            "external_id": item.get("itemId"),
-            "title_vague": item.get("title"),
-            "price_listed": price,
-            "image_url": image_url,
-            "market_url": item.get("itemWebUrl"),
-            "marketplace": "ebay",
-            "condition": item.get("condition"),
-            "seller": item.get("seller", {}).get("username"),
-            "lot_size": lot_size
-        }
+        return Listing(
+            external_id=item.get("itemId"),
+            title_vague=item.get("title"),
+            price_listed=price,
+            image_url=image_url,
+            market_url=item.get("itemWebUrl"),
+            marketplace="ebay",
+            condition=item.get("condition"),
+            seller=item.get("seller", {}).get("username"),
+            lot_size=lot_size
+        )
 
 
 # Singleton instance
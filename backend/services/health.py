@@ -0,0 +1,96 @@
+"""
+Health Service - Dependency reachability probes
+Probes each upstream concurrently and caches the results briefly
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from services.cache import cache_service
+from services.ebay import ebay_service
+from services.http import get_http_client
+from services.vinted import vinted_service
+from services.supabase import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+
+PROBE_TIMEOUT = 3.0
+
+
+class HealthChecker:
+    def __init__(self):
+        self.cache_seconds = float(os.getenv("HEALTH_CACHE_SECONDS", "30"))
+        self._result: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def _probe_cache(self) -> str:
+        if not cache_service.enabled:
+            return "disabled"
+        return "connected" if await cache_service.ping() else "unreachable"
+    
+    async def _probe_database(self) -> str:
+        def query():
+            supabase = get_supabase_client()
+            supabase.client.table("saved_items").select("id").limit(1).execute()
+        
+        # supabase-py is synchronous; keep it off the event loop
+        await asyncio.to_thread(query)
+        return "connected"
+    
+    async def _probe_ebay(self) -> str:
+        await ebay_service.get_oauth_token()
+        return "connected"
+    
+    async def _probe_vinted(self) -> str:
+        client = get_http_client()
+        response = await client.head(vinted_service.base_url, timeout=PROBE_TIMEOUT)
+        return "connected" if response.status_code < 500 else "unreachable"
+    
+    async def _probe_gemini(self) -> str:
+        # Probing Gemini would spend quota; only report configuration
+        return "configured" if os.getenv("GOOGLE_API_KEY") else "not_configured"
+    
+    async def _run_probe(self, probe) -> str:
+        try:
+            return await asyncio.wait_for(probe(), timeout=PROBE_TIMEOUT)
+        except Exception as e:
+            logger.warning("Health probe %s failed: %s", probe.__name__, e)
+            return "unreachable"
+    
+    async def check(self) -> Dict:
+        """
+        Get dependency status, probing at most once per cache period
+        
+        Returns:
+            Dict with overall status, per-dependency status and probe age
+        """
+        async with self._lock:
+            now = time.monotonic()
+            if self._result is None or now - self._checked_at > self.cache_seconds:
+                names = ["cache", "database", "ebay", "vinted", "gemini"]
+                statuses = await asyncio.gather(
+                    self._run_probe(self._probe_cache),
+                    self._run_probe(self._probe_database),
+                    self._run_probe(self._probe_ebay),
+                    self._run_probe(self._probe_vinted),
+                    self._run_probe(self._probe_gemini),
+                )
+                self._result = dict(zip(names, statuses))
+                self._checked_at = now
+            
+            dependencies = self._result
+            healthy = all(status in ("connected", "configured", "disabled") for status in dependencies.values())
+            return {
+                "status": "healthy" if healthy else "degraded",
+                **dependencies,
+                "checked_seconds_ago": round(now - self._checked_at, 1)
+            }
+
+
+# Singleton instance
+health_checker = HealthChecker()
@@ -0,0 +1,53 @@
+"""
+HTTP Client - Shared pooled httpx client
+One connection pool for every upstream instead of a new client per call
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncBaseTransport] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it on first use
+
+    Keep-alive connections are reused across requests, so repeat calls to
+    the same upstream skip the TCP and TLS handshakes.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            transport=_transport,
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=30.0
+            )
+        )
+    return _client
+
+
+def set_transport(transport: Optional[httpx.AsyncBaseTransport]) -> None:
+    """
+    Route all upstream traffic through a custom transport
+
+    Used by the benchmark harness to substitute in-process fake upstreams.
+    Takes effect for clients created after the call.
+    """
+    global _client, _transport
+    _transport = transport
+    _client = None
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,170 @@
+"""
+Log Service - Non-blocking structured logging
+Hands log records to a background thread as JSON lines, tagged with the request ID
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+from services.metrics import metrics
+from services.tracing import current_trace
+
+
+# LogRecord attributes that are not user-supplied fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+DEFAULT_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+
+def sampled(rate: Optional[float] = None, **fields) -> Dict:
+    """
+    `extra=` for high-volume messages, kept with probability `rate`
+    
+    Args:
+        rate: Fraction of records kept (LOG_SAMPLE_RATE by default)
+        **fields: Structured fields to attach to the record
+    
+    Returns:
+        Dict to pass as the logging call's `extra`
+    """
+    return {**fields, "sample_rate": DEFAULT_SAMPLE_RATE if rate is None else rate}
+
+
+class ContextFilter(logging.Filter):
+    """Attach the current request ID and apply per-record sampling"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        trace = current_trace()
+        if trace is not None and not hasattr(record, "request_id"):
+            record.request_id = trace.request_id
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Cap how often one message template is logged
+    
+    Keyed on the unformatted message, so e.g. every "Cache GET error: %s"
+    during an Upstash outage counts against the same allowance. The number
+    of suppressed records is attached to the next one let through.
+    """
+    
+    def __init__(self, per_minute: int):
+        super().__init__()
+        self.per_minute = per_minute
+        # (logger, template) -> [window start, records in window, suppressed]
+        self._windows: Dict[Tuple[str, str], list] = {}
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_minute <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.name, str(record.msg))
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= 60:
+            suppressed = window[2] if window else 0
+            window = self._windows[key] = [now, 0, 0]
+            if suppressed:
+                record.suppressed = suppressed
+        if window[1] >= self.per_minute:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with any `extra` fields at the top level"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sample_rate":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of erroring"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now (arguments may change after
+        # the call returns) but leave JSON formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.log_records_dropped.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """
+    Route the root logger through a background queue
+    
+    Records are filtered and formatted enough to be thread-safe on the
+    calling thread; the write to stderr happens on the listener thread, so
+    a slow log collector never blocks the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    output = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    
+    handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RepeatFilter(int(os.getenv("LOG_REPEAT_PER_MINUTE", "60"))))
+    
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    # httpx logs every upstream request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
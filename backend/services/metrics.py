@@ -0,0 +1,255 @@
+"""
+Metrics Service - Prometheus text exposition
+Counters, gauges and histograms for upstream latency, cache and AI usage
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from services.tracing import record_span
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Tuple, float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Tuple, float] = {}
+    
+    def set(self, value: float, **labels: str) -> None:
+        self.values[_label_key(labels)] = value
+    
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Tuple, List[float]] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.upstream_latency = Histogram(
+            "treasurehunt_upstream_request_duration_seconds",
+            "Latency of calls to upstream services"
+        )
+        self.upstream_errors = Counter(
+            "treasurehunt_upstream_errors_total",
+            "Failed calls to upstream services"
+        )
+        self.upstream_retries = Counter(
+            "treasurehunt_upstream_retries_total",
+            "Retried calls to upstream services"
+        )
+        self.retry_budget_exhausted = Counter(
+            "treasurehunt_retry_budget_exhausted_total",
+            "Retries skipped because the shared retry budget was empty"
+        )
+        self.cache_requests = Counter(
+            "treasurehunt_cache_requests_total",
+            "Cache lookups by tier and result (hit/miss)"
+        )
+        self.ai_inflight = Gauge(
+            "treasurehunt_ai_inflight",
+            "Gemini analyses currently running"
+        )
+        self.ai_analyses = Counter(
+            "treasurehunt_ai_analyses_total",
+            "AI analyses by kind and outcome (ok/fallback)"
+        )
+        self.analysis_queue_depth = Gauge(
+            "treasurehunt_analysis_queue_depth",
+            "Bundles waiting for background analysis"
+        )
+        self.analysis_queue_dropped = Counter(
+            "treasurehunt_analysis_queue_dropped_total",
+            "Bundles not queued for background analysis because the queue was full"
+        )
+        self.relevance_skipped = Counter(
+            "treasurehunt_relevance_skipped_total",
+            "Bundles not sent for AI analysis because their title scored below RELEVANCE_MIN_SCORE"
+        )
+        self.deep_scans = Counter(
+            "treasurehunt_deep_scans_total",
+            "Deep-scan jobs by outcome (submitted/done/failed/cancelled)"
+        )
+        self.admission_decisions = Counter(
+            "treasurehunt_admission_decisions_total",
+            "Admission decisions by pool and outcome (admitted/admitted_after_wait/rejected_queue_full/rejected_timeout/skipped)"
+        )
+        self.admission_inflight = Gauge(
+            "treasurehunt_admission_inflight",
+            "Requests holding an admission slot"
+        )
+        self.admission_waiting = Gauge(
+            "treasurehunt_admission_waiting",
+            "Requests waiting for an admission slot"
+        )
+        self.admission_wait = Histogram(
+            "treasurehunt_admission_wait_seconds",
+            "Time spent waiting for an admission slot"
+        )
+        self.log_records_dropped = Counter(
+            "treasurehunt_log_records_dropped_total",
+            "Log records dropped because the log queue was full"
+        )
+        self.cache_writes = Counter(
+            "treasurehunt_cache_writes_total",
+            "Write-behind cache writes by outcome (written/failed/coalesced/dropped)"
+        )
+        self.cache_write_queue_depth = Gauge(
+            "treasurehunt_cache_write_queue_depth",
+            "Keys waiting in the write-behind cache queue"
+        )
+        self.price_checks = Counter(
+            "treasurehunt_price_checks_total",
+            "Saved-listing re-checks by marketplace and outcome (unchanged/changed/sold/ended/missing/skipped/failed)"
+        )
+        self.saved_search_evaluations = Counter(
+            "treasurehunt_saved_search_evaluations_total",
+            "Saved-search query groups by outcome (evaluated/skipped/failed)"
+        )
+        self.search_alerts = Counter(
+            "treasurehunt_search_alerts_total",
+            "Saved-search alerts fanned out to subscribers"
+        )
+        self.request_latency = Histogram(
+            "treasurehunt_http_request_duration_seconds",
+            "Latency of API requests by route"
+        )
+        self.response_size = Histogram(
+            "treasurehunt_http_response_size_bytes",
+            "Size of API responses by route",
+            buckets=SIZE_BUCKETS
+        )
+        self._metrics = [
+            self.upstream_latency,
+            self.upstream_errors,
+            self.upstream_retries,
+            self.retry_budget_exhausted,
+            self.cache_requests,
+            self.ai_inflight,
+            self.ai_analyses,
+            self.analysis_queue_depth,
+            self.analysis_queue_dropped,
+            self.relevance_skipped,
+            self.deep_scans,
+            self.admission_decisions,
+            self.admission_inflight,
+            self.admission_waiting,
+            self.admission_wait,
+            self.log_records_dropped,
+            self.cache_writes,
+            self.cache_write_queue_depth,
+            self.price_checks,
+            self.saved_search_evaluations,
+            self.search_alerts,
+            self.request_latency,
+            self.response_size,
+        ]
+    
+    @contextmanager
+    def track(self, upstream: str) -> Iterator[None]:
+        """
+        Time an upstream call; exceptions are counted as errors and re-raised
+        
+        The call is also recorded as a span of the current request trace.
+        
+        Args:
+            upstream: Upstream name (e.g. "ebay_search", "gemini")
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.upstream_errors.inc(upstream=upstream)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.upstream_latency.observe(duration, upstream=upstream)
+            record_span(upstream, start, duration)
+    
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
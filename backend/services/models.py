@@ -0,0 +1,152 @@
+"""
+Models - Shared listing and analysis representation
+Compact slotted dataclasses used from marketplace parsing to the HTTP response
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+NOT_ANALYZED = "Not analyzed"
+
+# Analysis.status values; "not_analyzed" is reported when a listing has none
+STATUS_OK = "ok"
+STATUS_NO_IMAGE = "no_image"
+STATUS_FAILED = "failed"
+STATUS_NOT_ANALYZED = "not_analyzed"
+# Left unanalyzed because the title scored too low against the query
+STATUS_IRRELEVANT = "irrelevant"
+
+# ListingStatus.availability values; only the first two are re-checked
+AVAILABILITY_AVAILABLE = "available"
+AVAILABILITY_RESERVED = "reserved"
+AVAILABILITY_SOLD = "sold"
+AVAILABILITY_ENDED = "ended"
+ACTIVE_AVAILABILITY = (AVAILABILITY_AVAILABLE, AVAILABILITY_RESERVED)
+
+
+@dataclass(slots=True)
+class Analysis:
+    """BUNDLE BREAKER result for one listing (or one duplicate cluster)"""
+    title_real: str
+    hidden_gems: List[str] = field(default_factory=list)
+    price_estimated: float = 0.0
+    confidence: str = "low"
+    reasoning: str = ""
+    status: str = STATUS_OK
+
+
+@dataclass(slots=True)
+class ListingStatus:
+    """Current price and availability of a listing, from a marketplace item lookup"""
+    price: Optional[float]
+    availability: str
+
+
+@dataclass(slots=True)
+class Listing:
+    """Marketplace listing in the standardized structure"""
+    external_id: Optional[str]
+    title_vague: str
+    price_listed: Optional[float]
+    image_url: Optional[str]
+    market_url: Optional[str]
+    marketplace: str
+    condition: Optional[str] = None
+    seller: Optional[str] = None
+    lot_size: Optional[int] = None
+    brand: Optional[str] = None
+    analysis: Optional[Analysis] = None
+    # External ID of the listing whose analysis this one shares
+    duplicate_of: Optional[str] = None
+    # Similarity of the title to the original query (0-1), set by the relevance scorer
+    relevance: Optional[float] = None
+    
+    @property
+    def profit_potential(self) -> float:
+        """Breakup value minus listing price (0 without a successful analysis)"""
+        if self.analysis is None or self.analysis.status != STATUS_OK:
+            return 0.0
+        return round(self.analysis.price_estimated - (self.price_listed or 0), 2)
+    
+    def to_dict(self) -> Dict:
+        """
+        Flatten into the API / cache shape
+        
+        Returns:
+            Listing fields merged with analysis fields; listings without an
+            analysis get the "Not analyzed" defaults
+        """
+        analysis = self.analysis
+        data = {
+            "external_id": self.external_id,
+            "title_vague": self.title_vague,
+            "price_listed": self.price_listed,
+            "image_url": self.image_url,
+            "market_url": self.market_url,
+            "marketplace": self.marketplace,
+            "condition": self.condition,
+            "seller": self.seller,
+            "lot_size": self.lot_size,
+            "brand": self.brand,
+            "title_real": analysis.title_real if analysis else self.title_vague,
+            "hidden_gems": analysis.hidden_gems if analysis else [],
+            "price_estimated": analysis.price_estimated if analysis else 0.0,
+            "profit_potential": self.profit_potential,
+            "confidence": analysis.confidence if analysis else "low",
+            "reasoning": analysis.reasoning if analysis else NOT_ANALYZED,
+            "analysis_status": analysis.status if analysis else STATUS_NOT_ANALYZED,
+            "is_bundle": True
+        }
+        if self.duplicate_of:
+            data["duplicate_of"] = self.duplicate_of
+        if self.relevance is not None:
+            data["relevance"] = round(self.relevance, 3)
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Listing":
+        """
+        Rebuild a listing from its to_dict() form (e.g. a cached result)
+        
+        Entries cached before analysis_status existed are classified from
+        their reasoning text.
+        """
+        status = data.get("analysis_status")
+        if status is None:
+            reasoning = data.get("reasoning", NOT_ANALYZED)
+            if reasoning == NOT_ANALYZED:
+                status = STATUS_NOT_ANALYZED
+            elif reasoning.startswith(("Bundle analysis failed", "No images available")):
+                status = STATUS_FAILED
+            elif reasoning.startswith("No image available"):
+                status = STATUS_NO_IMAGE
+            else:
+                status = STATUS_OK
+        
+        analysis = None
+        if status != STATUS_NOT_ANALYZED:
+            analysis = Analysis(
+                title_real=data.get("title_real") or data.get("title_vague", ""),
+                hidden_gems=data.get("hidden_gems") or [],
+                price_estimated=data.get("price_estimated") or 0.0,
+                confidence=data.get("confidence", "low"),
+                reasoning=data.get("reasoning", ""),
+                status=status
+            )
+        
+        return cls(
+            external_id=data.get("external_id"),
+            title_vague=data.get("title_vague", ""),
+            price_listed=data.get("price_listed"),
+            image_url=data.get("image_url"),
+            market_url=data.get("market_url"),
+            marketplace=data.get("marketplace", "ebay"),
+            condition=data.get("condition"),
+            seller=data.get("seller"),
+            lot_size=data.get("lot_size"),
+            brand=data.get("brand"),
+            analysis=analysis,
+            duplicate_of=data.get("duplicate_of"),
+            relevance=data.get("relevance")
+        )
@@ -0,0 +1,420 @@
+"""
+Search Pipeline - Marketplace fan-out and bundle analysis
+Shared by the search router, deep scans and the background cache warmer
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from services.ebay import ebay_service
+from services.vinted import vinted_service
+from services.ai import ai_service
+from services.dedup import find_duplicate_clusters
+from services.log import sampled
+from services.metrics import metrics
+from services.ranking import rank_listings
+from services.ratelimit import rate_limits
+from services.relevance import relevance_scorer
+from services.tracing import span
+from services.models import Analysis, Listing, STATUS_FAILED, STATUS_IRRELEVANT, STATUS_NO_IMAGE, STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+
+# BUNDLE BREAKER: keywords injected into every marketplace query
+BUNDLE_KEYWORDS = "(job lot OR bundle OR lot OR estate OR collection OR junk drawer OR spares repairs OR bulk OR mixed)"
+
+# Number of bundles sent to Gemini per search
+MAX_ANALYZED = 5
+
+# Search results stay cached for 24 hours
+SEARCH_CACHE_TTL = 86400
+
+# Searches with no matches are cached briefly so repeats skip both marketplaces
+EMPTY_RESULTS_TTL = int(os.getenv("SEARCH_EMPTY_TTL_SECONDS", "600"))
+
+# Results with failed analyses or a missing marketplace expire sooner
+DEGRADED_RESULTS_TTL = int(os.getenv("SEARCH_DEGRADED_TTL_SECONDS", "1800"))
+
+# Upper bound on a cached result set grown by incremental refreshes
+MAX_CACHED_RESULTS = 40
+
+
+@dataclass
+class SearchResult:
+    listings: List[Listing]
+    # A marketplace failed, so listings may be missing
+    partial: bool = False
+    # Cluster representatives left for background analysis
+    pending: List[Listing] = field(default_factory=list)
+    # Seconds left on the cache entry these results were refreshed from
+    # (CacheService.ttl). Refreshes keep that expiry, so cached prices and
+    # availability can't outlive it and run_search recomputes the entry.
+    expires_in: Optional[int] = None
+    
+    @property
+    def cache_ttl(self) -> int:
+        """
+        How long these results may be cached
+        
+        Returns:
+            TTL in seconds; 0 when nothing should be cached (every
+            marketplace failed, so "no results" is not a real answer, or
+            the refreshed entry has expired meanwhile)
+        """
+        if not self.listings:
+            ttl = 0 if self.partial else EMPTY_RESULTS_TTL
+        elif self.partial or has_failed_analyses(self.listings):
+            ttl = DEGRADED_RESULTS_TTL
+        else:
+            ttl = SEARCH_CACHE_TTL
+        # -1 (no expiry) and None (cache unreachable) leave the TTL as is
+        if self.expires_in is not None and self.expires_in != -1:
+            ttl = min(ttl, max(self.expires_in, 0))
+        return ttl
+
+
+async def run_search(q: str, max_price: int) -> SearchResult:
+    """
+    Run the full search pipeline for a query
+    
+    Flow:
+    1. Search eBay AND Vinted in parallel with the bundle-enhanced query
+    2. Score title relevance to q, merge and rank results (before analysis:
+       relevance, price, lot size, seller)
+    3. Analyze top relevant bundles with AI (the rest are returned as pending)
+    4. Re-rank with the analyses (profit, margin, confidence)
+    
+    Args:
+        q: Original search query
+        max_price: Maximum price filter
+    
+    Returns:
+        SearchResult with analyzed listings (empty if neither marketplace returned anything)
+    """
+    # 1. BUNDLE BREAKER: Inject bundle keywords into search query
+    enhanced_query = f"{q} {BUNDLE_KEYWORDS}"
+    
+    logger.info("Bundle query enhanced", extra=sampled(query=q, enhanced_query=enhanced_query))
+    
+    # Search both marketplaces in parallel with BUNDLE query
+    with span("marketplaces"):
+        all_items, partial = await _search_marketplaces(
+            ebay_service.search_items(query=enhanced_query, max_price=max_price, limit=10),
+            vinted_service.search_items(query=enhanced_query, max_price=max_price, limit=10)
+        )
+    
+    if not all_items:
+        return SearchResult([], partial)
+    
+    # 2. Rank candidates (closest to q, cheapest, biggest lots first until analyzed)
+    relevance_scorer.score_listings(q, all_items)
+    all_items = rank_listings(all_items)
+    
+    # 3. BUNDLE BREAKER: AI Analysis on top bundles with images
+    pending = await _analyze_items(all_items, q)
+    
+    # 4. Analyzed bundles move up by profit
+    return SearchResult(rank_listings(all_items), partial, pending)
+
+
+async def refresh_search(
+    q: str,
+    max_price: int,
+    cached_items: List[Listing],
+    expires_in: Optional[int] = None
+) -> SearchResult:
+    """
+    Incrementally refresh a cached result set
+    
+    Only listings newer than the cached ones are fetched and analyzed; they
+    are merged into the cached set by external_id and the whole set is
+    re-ranked. Cost scales with the number of new listings, not results.
+    Cached listings whose analysis failed are retried as well.
+    
+    Cached listings are not re-checked, so the refreshed set keeps the
+    cached entry's expiry; once that passes, run_search recomputes it.
+    
+    Args:
+        q: Original search query
+        max_price: Maximum price filter
+        cached_items: Previously analyzed results for this query
+        expires_in: Seconds left on the cached entry (CacheService.ttl)
+    
+    Returns:
+        SearchResult with merged and re-ranked listings
+    """
+    seen_ids = {item.external_id for item in cached_items}
+    enhanced_query = f"{q} {BUNDLE_KEYWORDS}"
+    
+    with span("marketplaces"):
+        new_items, partial = await _search_marketplaces(
+            ebay_service.search_new_items(query=enhanced_query, seen_ids=seen_ids, max_price=max_price, limit=10),
+            vinted_service.search_new_items(query=enhanced_query, seen_ids=seen_ids, max_price=max_price, limit=10)
+        )
+    
+    # Drop anything already cached (e.g. listings re-ordered upstream)
+    new_items = [item for item in new_items if item.external_id not in seen_ids]
+    
+    logger.info("Incremental refresh", extra=sampled(query=q, new_listings=len(new_items)))
+    
+    await retry_failed(cached_items, q)
+    
+    if not new_items:
+        return SearchResult(cached_items, partial, expires_in=expires_in)
+    
+    # Entries cached before relevance scoring existed are scored as well
+    relevance_scorer.score_listings(q, new_items + cached_items)
+    new_items = rank_listings(new_items)
+    pending = await _analyze_items(new_items, q)
+    
+    merged = rank_listings(new_items + cached_items, k=MAX_CACHED_RESULTS)
+    kept = {id(item) for item in merged}
+    return SearchResult(merged, partial, [item for item in pending if id(item) in kept], expires_in)
+
+
+async def search_page(q: str, max_price: int, page: int, page_size: int) -> Tuple[List[Listing], bool]:
+    """
+    Fetch one page of bundle listings from both marketplaces
+    
+    Used by deep scans, which walk many pages instead of the first few results.
+    
+    Args:
+        q: Original search query
+        max_price: Maximum price filter
+        page: Page number (1-based)
+        page_size: Listings requested per marketplace
+    
+    Returns:
+        Listings from both marketplaces and whether any marketplace failed
+    """
+    enhanced_query = f"{q} {BUNDLE_KEYWORDS}"
+    return await _search_marketplaces(
+        ebay_service.search_items(
+            query=enhanced_query, max_price=max_price, limit=page_size, offset=(page - 1) * page_size
+        ),
+        vinted_service.search_items(query=enhanced_query, max_price=max_price, limit=page_size, page=page)
+    )
+
+
+async def cluster_listings(all_items: List[Listing]) -> List[List[int]]:
+    """
+    Group near-duplicate listings and point duplicates at their representative
+    
+    Args:
+        all_items: Marketplace listings, already ranked (duplicate_of set in place)
+    
+    Returns:
+        Clusters as index lists, best-ranked cluster and member first
+    """
+    with span("dedup"):
+        clusters = await find_duplicate_clusters(all_items)
+    
+    for cluster in clusters:
+        representative_id = all_items[cluster[0]].external_id
+        for index in cluster[1:]:
+            all_items[index].duplicate_of = representative_id
+    return clusters
+
+
+def relevant_clusters(all_items: List[Listing], clusters: List[List[int]]) -> List[List[int]]:
+    """
+    Drop clusters whose representative is too loosely related to the query for an AI analysis
+    
+    The first RELEVANCE_MIN_ANALYZED clusters are always kept, so a query
+    that no title matches lexically still has its best-ranked bundles
+    analyzed. Listings in dropped clusters get an "irrelevant" analysis
+    status, which keeps them out of background analysis and tells clients
+    why they were skipped.
+    
+    Args:
+        all_items: Listings with relevance scores, already ranked (modified in place)
+        clusters: Clusters from cluster_listings
+    
+    Returns:
+        The remaining clusters, in order
+    """
+    relevant = clusters[:relevance_scorer.min_analyzed]
+    for cluster in clusters[relevance_scorer.min_analyzed:]:
+        representative = all_items[cluster[0]]
+        if relevance_scorer.is_relevant(representative.relevance):
+            relevant.append(cluster)
+            continue
+        metrics.relevance_skipped.inc()
+        _fan_out(all_items, cluster, Analysis(
+            title_real=representative.title_vague,
+            reasoning="Not analyzed: listing title doesn't match the search",
+            status=STATUS_IRRELEVANT
+        ))
+    return relevant
+
+
+def has_failed_analyses(listings: List[Listing]) -> bool:
+    """Whether any listing's analysis failed and is worth retrying"""
+    return any(listing.analysis and listing.analysis.status == STATUS_FAILED for listing in listings)
+
+
+async def retry_failed(listings: List[Listing], q: str) -> int:
+    """
+    Re-analyze bundles whose analysis failed, in place
+    
+    Only cluster representatives are sent to Gemini; duplicates pick up the
+    new analysis through duplicate_of. Retries are skipped while the Gemini
+    budget has no headroom, so a Gemini outage doesn't turn every cache hit
+    into another round of failing calls.
+    
+    Args:
+        listings: Cached listings (modified in place)
+        q: Original search query
+    
+    Returns:
+        Number of bundles re-analyzed successfully
+    """
+    failed = [
+        listing for listing in listings
+        if listing.duplicate_of is None and listing.analysis and listing.analysis.status == STATUS_FAILED
+    ][:MAX_ANALYZED]
+    if not failed or rate_limits["gemini"].available() < len(failed):
+        return 0
+    
+    with span("analysis_retry"):
+        results = await asyncio.gather(*[analyze_bundle_async(listing, q) for listing in failed])
+    
+    by_id = {listing.external_id: analysis for listing, analysis in zip(failed, results)}
+    for listing in listings:
+        analysis = by_id.get(listing.duplicate_of or listing.external_id)
+        if analysis is not None and listing.analysis and listing.analysis.status == STATUS_FAILED:
+            listing.analysis = analysis
+    return sum(analysis.status != STATUS_FAILED for analysis in results)
+
+
+async def _search_marketplaces(ebay_task, vinted_task) -> Tuple[List[Listing], bool]:
+    """
+    Await both marketplace searches, treating failures as empty results
+    
+    Returns:
+        Combined listings and whether any marketplace failed
+    """
+    ebay_items, vinted_items = await asyncio.gather(ebay_task, vinted_task, return_exceptions=True)
+    partial = isinstance(ebay_items, Exception) or isinstance(vinted_items, Exception)
+    
+    # Handle errors from marketplace searches
+    if isinstance(ebay_items, Exception):
+        logger.warning("eBay search failed: %s", ebay_items)
+        ebay_items = []
+    if isinstance(vinted_items, Exception):
+        logger.warning("Vinted search failed: %s", vinted_items)
+        vinted_items = []
+    
+    # Combine results from both marketplaces
+    return (ebay_items or []) + (vinted_items or []), partial
+
+
+async def _analyze_items(all_items: List[Listing], q: str) -> List[Listing]:
+    """
+    Analyze the first MAX_ANALYZED distinct relevant bundles in place
+    
+    Near-duplicate listings (the same lot cross-posted on both marketplaces)
+    are clustered first; each cluster is analyzed once through its
+    best-ranked listing and the result is shared by every member. Clusters
+    whose representative scored below the relevance threshold are never
+    analyzed, here or in the background. Listings left without an analysis
+    serialize as "Not analyzed".
+    
+    Args:
+        all_items: Marketplace listings, already ranked
+        q: Original search query
+    
+    Returns:
+        Representatives of the remaining clusters that have an image, for
+        the background analysis queue
+    """
+    # Duplicates are marked up front so a later analysis of any cluster can
+    # be shared through duplicate_of
+    clusters = await cluster_listings(all_items)
+    clusters = relevant_clusters(all_items, clusters)
+    
+    # Create analysis tasks for bundles with images
+    analysis_tasks = []
+    analyzed_clusters = []
+    for cluster in clusters[:MAX_ANALYZED]:
+        representative = all_items[cluster[0]]
+        if representative.image_url:
+            analysis_tasks.append(analyze_bundle_async(representative, q))
+            analyzed_clusters.append(cluster)
+        else:
+            # Skip bundles without images
+            _fan_out(all_items, cluster, Analysis(
+                title_real=representative.title_vague,
+                reasoning="No image available for bundle analysis",
+                status=STATUS_NO_IMAGE
+            ))
+    
+    # Run AI bundle analysis in parallel
+    if analysis_tasks:
+        with span("analysis"):
+            analyzed_results = await asyncio.gather(*analysis_tasks, return_exceptions=True)
+        
+        for cluster, result in zip(analyzed_clusters, analyzed_results):
+            if isinstance(result, Exception):
+                logger.warning("Bundle analysis error: %s", result)
+            else:
+                _fan_out(all_items, cluster, result)
+    
+    return [all_items[cluster[0]] for cluster in clusters[MAX_ANALYZED:] if all_items[cluster[0]].image_url]
+
+
+def _fan_out(all_items: List[Listing], cluster: List[int], analysis: Analysis) -> None:
+    """Share one analysis with every listing in a duplicate cluster"""
+    for index in cluster:
+        all_items[index].analysis = analysis
+
+
+async def analyze_bundle_async(item: Listing, original_query: str) -> Analysis:
+    """
+    BUNDLE BREAKER: Analyze a bundle/job lot with AI to find hidden gems
+    
+    Args:
+        item: Bundle listing from marketplace
+        original_query: Original search query (e.g., "Camera")
+    
+    Returns:
+        Analysis with hidden gems and breakup value
+    """
+    metrics.ai_inflight.inc()
+    try:
+        # Get AI bundle analysis
+        image_urls = [item.image_url] if item.image_url else []
+        
+        analysis = await ai_service.analyze_bundle(
+            image_urls=image_urls,
+            bundle_title=item.title_vague,
+            listed_price=item.price_listed or 0,
+            search_category=original_query
+        )
+        
+        price_estimated = analysis.get("estimated_breakup_value", 0) or 0
+        
+        return Analysis(
+            title_real=analysis.get("main_item", item.title_vague),
+            hidden_gems=analysis.get("hidden_gems", []),
+            price_estimated=round(price_estimated, 2),
+            confidence=analysis.get("confidence", "low"),
+            reasoning=analysis.get("reasoning", ""),
+            status=STATUS_FAILED if analysis.get("failed") else STATUS_OK
+        )
+    
+    except Exception as e:
+        logger.warning("Bundle analysis error: %s", e)
+        # Return bundle with no analysis on error
+        return Analysis(
+            title_real=item.title_vague,
+            reasoning=f"Bundle analysis failed: {str(e)}",
+            status=STATUS_FAILED
+        )
+    
+    finally:
+        metrics.ai_inflight.dec()
@@ -0,0 +1,80 @@
+"""
+Popularity Service - Decayed query frequency tracking
+Keeps an approximate ranking of the hottest search keys for cache warming
+"""
+
+import math
+import os
+import time
+from typing import Dict, List, Tuple
+
+
+class PopularityTracker:
+    """
+    Exponentially decayed counters keyed by search cache key
+    
+    Each hit adds 1.0 to the key's score and scores halve every
+    `half_life` seconds, so the ranking follows recent demand. Memory is
+    bounded by pruning the coldest keys once `max_keys` is exceeded.
+    """
+    
+    def __init__(self, half_life: float = 6 * 3600, max_keys: int = 5000):
+        self.decay = math.log(2) / half_life
+        self.max_keys = max_keys
+        # key -> [score, last_update, query, max_price]
+        self.entries: Dict[str, list] = {}
+    
+    def _decayed(self, entry: list, now: float) -> float:
+        return entry[0] * math.exp(-self.decay * (now - entry[1]))
+    
+    def record(self, key: str, query: str, max_price: int) -> None:
+        """
+        Count one search for a cache key
+        
+        Args:
+            key: Cache key built by CacheService.build_search_key
+            query: Original query, kept so the key can be recomputed later
+            max_price: Maximum price filter for the key
+        """
+        now = time.time()
+        entry = self.entries.get(key)
+        
+        if entry:
+            entry[0] = self._decayed(entry, now) + 1.0
+            entry[1] = now
+        else:
+            self.entries[key] = [1.0, now, query, max_price]
+            if len(self.entries) > self.max_keys:
+                self._prune(now)
+    
+    def _prune(self, now: float) -> None:
+        """Drop the coldest quarter of keys"""
+        ranked = sorted(self.entries.items(), key=lambda kv: self._decayed(kv[1], now))
+        for key, _ in ranked[: len(ranked) // 4]:
+            del self.entries[key]
+    
+    def top(self, n: int, min_score: float = 0.0) -> List[Tuple[str, str, int, float]]:
+        """
+        Get the hottest keys
+        
+        Args:
+            n: Number of keys to return
+            min_score: Ignore keys whose decayed score is below this
+        
+        Returns:
+            List of (key, query, max_price, score), hottest first
+        """
+        now = time.time()
+        scored = [
+            (key, entry[2], entry[3], self._decayed(entry, now))
+            for key, entry in self.entries.items()
+        ]
+        scored = [item for item in scored if item[3] >= min_score]
+        scored.sort(key=lambda item: item[3], reverse=True)
+        return scored[:n]
+
+
+# Singleton instance
+popularity_tracker = PopularityTracker(
+    half_life=float(os.getenv("POPULARITY_HALF_LIFE_SECONDS", str(6 * 3600)))
+)
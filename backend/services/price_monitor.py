@@ -0,0 +1,296 @@
+"""
+Price Monitor - Background re-checks of saved listings
+Polls eBay and Vinted for price and availability changes on watchlist items and writes them back in bulk
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from services.ebay import ebay_service, GET_ITEMS_BATCH
+from services.metrics import metrics
+from services.models import ACTIVE_AVAILABILITY, AVAILABILITY_AVAILABLE, AVAILABILITY_ENDED, ListingStatus
+from services.ratelimit import rate_limits, TokenBucket
+from services.saved_items import saved_items_cache
+from services.supabase import get_supabase_client, supabase_configured
+from services.vinted import vinted_service
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between ticks while they keep failing
+MAX_ERROR_BACKOFF = 3600
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class PriceMonitor:
+    """
+    Re-checks saved listings on an adaptive schedule
+    
+    Each tick claims the most overdue saved_items rows, looks each distinct
+    (marketplace, external_id) up once however many users saved it (eBay in
+    batches of 20, Vinted one call per item), and writes every row's result
+    back in a single update. Rows whose lookup was skipped or failed stay
+    claimed until their lease runs out and are then picked up again.
+    """
+    
+    def __init__(self):
+        default = "true" if supabase_configured() else "false"
+        self.enabled = os.getenv("PRICE_MONITOR_ENABLED", default).lower() == "true"
+        self.interval = float(os.getenv("PRICE_MONITOR_INTERVAL_SECONDS", "300"))
+        self.batch_size = int(os.getenv("PRICE_MONITOR_BATCH_SIZE", "200"))
+        self.lease = int(os.getenv("PRICE_MONITOR_LEASE_SECONDS", "900"))
+        self.vinted_concurrency = int(os.getenv("PRICE_MONITOR_VINTED_CONCURRENCY", "4"))
+        
+        # Re-check schedule: high-profit listings are checked more often,
+        # listings that keep coming back unchanged less often
+        self.min_check = int(os.getenv("PRICE_MONITOR_MIN_INTERVAL_SECONDS", "3600"))
+        self.base_check = int(os.getenv("PRICE_MONITOR_BASE_INTERVAL_SECONDS", "21600"))
+        self.max_check = int(os.getenv("PRICE_MONITOR_MAX_INTERVAL_SECONDS", "604800"))
+        self.profit_scale = float(os.getenv("PRICE_MONITOR_PROFIT_SCALE", "50"))
+        self.backoff = float(os.getenv("PRICE_MONITOR_BACKOFF", "1.5"))
+        # Consecutive lookups an eBay item may be missing from before it is
+        # treated as ended; until then it is retried on the backoff schedule
+        self.missing_checks = int(os.getenv("PRICE_MONITOR_MISSING_CHECKS", "3"))
+        
+        # Share of each marketplace budget the monitor may use, on top of
+        # the shared bucket having headroom
+        share = float(os.getenv("PRICE_MONITOR_BUDGET_SHARE", "0.2"))
+        self.budgets = {
+            marketplace: TokenBucket(
+                rate_limits[marketplace].rate * 60 * share,
+                capacity=max(rate_limits[marketplace].capacity * share, 1.0)
+            )
+            for marketplace in ("ebay", "vinted")
+        }
+        
+        # (marketplace, external_id) -> consecutive lookups it was missing from
+        self._missing: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the background re-check loop"""
+        if not self.enabled or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background re-check loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            # Back off while ticks keep failing (e.g. the SETUP.md functions
+            # are missing) instead of logging a traceback every interval
+            await asyncio.sleep(min(self.interval * 2 ** min(failures, 10), MAX_ERROR_BACKOFF))
+            try:
+                checked = await self.run_once()
+                if checked:
+                    logger.info("Price monitor re-checked %d saved listings", checked)
+                failures = 0
+            except Exception as e:
+                if not failures:
+                    logger.exception("Price monitor error")
+                else:
+                    logger.warning("Price monitor still failing (%d in a row): %s", failures + 1, e)
+                failures += 1
+    
+    def _has_budget(self, marketplace: str) -> bool:
+        """Whether one more lookup fits in the shared budget and the monitor's share"""
+        if rate_limits[marketplace].available() < 1:
+            return False
+        return self.budgets[marketplace].try_acquire()
+    
+    async def _check_ebay(self, item_ids: List[str]) -> Tuple[Dict[str, ListingStatus], List[str]]:
+        """
+        Returns:
+            Statuses found, and IDs a successful lookup did not return
+        """
+        statuses: Dict[str, ListingStatus] = {}
+        missing: List[str] = []
+        for start in range(0, len(item_ids), GET_ITEMS_BATCH):
+            batch = item_ids[start:start + GET_ITEMS_BATCH]
+            if not self._has_budget("ebay"):
+                metrics.price_checks.inc(len(item_ids) - start, marketplace="ebay", outcome="skipped")
+                break
+            try:
+                found = await ebay_service.get_item_statuses(batch)
+            except Exception as e:
+                metrics.price_checks.inc(len(batch), marketplace="ebay", outcome="failed")
+                logger.warning("Price monitor eBay lookup error: %s", e)
+                continue
+            statuses.update(found)
+            missing.extend(item_id for item_id in batch if item_id not in found)
+        return statuses, missing
+    
+    async def _check_vinted(self, item_ids: List[str]) -> Dict[str, ListingStatus]:
+        allowed = []
+        for item_id in item_ids:
+            if not self._has_budget("vinted"):
+                metrics.price_checks.inc(len(item_ids) - len(allowed), marketplace="vinted", outcome="skipped")
+                break
+            allowed.append(item_id)
+        
+        semaphore = asyncio.Semaphore(self.vinted_concurrency)
+        statuses: Dict[str, ListingStatus] = {}
+        
+        async def check(item_id: str) -> None:
+            async with semaphore:
+                try:
+                    statuses[item_id] = await vinted_service.get_item_status(item_id)
+                except Exception as e:
+                    metrics.price_checks.inc(marketplace="vinted", outcome="failed")
+                    logger.warning("Price monitor Vinted lookup error: %s", e)
+        
+        await asyncio.gather(*(check(item_id) for item_id in allowed))
+        return statuses
+    
+    def next_interval(self, row: Dict, price: Optional[float], changed: bool, now: datetime) -> timedelta:
+        """
+        Pick when a saved listing is checked next
+        
+        Args:
+            row: saved_items row being updated
+            price: Current listing price
+            changed: Whether price or availability changed on this check
+            now: Time of this check
+        
+        Returns:
+            Delay until the next check
+        """
+        profit = max(float(row.get("price_estimated") or 0) - float(price or 0), 0)
+        seconds = self.base_check / (1 + profit / self.profit_scale)
+        
+        # Unchanged listings back off from the gap since their last check
+        last_checked = _parse_time(row.get("checked_at"))
+        if not changed and last_checked is not None:
+            seconds = max(seconds, (now - last_checked).total_seconds() * self.backoff)
+        
+        return timedelta(seconds=min(max(seconds, self.min_check), self.max_check))
+    
+    def _update(self, row: Dict, status: ListingStatus, now: datetime) -> Tuple[Dict, str]:
+        previous_price = row.get("price_current")
+        if previous_price is None:
+            previous_price = row.get("price_listed")
+        price = status.price if status.price is not None else previous_price
+        
+        availability_changed = status.availability != (row.get("availability") or AVAILABILITY_AVAILABLE)
+        price_changed = (
+            price is not None and previous_price is not None
+            and abs(float(price) - float(previous_price)) >= 0.01
+        )
+        
+        if status.availability not in ACTIVE_AVAILABILITY:
+            outcome = status.availability
+            next_check = None
+        else:
+            outcome = "changed" if availability_changed or price_changed else "unchanged"
+            next_check = (now + self.next_interval(row, price, outcome == "changed", now)).isoformat()
+        
+        update = {
+            "id": row["id"],
+            "price_current": price,
+            "availability": status.availability,
+            "checked_at": now.isoformat(),
+            "next_check_at": next_check,
+        }
+        return update, outcome
+    
+    def _retry_later(self, row: Dict, now: datetime) -> Dict:
+        """Reschedule a row whose lookup gave no answer, keeping its last known state"""
+        price = row.get("price_current")
+        if price is None:
+            price = row.get("price_listed")
+        next_check = now + self.next_interval(row, price, False, now)
+        return {
+            "id": row["id"],
+            "price_current": row.get("price_current"),
+            "availability": row.get("availability") or AVAILABILITY_AVAILABLE,
+            "checked_at": row.get("checked_at"),
+            "next_check_at": next_check.isoformat(),
+        }
+    
+    async def run_once(self) -> int:
+        """
+        Claim, look up and write back one batch of due saved listings
+        
+        Returns:
+            Number of distinct listings looked up
+        """
+        supabase = get_supabase_client()
+        rows = await supabase.claim_price_checks(self.batch_size, self.lease)
+        if not rows:
+            return 0
+        
+        # Users who saved the same listing share one lookup
+        groups: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        for row in rows:
+            groups[(row.get("marketplace") or "ebay", row["external_id"])].append(row)
+        
+        ids = defaultdict(list)
+        for marketplace, external_id in groups:
+            ids[marketplace].append(external_id)
+        
+        statuses: Dict[Tuple[str, str], ListingStatus] = {}
+        ebay_statuses, ebay_missing = await self._check_ebay(ids["ebay"])
+        for external_id, status in ebay_statuses.items():
+            statuses[("ebay", external_id)] = status
+        for external_id, status in (await self._check_vinted(ids["vinted"])).items():
+            statuses[("vinted", external_id)] = status
+        
+        now = datetime.now(timezone.utc)
+        updates = []
+        changed_users = set()
+        for external_id in ebay_missing:
+            key = ("ebay", external_id)
+            misses = self._missing.get(key, 0) + 1
+            if misses >= self.missing_checks:
+                # Missing from several lookups in a row: treat as ended
+                statuses[key] = ListingStatus(price=None, availability=AVAILABILITY_ENDED)
+                continue
+            self._missing[key] = misses
+            updates.extend(self._retry_later(row, now) for row in groups[key])
+            metrics.price_checks.inc(marketplace="ebay", outcome="missing")
+        
+        for (marketplace, external_id), group in groups.items():
+            status = statuses.get((marketplace, external_id))
+            if status is None:
+                continue
+            self._missing.pop((marketplace, external_id), None)
+            outcomes = set()
+            for row in group:
+                update, outcome = self._update(row, status, now)
+                updates.append(update)
+                outcomes.add(outcome)
+                if outcome != "unchanged":
+                    changed_users.add(row["user_id"])
+            outcome = next((outcome for outcome in outcomes if outcome != "unchanged"), "unchanged")
+            metrics.price_checks.inc(marketplace=marketplace, outcome=outcome)
+        
+        if updates:
+            await supabase.apply_price_checks(updates)
+            for user_id in changed_users:
+                await saved_items_cache.invalidate(user_id)
+        
+        return len(statuses)
+
+
+# Singleton instance
+price_monitor = PriceMonitor()
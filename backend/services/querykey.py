@@ -0,0 +1,95 @@
+"""
+Query Key Service - Canonical search keys
+Folds equivalent queries and nearby price limits onto the same cache entry
+"""
+
+import os
+import re
+import unicodedata
+from typing import List
+
+
+STOPWORDS = frozenset({"a", "an", "the", "and", "of", "for", "with", "in", "on", "to", "by", "from"})
+
+# Upstream searches run at the bucket ceiling; responses are filtered down
+# to the requested max_price locally
+PRICE_BUCKETS = tuple(sorted(
+    int(value) for value in os.getenv("SEARCH_PRICE_BUCKETS", "10,25,50,75,100,150,200,300,500,1000").split(",")
+))
+
+FOLD_STOPWORDS = os.getenv("QUERY_FOLD_STOPWORDS", "true").lower() == "true"
+FOLD_PLURALS = os.getenv("QUERY_FOLD_PLURALS", "true").lower() == "true"
+
+# Letters and digits in any script; inner apostrophes, dots and hyphens join
+_TOKEN_RE = re.compile(r"[^\W_]+(?:['.-][^\W_]+)*")
+
+
+def _normalize(text: str) -> str:
+    """NFKC then casefold, so full-width, composed and cased forms compare equal"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _singular(token: str) -> str:
+    """Best-effort plural folding; only has to be consistent, not correct English"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def query_tokens(text: str) -> List[str]:
+    """
+    Lowercased word tokens with stopwords and plurals folded, in text order
+    
+    Args:
+        text: Query or listing title
+    
+    Returns:
+        Tokens (may repeat)
+    """
+    tokens = _TOKEN_RE.findall(_normalize(text))
+    if FOLD_STOPWORDS:
+        # A query made only of stopwords keeps them rather than becoming empty
+        tokens = [token for token in tokens if token not in STOPWORDS] or tokens
+    if FOLD_PLURALS:
+        tokens = [_singular(token) for token in tokens]
+    return tokens
+
+
+def canonical_query(query: str) -> str:
+    """
+    Normalize a query so word order, spacing and case don't matter
+    
+    Args:
+        query: Raw search query
+    
+    Returns:
+        Casefolded, de-duplicated, sorted tokens joined by single spaces; a
+        query with no word characters falls back to its whitespace-collapsed
+        form so it still gets a key of its own
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return " ".join(_normalize(query).split())
+    return " ".join(sorted(set(tokens)))
+
+
+def price_bucket(max_price: int) -> int:
+    """
+    Round a price limit up to its bucket ceiling
+    
+    Above the largest bucket, limits round up to a multiple of it.
+    """
+    for bucket in PRICE_BUCKETS:
+        if max_price <= bucket:
+            return bucket
+    top = PRICE_BUCKETS[-1]
+    return -(-max_price // top) * top
+
+
+def higher_buckets(bucket: int, count: int) -> List[int]:
+    """The next `count` buckets above `bucket`, nearest first"""
+    return [value for value in PRICE_BUCKETS if value > bucket][:count]
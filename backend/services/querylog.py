@@ -0,0 +1,155 @@
+"""
+Query Log Service - Opt-in capture of request shapes for capacity testing
+Appends anonymized search/items requests (and optionally marketplace responses) to JSONL logs
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from services.http import set_transport
+
+logger = logging.getLogger(__name__)
+
+
+# Only marketplace search responses are worth replaying; auth, cache and
+# image traffic is served by the benchmark fakes
+RECORDED_PATHS = ("/buy/browse/v1/item_summary/search", "/api/v2/catalog/items")
+FLUSH_EVERY = 50
+
+
+def upstream_key(request: httpx.Request) -> str:
+    """Stable lookup key for a recorded upstream response"""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.url.params.multi_items()))
+    return f"{request.method} {request.url.host}{request.url.path}?{params}"
+
+
+class JsonlWriter:
+    """Buffered append-only JSONL file; writes happen off the event loop"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._buffer: List[Dict] = []
+        self._lock = asyncio.Lock()
+        # Held so the pending flush isn't garbage-collected; at most one at a time
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def append(self, entry: Dict) -> None:
+        self._buffer.append(entry)
+        if len(self._buffer) >= FLUSH_EVERY and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+    
+    def _write(self, entries: List[Dict]) -> None:
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+    
+    async def flush(self) -> None:
+        async with self._lock:
+            entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+            try:
+                await asyncio.to_thread(self._write, entries)
+            except Exception as e:
+                logger.warning("Query log write error: %s", e)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Pass-through transport that records marketplace search responses"""
+    
+    def __init__(self, writer: JsonlWriter, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.writer = writer
+        self.inner = inner or httpx.AsyncHTTPTransport()
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        if not request.url.path.startswith(RECORDED_PATHS):
+            return response
+        
+        content = await response.aread()
+        await response.aclose()
+        elapsed = time.perf_counter() - start
+        self.writer.append({
+            "k": upstream_key(request),
+            "s": response.status_code,
+            "ms": round(elapsed * 1000, 1),
+            "b": base64.b64encode(content).decode(),
+        })
+        # Body is already decoded, so drop the transfer headers that described it
+        headers = [
+            (name, value) for name, value in response.headers.items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+    
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class QueryLog:
+    def __init__(self):
+        self.enabled = os.getenv("QUERY_LOG_ENABLED", "false").lower() == "true"
+        self.record_upstreams = os.getenv("QUERY_LOG_RECORD_UPSTREAMS", "false").lower() == "true"
+        # Without a fixed salt, user hashes only correlate within one process
+        self._salt = os.getenv("QUERY_LOG_SALT", "").encode() or secrets.token_bytes(16)
+        self.requests = JsonlWriter(os.getenv("QUERY_LOG_PATH", "query_log.jsonl"))
+        self.upstreams = JsonlWriter(os.getenv("QUERY_LOG_UPSTREAM_PATH", "upstream_log.jsonl"))
+    
+    def start(self) -> None:
+        """Route upstream traffic through the recorder when enabled"""
+        if self.enabled and self.record_upstreams:
+            set_transport(RecordingTransport(self.upstreams))
+    
+    async def stop(self) -> None:
+        """Flush buffered entries"""
+        await self.requests.flush()
+        await self.upstreams.flush()
+    
+    def _anonymize(self, user_id: str) -> str:
+        return hmac.new(self._salt, user_id.encode(), hashlib.sha256).hexdigest()[:12]
+    
+    def record_search(self, query: str, max_price: int, outcome: str) -> None:
+        """
+        Log one search request
+        
+        Args:
+            query: Search query (normalized the same way as the cache key)
+            max_price: Price filter
+            outcome: Cache outcome - "hit", "miss" or "refresh"
+        """
+        if self.enabled:
+            self.requests.append({
+                "t": round(time.time(), 3),
+                "e": "search",
+                "q": query.lower().strip(),
+                "p": max_price,
+                "c": outcome,
+            })
+    
+    def record_items(self, user_id: str) -> None:
+        """
+        Log one saved-items read; the user id is replaced by a salted hash
+        
+        Args:
+            user_id: Authenticated user ID
+        """
+        if self.enabled:
+            self.requests.append({
+                "t": round(time.time(), 3),
+                "e": "items",
+                "u": self._anonymize(user_id),
+            })
+
+
+# Singleton instance
+query_log = QueryLog()
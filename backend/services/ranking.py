@@ -0,0 +1,230 @@
+"""
+Ranking Service - Columnar multi-factor scoring of listings
+Loads candidates into NumPy arrays, scores them with configurable weights and selects the top K in bulk
+"""
+
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from services.models import Listing, STATUS_OK
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# numpy is imported on first use, inside the functions below: it accounts for
+# about 100ms of every worker's import time, and the first ranking happens
+# after startup
+
+
+# Weight of the AI's confidence in a breakup estimate
+CONFIDENCE_WEIGHTS = {"high": 1.0, "medium": 0.6, "low": 0.3}
+
+# Margin ratio is clipped so a near-free listing can't dominate the ranking
+MAX_MARGIN = 10.0
+
+
+@dataclass(frozen=True, slots=True)
+class RankingWeights:
+    """
+    Per-feature weights; a listing's score is the weighted sum of its features
+    
+    profit is in currency units, margin is profit / price, confidence is
+    0-1, lot_size is log(1 + items in the lot), seller_repeat is
+    log(1 + other candidates from the same seller), price is the listed
+    price and relevance is the 0-1 title/query similarity (0 when not
+    scored). Listings without a successful analysis have zero profit, margin
+    and confidence, so before analysis the ranking is driven by relevance,
+    price, lot size and seller.
+    """
+    profit: float = 1.0
+    margin: float = 10.0
+    confidence: float = 10.0
+    lot_size: float = 2.0
+    seller_repeat: float = -2.0
+    price: float = -0.1
+    relevance: float = 50.0
+    
+    @classmethod
+    def from_env(cls) -> "RankingWeights":
+        defaults = cls()
+        return cls(**{
+            name: float(os.getenv(f"RANK_WEIGHT_{name.upper()}", str(getattr(defaults, name))))
+            for name in cls.__dataclass_fields__
+        })
+
+
+DEFAULT_WEIGHTS = RankingWeights.from_env()
+
+
+class ListingColumns:
+    """
+    Struct-of-arrays view of a candidate list, one float64 column per feature
+    
+    Building the columns is the only per-listing Python work; callers that
+    re-rank a growing list (deep scans, page by page) `extend` the columns
+    with new listings and `take` the survivors instead of rebuilding.
+    """
+    
+    __slots__ = ("price", "has_price", "estimated", "confidence", "lot_size", "relevance", "seller_codes", "_sellers")
+    
+    def __init__(self, listings: List[Listing] = ()):
+        self._sellers: Dict[str, int] = {}
+        (self.price, self.has_price, self.estimated, self.confidence, self.lot_size, self.relevance,
+         self.seller_codes) = self._extract(listings)
+    
+    def __len__(self) -> int:
+        return len(self.price)
+    
+    def _extract(self, listings: List[Listing]) -> tuple:
+        import numpy as np
+        
+        # One pass over the objects; everything after it is array arithmetic.
+        # Sellers become integer codes so repeats can be counted with bincount.
+        nan = np.nan
+        sellers = self._sellers
+        rows = []
+        codes = []
+        for item in listings:
+            analysis = item.analysis
+            # Only successful analyses count; the rest have no estimate to
+            # compare against, so their profit comes out as zero
+            if analysis is not None and analysis.status == STATUS_OK:
+                estimated = analysis.price_estimated
+                confidence = CONFIDENCE_WEIGHTS.get(analysis.confidence, 0.0)
+            else:
+                estimated = nan
+                confidence = 0.0
+            price = item.price_listed
+            rows.append((nan if price is None else price, estimated, confidence, item.lot_size or 0, item.relevance or 0.0))
+            codes.append(sellers.setdefault(item.seller, len(sellers)) if item.seller else -1)
+        
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), 5)
+        has_price = ~np.isnan(table[:, 0])
+        price = np.nan_to_num(table[:, 0])
+        estimated = np.where(np.isnan(table[:, 1]), price, table[:, 1])
+        return (
+            price, has_price, estimated, table[:, 2], np.maximum(table[:, 3], 0.0), table[:, 4],
+            np.array(codes, dtype=np.int64)
+        )
+    
+    def extend(self, listings: List[Listing]) -> None:
+        """Append columns for more listings"""
+        import numpy as np
+        for name, column in zip(self.__slots__[:7], self._extract(listings)):
+            setattr(self, name, np.concatenate((getattr(self, name), column)))
+    
+    def take(self, indices: "np.ndarray") -> "ListingColumns":
+        """Columns for the listings at `indices`, in that order"""
+        subset = ListingColumns.__new__(ListingColumns)
+        subset._sellers = self._sellers
+        for name in self.__slots__[:7]:
+            setattr(subset, name, getattr(self, name)[indices])
+        return subset
+    
+    def seller_repeat(self) -> "np.ndarray":
+        """Other candidates from the same seller, per listing"""
+        import numpy as np
+        codes = self.seller_codes
+        has_seller = codes >= 0
+        counts = np.bincount(codes[has_seller], minlength=len(self._sellers))
+        return np.where(has_seller, counts[np.where(has_seller, codes, 0)] - 1, 0).astype(np.float64)
+    
+    def scores(self, weights: RankingWeights = DEFAULT_WEIGHTS) -> "np.ndarray":
+        """
+        Weighted score per listing (higher is better)
+        
+        Args:
+            weights: Feature weights
+        
+        Returns:
+            float64 array aligned with the input listings
+        """
+        import numpy as np
+        profit = self.estimated - self.price
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margin = np.where(self.price > 0, profit / self.price, 0.0)
+        np.clip(margin, -1.0, MAX_MARGIN, out=margin)
+        
+        return (
+            weights.profit * profit
+            + weights.margin * margin
+            + weights.confidence * self.confidence
+            + weights.lot_size * np.log1p(self.lot_size)
+            + weights.seller_repeat * np.log1p(self.seller_repeat())
+            + weights.price * self.price
+            + weights.relevance * self.relevance
+        )
+
+
+def top_k(scores: "np.ndarray", k: Optional[int] = None, mask: Optional["np.ndarray"] = None) -> "np.ndarray":
+    """
+    Indices of the k best scores, best first
+    
+    Only the selected indices are sorted: partitioning finds the k-th best
+    score in linear time, so cost is O(n + k log k) rather than O(n log n).
+    
+    Args:
+        scores: Score per candidate
+        k: Number to keep (all by default)
+        mask: Candidates eligible for selection (all by default)
+    
+    Returns:
+        int array of candidate indices; equal scores keep input order
+    """
+    import numpy as np
+    candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(scores))
+    if k is not None and k < len(candidates):
+        if k <= 0:
+            return candidates[:0]
+        # Keep every candidate tied with the k-th best, so ties at the cut
+        # are broken by input order like the rest
+        kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[scores[candidates] >= kth]
+    return candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+
+
+def rank_listings(
+    listings: List[Listing],
+    k: Optional[int] = None,
+    max_price: Optional[float] = None,
+    weights: RankingWeights = DEFAULT_WEIGHTS
+) -> List[Listing]:
+    """
+    Rank listings by weighted score, best first
+    
+    Args:
+        listings: Candidates
+        k: Keep only the k best (all by default)
+        max_price: Drop listings priced above this
+        weights: Feature weights
+    
+    Returns:
+        New list of the selected listings; listings without a price go last
+    """
+    if not listings:
+        return []
+    return [listings[index] for index in rank_columns(ListingColumns(listings), k, max_price, weights)]
+
+
+def rank_columns(
+    columns: ListingColumns,
+    k: Optional[int] = None,
+    max_price: Optional[float] = None,
+    weights: RankingWeights = DEFAULT_WEIGHTS
+) -> "np.ndarray":
+    """
+    rank_listings over columns that are already built
+    
+    Returns:
+        Indices of the selected listings, best first
+    """
+    import numpy as np
+    # Unpriced listings sort after every priced one
+    scores = np.where(columns.has_price, columns.scores(weights), -np.inf)
+    
+    mask = None
+    if max_price is not None:
+        mask = ~columns.has_price | (columns.price <= max_price)
+    
+    return top_k(scores, k, mask)
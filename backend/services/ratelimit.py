@@ -0,0 +1,74 @@
+"""
+Rate Limit Service - Upstream call budgets
+Tracks how much of each upstream's request budget (eBay, Vinted, Gemini) is in use
+"""
+
+import os
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`
+    
+    User-facing calls `consume()` unconditionally so searches are never
+    throttled by the budget; they simply put the bucket into debt. Background
+    work uses `try_acquire()` and only proceeds while there is headroom.
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(rate_per_minute, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def available(self) -> float:
+        """Tokens currently available (negative when in debt)"""
+        self._refill()
+        return self.tokens
+    
+    def consume(self, tokens: float = 1.0) -> None:
+        """
+        Record usage without waiting
+        
+        Debt is capped at one bucket's worth so a burst of foreground traffic
+        only blocks background work for about a minute.
+        """
+        self._refill()
+        self.tokens = max(self.tokens - tokens, -self.capacity)
+    
+    def try_acquire(self, tokens: float = 1.0, reserve: float = 0.0) -> bool:
+        """
+        Take tokens only if at least `reserve` tokens remain afterwards
+        
+        Args:
+            tokens: Number of tokens needed
+            reserve: Tokens that must be left for foreground traffic
+        
+        Returns:
+            True if the tokens were taken, False otherwise
+        """
+        self._refill()
+        if self.tokens - tokens < reserve:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+# Worker processes sharing the budgets (set by serve.py); each process tracks
+# its own buckets, so each gets an equal slice of every upstream limit
+WORKERS = max(int(os.getenv("SERVE_WORKERS", "1")), 1)
+
+# Per-upstream budgets. Defaults follow the public limits:
+# eBay Browse API 5000 calls/day, Gemini Flash free tier 15 RPM.
+rate_limits: Dict[str, TokenBucket] = {
+    "ebay": TokenBucket(float(os.getenv("EBAY_RATE_PER_MINUTE", "3")) / WORKERS),
+    "vinted": TokenBucket(float(os.getenv("VINTED_RATE_PER_MINUTE", "30")) / WORKERS),
+    "gemini": TokenBucket(float(os.getenv("GEMINI_RATE_PER_MINUTE", "15")) / WORKERS),
+}
@@ -0,0 +1,234 @@
+"""
+Relevance Service - Local query/title relevance scoring
+Hashed TF-IDF vectors over listing titles, compared to the original query by cosine similarity
+"""
+
+import asyncio
+import logging
+import os
+import zlib
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from services.cache import cache_service
+from services.models import Listing
+from services.querykey import query_tokens
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Document-frequency snapshot shared by workers and restarts
+SNAPSHOT_KEY = "relevance:df"
+SNAPSHOT_TTL = 30 * 86400
+
+
+@lru_cache(maxsize=8192)
+def _features(text: str, bits: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Hashed features of a text: whole words plus character trigrams
+    
+    Trigrams let "nikkor" partly match "nikon" and survive typos and
+    run-together words. Buckets come from crc32, which (unlike hash()) is
+    stable across processes, so snapshots stay valid between workers.
+    
+    Returns:
+        Sorted unique bucket indices and their sublinear term frequencies
+    """
+    # Imported on first use, as in services/ranking.py, to keep it out of startup
+    import numpy as np
+    
+    mask = (1 << bits) - 1
+    buckets = []
+    for token in query_tokens(text):
+        buckets.append(zlib.crc32(b"w:" + token.encode()) & mask)
+        padded = f"#{token}#".encode()
+        buckets.extend(zlib.crc32(padded[i:i + 3]) & mask for i in range(len(padded) - 2))
+    unique, counts = np.unique(np.array(buckets, dtype=np.int64), return_counts=True)
+    return unique, 1.0 + np.log(counts)
+
+
+class RelevanceScorer:
+    """
+    Scores how closely listing titles match the user's original query
+    
+    The bundle keywords OR-ed into every marketplace query pull in many
+    listings that only match "job lot" or "bundle"; those share few
+    features with the query itself. Titles are hashed into a fixed number
+    of buckets, so memory stays constant however large the vocabulary
+    grows. Document frequencies are updated incrementally from every
+    freshly fetched listing and halved once `max_docs` titles have been
+    seen, so IDF follows recent listings: words every bundle title uses
+    ("lot", "mixed", "spares") end up with little weight.
+    """
+    
+    def __init__(self):
+        self.enabled = os.getenv("RELEVANCE_ENABLED", "true").lower() == "true"
+        # Listings scoring below this are not sent for AI analysis...
+        self.min_score = float(os.getenv("RELEVANCE_MIN_SCORE", "0.1"))
+        # ...except the best-ranked few bundles of each search, so a query
+        # no title matches lexically still gets some analyses
+        self.min_analyzed = int(os.getenv("RELEVANCE_MIN_ANALYZED", "2"))
+        self.bits = int(os.getenv("RELEVANCE_HASH_BITS", "18"))
+        self.max_docs = float(os.getenv("RELEVANCE_DECAY_DOCS", "100000"))
+        # Titles observed between snapshot writes
+        self.snapshot_every = int(os.getenv("RELEVANCE_SNAPSHOT_EVERY", "500"))
+        
+        # Allocated on first use (see _counts)
+        self.df: Optional["np.ndarray"] = None
+        self.docs = 0.0
+        self._unsaved = 0
+        self._load_task: Optional[asyncio.Task] = None
+    
+    def _counts(self) -> "np.ndarray":
+        """Document frequency per feature bucket"""
+        if self.df is None:
+            import numpy as np
+            self.df = np.zeros(1 << self.bits, dtype=np.float64)
+        return self.df
+    
+    def start(self) -> None:
+        """Load the shared document-frequency snapshot in the background"""
+        if not self.enabled or not cache_service.enabled or self._load_task:
+            return
+        self._load_task = asyncio.create_task(self.load())
+    
+    async def stop(self) -> None:
+        """Write the current statistics back for the next start"""
+        if self._load_task:
+            self._load_task.cancel()
+            try:
+                await self._load_task
+            except asyncio.CancelledError:
+                pass
+            self._load_task = None
+        if self.enabled and self._unsaved:
+            await cache_service.set(SNAPSHOT_KEY, self._snapshot(), ttl=SNAPSHOT_TTL)
+    
+    async def load(self) -> bool:
+        """
+        Merge the cached snapshot into the in-process statistics
+        
+        Returns:
+            Whether a snapshot was loaded
+        """
+        import numpy as np
+        
+        try:
+            snapshot = await cache_service.get(SNAPSHOT_KEY)
+            if not snapshot or snapshot.get("bits") != self.bits:
+                return False
+            self._counts()[np.array(snapshot["buckets"], dtype=np.int64)] += np.array(snapshot["counts"], dtype=np.float64)
+            self.docs += snapshot["docs"]
+            return True
+        except Exception as e:
+            logger.warning("Relevance snapshot load failed: %s", e)
+            return False
+    
+    def _snapshot(self) -> dict:
+        import numpy as np
+        
+        self._unsaved = 0
+        df = self._counts()
+        buckets = np.flatnonzero(df)
+        return {
+            "bits": self.bits,
+            "docs": self.docs,
+            "buckets": buckets.tolist(),
+            "counts": np.round(df[buckets], 2).tolist(),
+        }
+    
+    def observe(self, titles: Sequence[str]) -> None:
+        """
+        Add titles to the document-frequency statistics
+        
+        Args:
+            titles: Titles of newly fetched listings (each counts once)
+        """
+        if not titles:
+            return
+        import numpy as np
+        
+        df = self._counts()
+        buckets = np.concatenate([_features(title, self.bits)[0] for title in titles])
+        np.add.at(df, buckets, 1.0)
+        self.docs += len(titles)
+        if self.docs > self.max_docs:
+            df *= 0.5
+            self.docs *= 0.5
+        
+        self._unsaved += len(titles)
+        if self._unsaved >= self.snapshot_every and cache_service.enabled:
+            cache_service.set_background(SNAPSHOT_KEY, self._snapshot(), ttl=SNAPSHOT_TTL)
+    
+    def _idf(self, buckets: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+        
+        return np.log((1.0 + self.docs) / (1.0 + self._counts()[buckets])) + 1.0
+    
+    def score(self, query: str, titles: Sequence[str]) -> "np.ndarray":
+        """
+        Cosine similarity between the query and each title
+        
+        Args:
+            query: Original search query (without bundle keywords)
+            titles: Listing titles
+        
+        Returns:
+            float64 array of scores in [0, 1]; all ones if the query has
+            no searchable words
+        """
+        import numpy as np
+        
+        query_buckets, query_tf = _features(query, self.bits)
+        if not len(query_buckets):
+            return np.ones(len(titles))
+        if not titles:
+            return np.zeros(0)
+        query_weights = query_tf * self._idf(query_buckets)
+        query_norm = np.sqrt(np.dot(query_weights, query_weights))
+        
+        # All titles as one flat sparse matrix: bucket, weight and row per entry
+        features = [_features(title, self.bits) for title in titles]
+        rows = np.repeat(np.arange(len(titles)), [len(buckets) for buckets, _ in features])
+        buckets = np.concatenate([buckets for buckets, _ in features])
+        weights = np.concatenate([tf for _, tf in features]) * self._idf(buckets)
+        
+        # Query buckets are sorted, so matches are found by binary search
+        positions = np.minimum(np.searchsorted(query_buckets, buckets), len(query_buckets) - 1)
+        matched = query_buckets[positions] == buckets
+        dot = np.bincount(rows, weights=np.where(matched, weights * query_weights[positions], 0.0), minlength=len(titles))
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(titles)))
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(norms > 0, dot / (norms * query_norm), 0.0)
+    
+    def score_listings(self, query: str, listings: List[Listing]) -> None:
+        """
+        Set relevance on listings that don't have one yet, in place
+        
+        Listings without a relevance are the freshly fetched ones, so they
+        are also the ones added to the statistics.
+        
+        Args:
+            query: Original search query
+            listings: Candidates (cached listings keep their score)
+        """
+        if not self.enabled:
+            return
+        fresh = [listing for listing in listings if listing.relevance is None]
+        if not fresh:
+            return
+        titles = [listing.title_vague for listing in fresh]
+        self.observe(titles)
+        for listing, relevance in zip(fresh, self.score(query, titles).tolist()):
+            listing.relevance = relevance
+    
+    def is_relevant(self, relevance: Optional[float]) -> bool:
+        """Whether a listing with this relevance is worth an AI analysis (unscored listings are)"""
+        return relevance is None or relevance >= self.min_score
+
+
+# Singleton instance
+relevance_scorer = RelevanceScorer()
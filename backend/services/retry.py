@@ -0,0 +1,225 @@
+"""
+Retry Service - Bounded retries for upstream calls
+Jittered exponential backoff per upstream, a shared retry budget and per-request deadlines
+"""
+
+import asyncio
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+import httpx
+
+from services.metrics import metrics
+
+
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+# Gemini SDK (google.api_core) errors worth retrying, matched by name so the
+# SDK doesn't have to be imported here
+RETRY_EXCEPTION_NAMES = frozenset({
+    "ServiceUnavailable", "ResourceExhausted", "InternalServerError", "DeadlineExceeded", "TooManyRequests"
+})
+
+
+class RetryPolicy:
+    """How often and how patiently to retry one upstream"""
+    
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before the next attempt ("full jitter" exponential backoff)
+        
+        Args:
+            attempt: Number of the attempt that just failed (1-based)
+            retry_after: Server-requested delay in seconds, if any
+        
+        Returns:
+            Seconds to wait; at least retry_after, but never more than
+            max_delay, so a huge Retry-After can't stall a background worker
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return min(max(delay, retry_after or 0.0), self.max_delay)
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent calls
+    
+    Every first attempt deposits `ratio` tokens and every retry spends one,
+    with a small time-based allowance so low traffic can still retry. During
+    an outage the budget drains and calls fail fast instead of multiplying
+    load on the struggling upstream.
+    """
+    
+    def __init__(self, ratio: float, min_per_second: float, capacity: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+    
+    def record_call(self) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# Gemini retries sparingly: each attempt spends quota and takes seconds
+RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    "ebay_oauth": RetryPolicy(max_attempts=3, base_delay=0.2, max_delay=2.0),
+    "ebay_search": RetryPolicy(max_attempts=3, base_delay=0.2, max_delay=2.0),
+    "vinted_session": RetryPolicy(max_attempts=2, base_delay=0.25, max_delay=1.0),
+    "vinted_search": RetryPolicy(max_attempts=3, base_delay=0.25, max_delay=2.0),
+    "ebay_items": RetryPolicy(max_attempts=2, base_delay=0.5, max_delay=2.0),
+    "vinted_item": RetryPolicy(max_attempts=2, base_delay=0.5, max_delay=2.0),
+    "image_fetch": RetryPolicy(max_attempts=2, base_delay=0.1, max_delay=0.5),
+    "gemini": RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=4.0),
+}
+
+retry_budget = RetryBudget(
+    ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")),
+    min_per_second=float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1")),
+    capacity=float(os.getenv("RETRY_BUDGET_CAPACITY", "20"))
+)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Bound all upstream calls (including retries) inside the block
+    
+    Nested deadlines can only shorten the outer one.
+    
+    Args:
+        seconds: Time budget from now
+    """
+    current = _deadline.get()
+    expires = time.monotonic() + seconds
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one"""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable_error(error: Exception, idempotent: bool) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in RETRY_STATUSES and (idempotent or status in (429, 503))
+    if isinstance(error, httpx.TransportError):
+        # A non-idempotent request is only safe to resend if it never left
+        return idempotent or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+    return idempotent and type(error).__name__ in RETRY_EXCEPTION_NAMES
+
+
+async def with_retry(
+    upstream: str,
+    call: Callable[[], Awaitable[T]],
+    idempotent: bool = True
+) -> T:
+    """
+    Run an upstream call, retrying transient failures
+    
+    Transport errors, retryable HTTP statuses (returned or raised via
+    raise_for_status) and transient Gemini errors are retried. Once retries
+    run out the last response is returned or the last error re-raised, so
+    callers keep their own failure handling.
+    
+    Args:
+        upstream: Policy name in RETRY_POLICIES (also the metrics label)
+        call: Zero-argument coroutine factory performing one attempt
+        idempotent: Whether a request that may have reached the server can be resent
+    
+    Returns:
+        Result of the last attempt
+    """
+    policy = RETRY_POLICIES[upstream]
+    retry_budget.record_call()
+    attempt = 1
+    
+    while True:
+        error: Optional[Exception] = None
+        result = None
+        left = remaining()
+        if left is not None and left <= 0:
+            raise asyncio.TimeoutError(f"{upstream}: request deadline exceeded")
+        
+        try:
+            if left is None:
+                result = await call()
+            else:
+                result = await asyncio.wait_for(call(), timeout=left)
+        except asyncio.TimeoutError:
+            # Deadline reached mid-call; there is no time left to retry
+            raise
+        except Exception as e:
+            if not _is_retryable_error(e, idempotent):
+                raise
+            error = e
+        
+        if error is None:
+            if not (isinstance(result, httpx.Response) and result.status_code in RETRY_STATUSES):
+                return result
+            if not idempotent and result.status_code not in (429, 503):
+                return result
+            delay = policy.backoff(attempt, _retry_after(result))
+        elif isinstance(error, httpx.HTTPStatusError):
+            delay = policy.backoff(attempt, _retry_after(error.response))
+        else:
+            delay = policy.backoff(attempt)
+        
+        left = remaining()
+        out_of_time = left is not None and delay >= left
+        if attempt >= policy.max_attempts or out_of_time or not retry_budget.try_spend():
+            if attempt < policy.max_attempts and not out_of_time:
+                metrics.retry_budget_exhausted.inc(upstream=upstream)
+            if error is not None:
+                raise error
+            return result
+        
+        metrics.upstream_retries.inc(upstream=upstream)
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,103 @@
+"""
+Saved Items Service - Per-user watchlist read cache
+Serves saved-item lists and "is saved" checks from the cache tier, with ETags for conditional GETs
+"""
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+from typing import Dict, List
+
+from services.cache import cache_service
+from services.metrics import metrics
+from services.supabase import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+
+def items_version(items: List[Dict]) -> str:
+    """
+    Content hash of a saved-item list, used as its ETag
+    
+    Args:
+        items: Saved item rows in display order
+    
+    Returns:
+        16 hex characters that change whenever any row does
+    """
+    payload = json.dumps(items, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+class SavedItemsCache:
+    """
+    Cache of each user's saved items, invalidated on every write
+    
+    Entries live under `saved:{user_id}` and are stamped with the user's
+    generation token from `saved:{user_id}:gen`. Saves and deletes replace
+    the token instead of touching the entry, so a read that loaded from the
+    database before a concurrent write cannot repopulate the cache with the
+    old list: its stamp no longer matches and the next read reloads.
+    """
+    
+    def __init__(self):
+        self.ttl = int(os.getenv("SAVED_ITEMS_CACHE_TTL_SECONDS", "3600"))
+    
+    def _keys(self, user_id: str) -> List[str]:
+        return [f"saved:{user_id}", f"saved:{user_id}:gen"]
+    
+    async def get(self, user_id: str) -> Dict:
+        """
+        Get a user's saved items, loading them on a miss
+        
+        Args:
+            user_id: Authenticated user ID
+        
+        Returns:
+            {"version": ETag value, "items": rows newest first, "ids": external IDs}
+        
+        Raises:
+            Exception: If the database read fails on a miss
+        """
+        entry_key, gen_key = self._keys(user_id)
+        entry, gen = await cache_service.get_many([entry_key, gen_key])
+        if entry and gen and entry.get("gen") == gen:
+            metrics.cache_requests.inc(tier="saved_items", result="hit")
+            return entry
+        
+        metrics.cache_requests.inc(tier="saved_items", result="miss")
+        if cache_service.enabled and not gen:
+            gen = secrets.token_hex(8)
+            await cache_service.set(gen_key, gen, self.ttl)
+        
+        items = await get_supabase_client().get_user_items(user_id)
+        entry = {
+            "gen": gen,
+            "version": items_version(items),
+            "items": items,
+            "ids": [item.get("external_id") for item in items],
+        }
+        if cache_service.enabled:
+            cache_service.set_background(entry_key, entry, self.ttl)
+        return entry
+    
+    async def invalidate(self, user_id: str) -> None:
+        """
+        Drop a user's cached list after a save or delete
+        
+        Args:
+            user_id: Authenticated user ID
+        """
+        if not cache_service.enabled:
+            return
+        entry_key, gen_key = self._keys(user_id)
+        if not await cache_service.set(gen_key, secrets.token_hex(8), self.ttl):
+            # Without a new token a stale entry could survive; drop it outright
+            await cache_service.delete(entry_key)
+            logger.warning("Saved items generation write failed for %s; entry deleted", user_id)
+
+
+# Singleton instance
+saved_items_cache = SavedItemsCache()
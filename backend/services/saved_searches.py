@@ -0,0 +1,257 @@
+"""
+Saved Searches Service - Scheduled evaluation of users' saved searches
+Fetches each distinct query once per tick and fans new deals out to every matching subscriber as alerts
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from services.analysis_queue import analysis_queue
+from services.cache import cache_service
+from services.metrics import metrics
+from services.models import Listing, STATUS_IRRELEVANT, STATUS_OK
+from services.pipeline import run_search, refresh_search, MAX_ANALYZED
+from services.querykey import price_bucket
+from services.ratelimit import rate_limits, TokenBucket
+from services.supabase import get_supabase_client, supabase_configured
+
+logger = logging.getLogger(__name__)
+
+# External IDs remembered per query so a listing alerts once
+MAX_SEEN_IDS = 500
+SEEN_TTL = 7 * 86400
+# Longest wait between ticks while they keep failing
+MAX_ERROR_BACKOFF = 3600
+
+
+def _analyzed(listing: Listing) -> bool:
+    return listing.analysis is not None and listing.analysis.status == STATUS_OK
+
+
+class SavedSearchEvaluator:
+    """
+    Evaluates saved searches grouped by canonical query
+    
+    Each tick claims whole groups of saved searches that share a canonical
+    query, runs the search once at the highest price bucket any subscriber
+    needs (refreshing the shared search cache entry, so only listings new
+    since the cached results are fetched and analyzed, and recomputing it
+    in full once it expires), and checks every
+    analyzed listing the group has not seen yet against each subscriber's
+    max_price and min_profit. Cost per tick scales with distinct queries.
+    
+    Listings still waiting for analysis, or whose analysis failed, are not
+    marked seen; the analysis queue (or a retry) writes their results into
+    the cached entry and a later tick evaluates them.
+    """
+    
+    def __init__(self):
+        default = "true" if supabase_configured() else "false"
+        self.enabled = os.getenv("SAVED_SEARCH_ALERTS_ENABLED", default).lower() == "true"
+        self.tick = float(os.getenv("SAVED_SEARCH_TICK_SECONDS", "60"))
+        # How often each saved search is re-evaluated
+        self.interval = int(os.getenv("SAVED_SEARCH_INTERVAL_SECONDS", "900"))
+        self.batch_size = int(os.getenv("SAVED_SEARCH_BATCH_SIZE", "20"))
+        self.lease = int(os.getenv("SAVED_SEARCH_LEASE_SECONDS", "600"))
+        
+        # Share of the Gemini budget evaluations may use, as for the warmer
+        self.gemini_share = float(os.getenv("SAVED_SEARCH_GEMINI_SHARE", "0.2"))
+        gemini = rate_limits["gemini"]
+        self.gemini_budget = TokenBucket(
+            gemini.rate * 60 * self.gemini_share,
+            capacity=max(gemini.capacity * self.gemini_share, MAX_ANALYZED)
+        )
+        
+        # Seen IDs when there is no cache to keep them in
+        self._seen: Dict[str, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the background evaluation loop"""
+        if not self.enabled or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background evaluation loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            # Back off while ticks keep failing, as in PriceMonitor._run
+            await asyncio.sleep(min(self.tick * 2 ** min(failures, 10), MAX_ERROR_BACKOFF))
+            try:
+                evaluated = await self.run_once()
+                if evaluated:
+                    logger.info("Evaluated %d saved-search queries", evaluated)
+                failures = 0
+            except Exception as e:
+                if not failures:
+                    logger.exception("Saved search evaluator error")
+                else:
+                    logger.warning("Saved search evaluator still failing (%d in a row): %s", failures + 1, e)
+                failures += 1
+    
+    def _has_budget(self) -> bool:
+        """Same check as the cache warmer: shared headroom plus this evaluator's Gemini share"""
+        for upstream, needed in (("ebay", 1), ("vinted", 1), ("gemini", MAX_ANALYZED)):
+            if rate_limits[upstream].available() < needed:
+                return False
+        return self.gemini_budget.try_acquire(MAX_ANALYZED)
+    
+    async def _get_seen(self, canonical: str) -> Optional[List[str]]:
+        if not cache_service.enabled:
+            return self._seen.get(canonical)
+        return await cache_service.get(f"alerts:seen:{canonical}")
+    
+    def _set_seen(self, canonical: str, seen: List[str]) -> None:
+        seen = seen[-MAX_SEEN_IDS:]
+        if not cache_service.enabled:
+            self._seen[canonical] = seen
+            return
+        cache_service.set_background(f"alerts:seen:{canonical}", seen, ttl=SEEN_TTL)
+    
+    async def _search(self, query: str, bucket: int) -> Optional[List[Listing]]:
+        """
+        Fetch current results for a query, sharing the search cache entry
+        
+        Returns:
+            Listings, or None if the search failed outright
+        """
+        key = cache_service.build_search_key(query, bucket)
+        cached = await cache_service.get(key)
+        if cached:
+            # The refresh keeps the entry's expiry, so stale or sold listings
+            # drop out when it expires and run_search recomputes it
+            expires_in = await cache_service.ttl(key)
+            result = await refresh_search(query, bucket, [Listing.from_dict(item) for item in cached], expires_in)
+        else:
+            result = await run_search(query, bucket)
+        
+        if not result.cache_ttl:
+            return None
+        cache_service.set_background(key, [listing.to_dict() for listing in result.listings], ttl=result.cache_ttl)
+        analysis_queue.submit(key, query, result.pending)
+        return result.listings
+    
+    async def evaluate_group(self, canonical: str, searches: List[Dict]) -> Optional[Tuple[List[Dict], List[str]]]:
+        """
+        Evaluate all saved searches sharing one canonical query
+        
+        Args:
+            canonical: Canonical query the searches share
+            searches: saved_searches rows in the group
+        
+        Returns:
+            Alert rows to insert and the group's updated seen IDs (to store
+            once the alerts are written), or None if the search failed
+        """
+        bucket = price_bucket(max(int(search.get("max_price") or 100) for search in searches))
+        listings = await self._search(searches[0]["query"], bucket)
+        if listings is None:
+            return None
+        
+        seen = await self._get_seen(canonical)
+        first_run = seen is None
+        seen = seen or []
+        seen_set = set(seen)
+        
+        if first_run:
+            # The first evaluation only records a baseline; everything
+            # already listed would otherwise alert at once
+            return [], [listing.external_id for listing in listings if listing.external_id]
+        
+        # Only successful analyses are final; failed ones stay unseen until a
+        # retry succeeds. Listings skipped as irrelevant are never analyzed,
+        # so they are settled (seen, no alert) straight away.
+        candidates = [
+            listing for listing in listings
+            if listing.external_id and listing.external_id not in seen_set
+            and listing.analysis is not None and listing.analysis.status in (STATUS_OK, STATUS_IRRELEVANT)
+        ]
+        seen.extend(listing.external_id for listing in candidates)
+        
+        alerts = []
+        for listing in candidates:
+            if listing.duplicate_of or not _analyzed(listing):
+                # Cross-posted copies alert once, through their representative
+                continue
+            data = listing.to_dict()
+            for search in searches:
+                if (listing.price_listed or 0) > int(search.get("max_price") or 100):
+                    continue
+                if listing.profit_potential < float(search.get("min_profit") or 0):
+                    continue
+                alerts.append({
+                    "saved_search_id": search["id"],
+                    "user_id": search["user_id"],
+                    "external_id": listing.external_id,
+                    "listing": data,
+                })
+        return alerts, seen
+    
+    async def run_once(self) -> int:
+        """
+        Claim and evaluate one batch of due saved-search groups
+        
+        Returns:
+            Number of distinct queries evaluated
+        """
+        supabase = get_supabase_client()
+        searches = await supabase.claim_saved_searches(self.batch_size, self.lease)
+        if not searches:
+            return 0
+        
+        groups: Dict[str, List[Dict]] = defaultdict(list)
+        for search in searches:
+            groups[search["canonical_query"]].append(search)
+        
+        alerts: List[Dict] = []
+        evaluated_ids: List[str] = []
+        seen_updates: Dict[str, List[str]] = {}
+        for canonical, group in groups.items():
+            if not self._has_budget():
+                # Unevaluated groups come due again when their lease runs out
+                metrics.saved_search_evaluations.inc(outcome="skipped")
+                break
+            try:
+                evaluation = await self.evaluate_group(canonical, group)
+            except Exception as e:
+                evaluation = None
+                logger.warning("Saved search evaluation error for %r: %s", canonical, e)
+            if evaluation is None:
+                metrics.saved_search_evaluations.inc(outcome="failed")
+                continue
+            metrics.saved_search_evaluations.inc(outcome="evaluated")
+            alerts.extend(evaluation[0])
+            seen_updates[canonical] = evaluation[1]
+            evaluated_ids.extend(search["id"] for search in group)
+        
+        if alerts:
+            await supabase.insert_alerts(alerts)
+            metrics.search_alerts.inc(len(alerts))
+        # Only after the alerts are stored, so a failed insert retries them
+        for canonical, seen in seen_updates.items():
+            self._set_seen(canonical, seen)
+        if evaluated_ids:
+            now = datetime.now(timezone.utc)
+            await supabase.reschedule_saved_searches(
+                evaluated_ids, now.isoformat(), (now + timedelta(seconds=self.interval)).isoformat()
+            )
+        
+        return len(seen_updates)
+
+
+# Singleton instance
+saved_search_evaluator = SavedSearchEvaluator()
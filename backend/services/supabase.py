@@ -3,16 +3,74 @@ Supabase Service - Database Operations
 Handles authentication and data persistence
 """
 
+import base64
+import hashlib
+import json
+import logging
 import os
-from supabase import create_client, Client
-from typing import Dict, List, Optional
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from services.metrics import metrics
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# Verified tokens remembered per process
+AUTH_CACHE_MAX_ENTRIES = 10000
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    """The JWT's exp claim (unverified; only used to cap how long it is cached)"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return None
 
 
 class SupabaseService:
     def __init__(self):
+        # The SDK is imported here rather than at module level so processes
+        # that never touch the database don't pay for it
+        from supabase import create_client
+        
         url = os.getenv("SUPABASE_URL")
         key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        self.client: Client = create_client(url, key)
+        self.client: "Client" = create_client(url, key)
+        
+        # Successful verifications are reused for this long so a conditional
+        # GET answered with 304 skips the auth round trip; a revoked token
+        # keeps working until its entry expires (0 disables)
+        self.auth_cache_ttl = float(os.getenv("AUTH_CACHE_SECONDS", "60"))
+        # token hash -> (user ID, expires at)
+        self._verified: Dict[str, Tuple[str, float]] = {}
+    
+    def _cached_user(self, key: str) -> Optional[str]:
+        entry = self._verified.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._verified[key]
+            return None
+        return entry[0]
+    
+    def _remember_user(self, key: str, token: str, user_id: str) -> None:
+        now = time.time()
+        expires = now + self.auth_cache_ttl
+        token_expires = _token_expiry(token)
+        if token_expires is not None:
+            expires = min(expires, token_expires)
+        if expires <= now:
+            return
+        if len(self._verified) >= AUTH_CACHE_MAX_ENTRIES:
+            self._verified = {k: v for k, v in self._verified.items() if v[1] > now}
+            if len(self._verified) >= AUTH_CACHE_MAX_ENTRIES:
+                self._verified.clear()
+        self._verified[key] = (user_id, expires)
     
     def verify_user(self, token: str) -> Optional[str]:
         """
@@ -24,11 +82,22 @@ class SupabaseService:
         Returns:
             User ID if valid, None otherwise
         """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        if self.auth_cache_ttl > 0:
+            user_id = self._cached_user(key)
+            if user_id:
+                return user_id
+        
         try:
-            user = self.client.auth.get_user(token)
-            return user.user.id if user else None
+            with metrics.track("supabase_auth"):
+                user = self.client.auth.get_user(token)
+            if not user:
+                return None
+            if self.auth_cache_ttl > 0:
+                self._remember_user(key, token, user.user.id)
+            return user.user.id
         except Exception as e:
-            print(f"Auth error: {str(e)}")
+            logger.warning("Auth error: %s", e)
             return None
     
     async def save_item(self, user_id: str, item_data: Dict) -> Dict:
@@ -57,12 +126,13 @@ class SupabaseService:
             }
             
             # Insert into database
-            result = self.client.table("saved_items").insert(data).execute()
+            with metrics.track("supabase"):
+                result = self.client.table("saved_items").insert(data).execute()
             
             return result.data[0] if result.data else {}
         
         except Exception as e:
-            print(f"Database save error: {str(e)}")
+            logger.error("Database save error: %s", e)
             raise Exception(f"Failed to save item: {str(e)}")
     
     async def get_user_items(self, user_id: str) -> List[Dict]:
@@ -74,19 +144,24 @@ class SupabaseService:
         
         Returns:
             List of saved items
+        
+        Raises:
+            Exception: If the query fails (an error must not read as an
+                empty watchlist, which the saved-items cache would keep)
         """
         try:
-            result = self.client.table("saved_items")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .order("created_at", desc=True)\
-                .execute()
+            with metrics.track("supabase"):
+                result = self.client.table("saved_items")\
+                    .select("*")\
+                    .eq("user_id", user_id)\
+                    .order("created_at", desc=True)\
+                    .execute()
             
             return result.data if result.data else []
         
         except Exception as e:
-            print(f"Database fetch error: {str(e)}")
-            return []
+            logger.error("Database fetch error: %s", e)
+            raise Exception(f"Failed to fetch items: {str(e)}")
     
     async def delete_item(self, user_id: str, item_id: str) -> bool:
         """
@@ -100,16 +175,17 @@ class SupabaseService:
             True if successful, False otherwise
         """
         try:
-            result = self.client.table("saved_items")\
-                .delete()\
-                .eq("id", item_id)\
-                .eq("user_id", user_id)\
-                .execute()
+            with metrics.track("supabase"):
+                result = self.client.table("saved_items")\
+                    .delete()\
+                    .eq("id", item_id)\
+                    .eq("user_id", user_id)\
+                    .execute()
             
             return bool(result.data)
         
         except Exception as e:
-            print(f"Database delete error: {str(e)}")
+            logger.error("Database delete error: %s", e)
             return False
     
     async def check_item_exists(self, user_id: str, external_id: str) -> bool:
@@ -124,19 +200,241 @@ class SupabaseService:
             True if item exists, False otherwise
         """
         try:
-            result = self.client.table("saved_items")\
-                .select("id")\
-                .eq("user_id", user_id)\
-                .eq("external_id", external_id)\
-                .execute()
+            with metrics.track("supabase"):
+                result = self.client.table("saved_items")\
+                    .select("id")\
+                    .eq("user_id", user_id)\
+                    .eq("external_id", external_id)\
+                    .execute()
             
             return len(result.data) > 0 if result.data else False
         
         except Exception as e:
-            print(f"Database check error: {str(e)}")
+            logger.error("Database check error: %s", e)
+            return False
+    
+    async def claim_price_checks(self, batch_size: int, lease_seconds: int) -> List[Dict]:
+        """
+        Claim saved items due for a price re-check
+        
+        Calls the claim_price_checks function (see SETUP.md), which pushes
+        the claimed rows' next_check_at out by the lease so other workers
+        skip them until they are checked or the lease runs out.
+        
+        Args:
+            batch_size: Maximum rows to claim
+            lease_seconds: How long the rows stay claimed
+        
+        Returns:
+            Claimed saved_items rows, most overdue first
+        """
+        try:
+            with metrics.track("supabase"):
+                result = self.client.rpc(
+                    "claim_price_checks",
+                    {"batch_size": batch_size, "lease_seconds": lease_seconds}
+                ).execute()
+            
+            return result.data if result.data else []
+        
+        except Exception as e:
+            logger.error("Database claim error: %s", e)
+            raise Exception(f"Failed to claim price checks: {str(e)}")
+    
+    async def apply_price_checks(self, updates: List[Dict]) -> None:
+        """
+        Write re-check results for many saved items in one statement
+        
+        Args:
+            updates: Rows with id, price_current, availability, checked_at
+                and next_check_at (ISO timestamps)
+        """
+        try:
+            with metrics.track("supabase"):
+                self.client.rpc("apply_price_checks", {"updates": updates}).execute()
+        
+        except Exception as e:
+            logger.error("Database bulk update error: %s", e)
+            raise Exception(f"Failed to apply price checks: {str(e)}")
+    
+    async def create_saved_search(self, user_id: str, search_data: Dict) -> Dict:
+        """
+        Save a search for scheduled alerting
+        
+        Args:
+            user_id: Authenticated user ID
+            search_data: query, canonical_query, max_price and min_profit
+        
+        Returns:
+            Saved search record
+        """
+        try:
+            data = {"user_id": user_id, **search_data}
+            with metrics.track("supabase"):
+                result = self.client.table("saved_searches").insert(data).execute()
+            
+            return result.data[0] if result.data else {}
+        
+        except Exception as e:
+            logger.error("Database save error: %s", e)
+            raise Exception(f"Failed to save search: {str(e)}")
+    
+    async def get_user_saved_searches(self, user_id: str) -> List[Dict]:
+        """
+        Get all saved searches for a user
+        
+        Args:
+            user_id: Authenticated user ID
+        
+        Returns:
+            List of saved searches, newest first
+        """
+        try:
+            with metrics.track("supabase"):
+                result = self.client.table("saved_searches")\
+                    .select("*")\
+                    .eq("user_id", user_id)\
+                    .order("created_at", desc=True)\
+                    .execute()
+            
+            return result.data if result.data else []
+        
+        except Exception as e:
+            logger.error("Database fetch error: %s", e)
+            raise Exception(f"Failed to fetch saved searches: {str(e)}")
+    
+    async def delete_saved_search(self, user_id: str, search_id: str) -> bool:
+        """
+        Delete a saved search (its alerts go with it)
+        
+        Args:
+            user_id: Authenticated user ID
+            search_id: Saved search ID
+        
+        Returns:
+            True if a search was deleted, False otherwise
+        """
+        try:
+            with metrics.track("supabase"):
+                result = self.client.table("saved_searches")\
+                    .delete()\
+                    .eq("id", search_id)\
+                    .eq("user_id", user_id)\
+                    .execute()
+            
+            return bool(result.data)
+        
+        except Exception as e:
+            logger.error("Database delete error: %s", e)
             return False
+    
+    async def claim_saved_searches(self, batch_size: int, lease_seconds: int) -> List[Dict]:
+        """
+        Claim every saved search of the most overdue canonical queries
+        
+        Calls the claim_saved_searches function (see SETUP.md), which leases
+        whole query groups so all subscribers of a query are evaluated together.
+        
+        Args:
+            batch_size: Maximum distinct canonical queries to claim
+            lease_seconds: How long the rows stay claimed
+        
+        Returns:
+            Claimed saved_searches rows
+        """
+        try:
+            with metrics.track("supabase"):
+                result = self.client.rpc(
+                    "claim_saved_searches",
+                    {"batch_size": batch_size, "lease_seconds": lease_seconds}
+                ).execute()
+            
+            return result.data if result.data else []
+        
+        except Exception as e:
+            logger.error("Database claim error: %s", e)
+            raise Exception(f"Failed to claim saved searches: {str(e)}")
+    
+    async def reschedule_saved_searches(self, search_ids: List[str], last_run_at: str, next_run_at: str) -> None:
+        """
+        Record an evaluation for many saved searches in one statement
+        
+        Args:
+            search_ids: Saved search IDs that were evaluated
+            last_run_at: ISO timestamp of the evaluation
+            next_run_at: ISO timestamp of the next one
+        """
+        try:
+            with metrics.track("supabase"):
+                self.client.table("saved_searches")\
+                    .update({"last_run_at": last_run_at, "next_run_at": next_run_at})\
+                    .in_("id", search_ids)\
+                    .execute()
+        
+        except Exception as e:
+            logger.error("Database update error: %s", e)
+            raise Exception(f"Failed to reschedule saved searches: {str(e)}")
+    
+    async def insert_alerts(self, alerts: List[Dict]) -> None:
+        """
+        Insert search alerts in bulk, skipping ones already delivered
+        
+        Args:
+            alerts: Rows with saved_search_id, user_id, external_id and listing
+        """
+        try:
+            with metrics.track("supabase"):
+                self.client.table("search_alerts")\
+                    .upsert(alerts, on_conflict="saved_search_id,external_id", ignore_duplicates=True)\
+                    .execute()
+        
+        except Exception as e:
+            logger.error("Database insert error: %s", e)
+            raise Exception(f"Failed to insert alerts: {str(e)}")
+    
+    async def get_user_alerts(self, user_id: str, limit: int = 50) -> List[Dict]:
+        """
+        Get a user's most recent search alerts
+        
+        Args:
+            user_id: Authenticated user ID
+            limit: Maximum alerts to return
+        
+        Returns:
+            Alerts, newest first
+        """
+        try:
+            with metrics.track("supabase"):
+                result = self.client.table("search_alerts")\
+                    .select("*")\
+                    .eq("user_id", user_id)\
+                    .order("created_at", desc=True)\
+                    .limit(limit)\
+                    .execute()
+            
+            return result.data if result.data else []
+        
+        except Exception as e:
+            logger.error("Database fetch error: %s", e)
+            raise Exception(f"Failed to fetch alerts: {str(e)}")
+
+
+_supabase_service: Optional[SupabaseService] = None
+
+
+def supabase_configured() -> bool:
+    """Whether Supabase credentials are set (background jobs default to off without them)"""
+    return bool(os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
 
 
 def get_supabase_client() -> SupabaseService:
-    """Get Supabase service instance"""
-    return SupabaseService()
+    """
+    Get the Supabase service instance
+    
+    Created on first call and reused afterwards, so the SDK client and its
+    connection pool are built once per process instead of per request.
+    """
+    global _supabase_service
+    if _supabase_service is None:
+        _supabase_service = SupabaseService()
+    return _supabase_service
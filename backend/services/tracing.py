@@ -0,0 +1,139 @@
+"""
+Tracing Service - Per-request stage timing
+Collects lightweight spans for Server-Timing headers and sampled slow-request logs
+"""
+
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+    
+    __slots__ = ("request_id", "method", "path", "started", "spans")
+    
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        # (name, start offset seconds, duration seconds)
+        self.spans: List[tuple] = []
+    
+    def add(self, name: str, start: float, duration: float) -> None:
+        self.spans.append((name, start - self.started, duration))
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+    
+    def server_timing(self) -> str:
+        """
+        Build a Server-Timing header value
+        
+        Spans with the same name (e.g. one image_fetch per bundle) are summed
+        and their count goes in the description.
+        """
+        totals: Dict[str, List[float]] = {}
+        for name, _, duration in self.spans:
+            entry = totals.setdefault(name, [0.0, 0])
+            entry[0] += duration
+            entry[1] += 1
+        
+        parts = []
+        for name, (duration, count) in totals.items():
+            part = f"{name};dur={duration * 1000:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+    
+    def to_dict(self) -> Dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(self.elapsed() * 1000, 1),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, start, duration in self.spans
+            ]
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    def __init__(self):
+        self.server_timing = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+        # Requests slower than this are candidates for the trace log
+        self.slow_threshold = float(os.getenv("TRACE_SLOW_MS", "2000")) / 1000
+        # Fraction of slow requests written; 0 disables the log entirely
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+        self.log_path = os.getenv("TRACE_LOG_PATH", "slow_traces.jsonl")
+    
+    def start(self, method: str, path: str, request_id: Optional[str] = None) -> Trace:
+        """Begin a trace for the current request context"""
+        trace = Trace(request_id or uuid.uuid4().hex[:16], method, path)
+        _current_trace.set(trace)
+        return trace
+    
+    def should_log(self, trace: Trace) -> bool:
+        """Decide whether a finished trace goes to the slow-request log"""
+        if self.sample_rate <= 0 or trace.elapsed() < self.slow_threshold:
+            return False
+        return random.random() < self.sample_rate
+    
+    def write(self, trace: Trace) -> None:
+        """Append a trace as one JSON line (blocking; run off the event loop)"""
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(trace.to_dict()) + "\n")
+        except Exception as e:
+            logger.warning("Trace log error: %s", e)
+
+
+def current_trace() -> Optional[Trace]:
+    """Trace of the request being handled, if any"""
+    return _current_trace.get()
+
+
+def record_span(name: str, start: float, duration: float) -> None:
+    """Add an already-timed span to the current trace (no-op outside a request)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, duration)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time a block as a span of the current request
+    
+    Args:
+        name: Span name (a Server-Timing token, e.g. "cache_lookup")
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+# Singleton instance
+tracer = Tracer()
@@ -3,11 +3,30 @@ Vinted Service - API Integration
 Handles item search using direct HTTP requests to Vinted API
 """
 
+import logging
 import os
-from typing import List, Dict, Optional
-import httpx
+from typing import List, Optional, Set
 import time
 
+from services.http import get_http_client
+from services.metrics import metrics
+from services.models import (
+    AVAILABILITY_AVAILABLE,
+    AVAILABILITY_ENDED,
+    AVAILABILITY_RESERVED,
+    AVAILABILITY_SOLD,
+    Listing,
+    ListingStatus,
+)
+from services.ratelimit import rate_limits
+from services.retry import with_retry
+
+logger = logging.getLogger(__name__)
+
+
+class VintedSearchError(Exception):
+    pass
+
 
 class VintedService:
     def __init__(self):
@@ -20,26 +39,38 @@ class VintedService:
     async def _get_session(self) -> str:
         """Get session cookie from Vinted"""
         if self.session_cookie:
+            metrics.cache_requests.inc(tier="vinted_session", result="hit")
             return self.session_cookie
-            
+        
+        metrics.cache_requests.inc(tier="vinted_session", result="miss")
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self.base_url, timeout=10.0)
-                if response.status_code == 200:
-                    # Extract session cookie
-                    cookies = response.cookies
-                    self.session_cookie = "; ".join([f"{k}={v}" for k, v in cookies.items()])
-                    return self.session_cookie
+            client = get_http_client()
+            
+            async def fetch_session():
+                with metrics.track("vinted_session"):
+                    return await client.get(self.base_url, timeout=10.0)
+            
+            response = await with_retry("vinted_session", fetch_session)
+            if response.status_code == 200:
+                # Extract session cookie
+                cookies = response.cookies
+                self.session_cookie = "; ".join([f"{k}={v}" for k, v in cookies.items()])
+                return self.session_cookie
         except Exception as e:
-            print(f"Failed to get Vinted session: {e}")
+            logger.warning("Failed to get Vinted session: %s", e)
             return ""
     
+    async def warm_up(self) -> None:
+        """Fetch the session cookie ahead of the first search"""
+        await self._get_session()
+    
     async def search_items(
         self,
         query: str,
         max_price: int = 100,
-        limit: int = 10
-    ) -> List[Dict]:
+        limit: int = 10,
+        page: int = 1
+    ) -> List[Listing]:
         """
         Search for used items on Vinted
         
@@ -47,9 +78,10 @@ class VintedService:
             query: Search query string
             max_price: Maximum price filter
             limit: Number of results to return
+            page: Results page (1-based, `limit` results per page)
         
         Returns:
-            List of item dictionaries with relevant fields
+            List of listings
         """
         try:
             # Get session cookie
@@ -58,7 +90,7 @@ class VintedService:
             # Build search URL
             timestamp = time.time()
             params = {
-                "page": "1",
+                "page": str(page),
                 "per_page": str(limit),
                 "time": str(timestamp),
                 "search_text": query,
@@ -75,40 +107,140 @@ class VintedService:
                 headers["Cookie"] = self.session_cookie
             
             # Make search request
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/api/v2/catalog/items",
-                    params=params,
+            client = get_http_client()
+            
+            async def search():
+                rate_limits["vinted"].consume()
+                with metrics.track("vinted_search"):
+                    return await client.get(
+                        f"{self.base_url}/api/v2/catalog/items",
+                        params=params,
+                        headers=headers,
+                        timeout=10.0
+                    )
+            
+            response = await with_retry("vinted_search", search)
+            
+            if response.status_code != 200:
+                metrics.upstream_errors.inc(upstream="vinted_search")
+                # Raised so callers can tell an outage from a search with no matches
+                raise VintedSearchError(f"Vinted API returned status {response.status_code}")
+            
+            data = response.json()
+            items = data.get("items", [])
+            
+            if not items:
+                return []
+            
+            # Format items
+            filtered_items = []
+            for item in items:
+                formatted = self._format_item_dict(item)
+                if formatted:
+                    filtered_items.append(formatted)
+            
+            return filtered_items[:limit]
+        
+        except Exception as e:
+            logger.warning("Vinted search error: %s", e)
+            raise
+    
+    async def search_new_items(
+        self,
+        query: str,
+        seen_ids: Set[str],
+        max_price: int = 100,
+        limit: int = 10
+    ) -> List[Listing]:
+        """
+        Search for listings newer than the ones already seen
+        
+        Results come back newest first, so everything before the first
+        already-seen listing is new.
+        
+        Args:
+            query: Search query string
+            seen_ids: External IDs already in the cached result set
+            max_price: Maximum price filter
+            limit: Number of results to request
+        
+        Returns:
+            Newly listed items not in seen_ids
+        """
+        items = await self.search_items(query, max_price=max_price, limit=limit)
+        
+        new_items = []
+        for item in items:
+            if item.external_id in seen_ids:
+                break
+            new_items.append(item)
+        
+        return new_items
+    
+    async def get_item_status(self, item_id: str) -> ListingStatus:
+        """
+        Look up the current price and availability of one listing
+        
+        Vinted has no batch item endpoint, so callers fan these out.
+        
+        Args:
+            item_id: Vinted item ID
+        
+        Returns:
+            Listing status; deleted listings are ended
+        
+        Raises:
+            VintedSearchError: If the lookup fails
+        """
+        await self._get_session()
+        
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+            "Accept": "application/json",
+        }
+        if self.session_cookie:
+            headers["Cookie"] = self.session_cookie
+        
+        client = get_http_client()
+        
+        async def lookup():
+            rate_limits["vinted"].consume()
+            with metrics.track("vinted_item"):
+                return await client.get(
+                    f"{self.base_url}/api/v2/items/{item_id}",
                     headers=headers,
                     timeout=10.0
                 )
-                
-                if response.status_code != 200:
-                    print(f"Vinted API returned status {response.status_code}")
-                    return []
-                
-                data = response.json()
-                items = data.get("items", [])
-                
-                if not items:
-                    return []
-                
-                # Format items
-                filtered_items = []
-                for item in items:
-                    formatted = self._format_item_dict(item)
-                    if formatted:
-                        filtered_items.append(formatted)
-                
-                return filtered_items[:limit]
         
-        except Exception as e:
-            print(f"Vinted search error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return []
+        response = await with_retry("vinted_item", lookup)
+        
+        if response.status_code == 404:
+            return ListingStatus(price=None, availability=AVAILABILITY_ENDED)
+        if response.status_code != 200:
+            metrics.upstream_errors.inc(upstream="vinted_item")
+            raise VintedSearchError(f"Vinted API returned status {response.status_code}")
+        
+        item = response.json().get("item") or {}
+        price_data = item.get("price")
+        if isinstance(price_data, dict):
+            price_data = price_data.get("amount")
+        try:
+            price = float(price_data) if price_data is not None else None
+        except (ValueError, TypeError):
+            price = None
+        
+        if item.get("is_closed"):
+            availability = AVAILABILITY_SOLD
+        elif item.get("is_hidden"):
+            availability = AVAILABILITY_ENDED
+        elif item.get("is_reserved"):
+            availability = AVAILABILITY_RESERVED
+        else:
+            availability = AVAILABILITY_AVAILABLE
+        
+        return ListingStatus(price=price, availability=availability)
     
-    def _format_item_dict(self, item: dict) -> Optional[Dict]:
+    def _format_item_dict(self, item: dict) -> Optional[Listing]:
         """
         Format Vinted item dictionary to standardized structure
         """
@@ -166,21 +298,21 @@ class VintedService:
             # BUNDLE BREAKER: Check if this is a bundle/lot (Vinted doesn't have lot_size field)
             is_bundle = any(keyword in title.lower() for keyword in ["bundle", "lot", "job lot", "collection"])
             
-            return {
-                "external_id": str(item_id) if item_id else None,
-                "title_vague": title,
-                "price_listed": price,
-                "image_url": image_url,
-                "market_url": item_url,
-                "marketplace": "vinted",
-                "condition": "Used",
-                "brand": brand,
-                "seller": seller,
-                "lot_size": None  # Vinted doesn't provide this field
-            }
+            return Listing(
+                external_id=str(item_id) if item_id else None,
+                title_vague=title,
+                price_listed=price,
+                image_url=image_url,
+                market_url=item_url,
+                marketplace="vinted",
+                condition="Used",
+                brand=brand,
+                seller=seller,
+                lot_size=None  # Vinted doesn't provide this field
+            )
         
         except Exception as e:
-            print(f"Error formatting Vinted item: {str(e)}")
+            logger.warning("Error formatting Vinted item: %s", e)
             return None
 
 
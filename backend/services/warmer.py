@@ -0,0 +1,121 @@
+"""
+Cache Warmer - Background refresh of popular searches
+Re-computes the hottest search keys before their cached results expire
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from services.analysis_queue import analysis_queue
+from services.cache import cache_service
+from services.pipeline import run_search, MAX_ANALYZED
+from services.popularity import popularity_tracker
+from services.ratelimit import rate_limits, TokenBucket, WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    def __init__(self):
+        self.enabled = os.getenv("CACHE_WARMER_ENABLED", "true").lower() == "true"
+        self.top_n = int(os.getenv("CACHE_WARMER_TOP_N", "20"))
+        self.interval = float(os.getenv("CACHE_WARMER_INTERVAL_SECONDS", "300"))
+        # Refresh keys with less than this many seconds left to live
+        self.refresh_margin = int(os.getenv("CACHE_WARMER_REFRESH_MARGIN_SECONDS", "3600"))
+        # Ignore keys searched less than about twice in the last half-life.
+        # Popularity is counted per process and the warmer runs in one of
+        # the serve.py workers, which sees about 1/WORKERS of every key's
+        # searches, so the threshold is scaled to match.
+        self.min_score = float(os.getenv("CACHE_WARMER_MIN_SCORE", "2.0")) / WORKERS
+        
+        # Share of the Gemini budget the warmer may use; the rest is
+        # reserved for user-facing searches
+        self.gemini_share = float(os.getenv("CACHE_WARMER_GEMINI_SHARE", "0.2"))
+        gemini = rate_limits["gemini"]
+        self.gemini_budget = TokenBucket(
+            gemini.rate * 60 * self.gemini_share,
+            capacity=max(gemini.capacity * self.gemini_share, MAX_ANALYZED)
+        )
+        
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the background refresh loop"""
+        if not self.enabled or not cache_service.enabled or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background refresh loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                refreshed = await self.run_once()
+                if refreshed:
+                    logger.info("Cache warmer refreshed %d popular searches", refreshed)
+            except Exception:
+                logger.exception("Cache warmer error")
+    
+    def _has_budget(self) -> bool:
+        """
+        Check every upstream a refresh touches has spare capacity
+        
+        Shared budgets are only peeked at; the search itself records the
+        usage. Gemini tokens additionally come out of the warmer's own share
+        so background refreshes never take more than that fraction.
+        """
+        for upstream, needed in (("ebay", 1), ("vinted", 1), ("gemini", MAX_ANALYZED)):
+            if rate_limits[upstream].available() < needed:
+                return False
+        return self.gemini_budget.try_acquire(MAX_ANALYZED)
+    
+    async def run_once(self) -> int:
+        """
+        Refresh popular keys that are missing or about to expire
+        
+        Returns:
+            Number of keys refreshed
+        """
+        refreshed = 0
+        
+        for key, query, max_price, _ in popularity_tracker.top(self.top_n, self.min_score):
+            ttl = await cache_service.ttl(key)
+            if ttl is None:
+                # Cache unreachable, nothing to warm into
+                break
+            if ttl > self.refresh_margin or ttl == -1:
+                continue
+            
+            cached = await cache_service.get(key) if ttl > 0 else None
+            if cached == []:
+                # Negative entries just expire; re-running a search with no matches is wasted budget
+                continue
+            
+            if not self._has_budget():
+                break
+            
+            # A full recompute: an incremental refresh keeps the entry's expiry
+            # (its cached prices aren't re-checked), so it can't extend it
+            result = await run_search(query, max_price)
+            
+            if result.listings and result.cache_ttl:
+                cache_service.set_background(key, [listing.to_dict() for listing in result.listings], ttl=result.cache_ttl)
+                analysis_queue.submit(key, query, result.pending)
+                refreshed += 1
+        
+        return refreshed
+
+
+# Singleton instance
+cache_warmer = CacheWarmer()
@@ -0,0 +1,11 @@
+"""
+Test configuration - make the backend packages importable
+
+Tests import `services` the same way main.py does, so the backend
+directory has to be on the path whichever directory pytest starts from.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
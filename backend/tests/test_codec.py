@@ -0,0 +1,76 @@
+"""
+Cache codec tests - round trips, header format and pre-codec entries
+"""
+
+import base64
+import json
+
+import pytest
+
+from services.codec import COMPRESSORS, SERIALIZERS, CacheCodec
+
+SMALL = {"query": "lego technic", "items": [{"id": 1, "price": 12.5, "title": "Pokémon lot"}]}
+LARGE = {"items": [{"id": index, "title": f"Mixed bundle {index}", "price": index * 1.5} for index in range(200)]}
+
+SERIALIZER_NAMES = [name for name, key in (("json", "j"), ("orjson", "o"), ("msgpack", "m")) if key in SERIALIZERS]
+COMPRESSOR_NAMES = [name for name, key in (("none", "n"), ("zlib", "z"), ("zstd", "s")) if key in COMPRESSORS]
+
+
+@pytest.mark.parametrize("serializer", SERIALIZER_NAMES)
+@pytest.mark.parametrize("compressor", COMPRESSOR_NAMES)
+@pytest.mark.parametrize("value", [SMALL, LARGE, [], "text", 42, None])
+def test_round_trip(serializer, compressor, value):
+    codec = CacheCodec(serializer=serializer, compressor=compressor, compress_threshold=256)
+    assert codec.decode(codec.encode(value)) == value
+
+
+def test_small_text_payload_stays_readable():
+    codec = CacheCodec(serializer="json", compressor="zlib", compress_threshold=1024)
+    raw = codec.encode(SMALL)
+    assert raw.startswith("TH1jn:")
+    assert json.loads(raw[len("TH1jn:"):]) == SMALL
+
+
+def test_large_payload_is_compressed():
+    codec = CacheCodec(serializer="json", compressor="zlib", compress_threshold=1024)
+    raw = codec.encode(LARGE)
+    assert raw.startswith("TH1jz:")
+    assert len(raw) < len(json.dumps(LARGE))
+    # The body must be plain base64 so the Upstash REST API can carry it
+    base64.b64decode(raw[len("TH1jz:"):], validate=True)
+
+
+def test_binary_serializer_below_threshold_is_base64():
+    if "m" not in SERIALIZERS:
+        pytest.skip("msgpack not installed")
+    codec = CacheCodec(serializer="msgpack", compressor="zlib", compress_threshold=1024)
+    raw = codec.encode(SMALL)
+    assert raw.startswith("TH1mn:")
+    assert codec.decode(raw) == SMALL
+
+
+def test_unknown_names_fall_back():
+    codec = CacheCodec(serializer="pickle", compressor="lz4")
+    assert codec.serializer_id in ("o", "j")
+    assert codec.compressor_id == "z"
+
+
+@pytest.mark.parametrize("value", [SMALL, [1, 2, 3], "plain", 7, None, {"value": 1, "ex": 60}])
+def test_legacy_plain_json(value):
+    assert CacheCodec().decode(json.dumps(value)) == value
+
+
+def test_legacy_upstash_wrapper_is_unwrapped():
+    raw = json.dumps({"value": json.dumps(SMALL), "ex": 86400})
+    assert CacheCodec().decode(raw) == SMALL
+
+
+def test_legacy_string_that_looks_like_a_header():
+    # Only an exact header counts; a cached string starting with "TH1" is legacy JSON
+    raw = json.dumps("TH1 is a header prefix")
+    assert CacheCodec().decode(raw) == "TH1 is a header prefix"
+
+
+def test_unsupported_encoding_raises():
+    with pytest.raises(ValueError):
+        CacheCodec().decode("TH1xn:{}")
@@ -0,0 +1,76 @@
+"""
+Query key tests - equivalent queries and price limits share a cache key
+"""
+
+import pytest
+
+from services.querykey import PRICE_BUCKETS, canonical_query, higher_buckets, price_bucket
+
+
+@pytest.mark.parametrize("variant", [
+    "lego technic",
+    "Technic LEGO",
+    "  lego   technic ",
+    "the lego technics",
+    "lego, technic!",
+    "LEGO technic technic",
+    "ＬＥＧＯ Ｔｅｃｈｎｉｃ",
+])
+def test_equivalent_queries_share_a_key(variant):
+    assert canonical_query(variant) == canonical_query("lego technic")
+
+
+def test_unicode_forms_compare_equal():
+    composed = "pok\u00e9mon cards"
+    decomposed = "poke\u0301mon cards"
+    assert canonical_query(composed) == canonical_query(decomposed)
+    assert canonical_query("STRASSE") == canonical_query("straße")
+
+
+def test_inner_punctuation_joins_words():
+    assert canonical_query("Dr. Martens") == canonical_query("dr. martens")
+    assert canonical_query("t-shirt") != canonical_query("t shirt")
+
+
+def test_different_queries_stay_apart():
+    assert canonical_query("lego technic") != canonical_query("lego city")
+    assert canonical_query("the") != canonical_query("a")
+
+
+def test_queries_without_words_keep_a_key():
+    assert canonical_query("!!!") == "!!!"
+    assert canonical_query("  ?  ? ") == "? ?"
+    assert canonical_query("!!!") != canonical_query("???")
+
+
+def test_canonical_query_is_idempotent():
+    for query in ("Vintage Cameras & Lenses", "the of", "ＬＥＧＯ", "£££"):
+        assert canonical_query(canonical_query(query)) == canonical_query(query)
+
+
+@pytest.mark.parametrize("max_price, bucket", [
+    (1, PRICE_BUCKETS[0]),
+    (PRICE_BUCKETS[0], PRICE_BUCKETS[0]),
+    (PRICE_BUCKETS[0] + 1, PRICE_BUCKETS[1]),
+    (PRICE_BUCKETS[-1], PRICE_BUCKETS[-1]),
+    (PRICE_BUCKETS[-1] + 1, 2 * PRICE_BUCKETS[-1]),
+    (3 * PRICE_BUCKETS[-1], 3 * PRICE_BUCKETS[-1]),
+])
+def test_price_bucket(max_price, bucket):
+    assert price_bucket(max_price) == bucket
+
+
+def test_price_bucket_rounds_up_monotonically():
+    previous = 0
+    for max_price in range(1, 3 * PRICE_BUCKETS[-1]):
+        bucket = price_bucket(max_price)
+        assert bucket >= max_price
+        assert bucket >= previous
+        # Every limit in a bucket maps to the same key as the ceiling itself
+        assert price_bucket(bucket) == bucket
+        previous = bucket
+
+
+def test_higher_buckets():
+    assert higher_buckets(PRICE_BUCKETS[0], 2) == list(PRICE_BUCKETS[1:3])
+    assert higher_buckets(PRICE_BUCKETS[-1], 2) == []
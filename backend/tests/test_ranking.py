@@ -0,0 +1,78 @@
+"""
+Ranking tests - columnar scoring agrees with a per-listing reference sort
+"""
+
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_ranking import make_listings, python_rank
+from services.ranking import ListingColumns, RankingWeights, rank_columns, rank_listings, top_k
+
+
+def _ids(listings):
+    return [listing.external_id for listing in listings]
+
+
+@pytest.mark.parametrize("count", [1, 7, 200, 2000])
+@pytest.mark.parametrize("k", [1, 10, 50, None])
+def test_rank_listings_matches_reference(count, k):
+    listings = make_listings(count, seed=count)
+    expected = python_rank(listings, k if k is not None else count)
+    assert _ids(rank_listings(listings, k)) == _ids(expected)
+
+
+def test_custom_weights_match_reference():
+    listings = make_listings(300, seed=3)
+    weights = RankingWeights(profit=0.5, margin=0.0, confidence=25.0, lot_size=-1.0, seller_repeat=0.0, price=-1.0, relevance=5.0)
+    assert _ids(rank_listings(listings, 25, weights=weights)) == _ids(python_rank(listings, 25, weights))
+
+
+def test_max_price_filters_before_selection():
+    listings = make_listings(500, seed=11)
+    # Seller repeats are counted over every candidate, filtered or not
+    expected = [
+        listing for listing in python_rank(listings, len(listings))
+        if listing.price_listed is None or listing.price_listed <= 40
+    ]
+    assert _ids(rank_listings(listings, 20, max_price=40)) == _ids(expected[:20])
+
+
+def test_unpriced_listings_go_last():
+    listings = make_listings(50, seed=5)
+    unpriced = replace(listings[0], external_id="unpriced", price_listed=None)
+    ranked = rank_listings([unpriced] + listings)
+    assert ranked[-1].external_id == "unpriced"
+
+
+def test_extend_and_take_match_a_fresh_build():
+    listings = make_listings(400, seed=9)
+    columns = ListingColumns(listings[:150])
+    columns.extend(listings[150:])
+    assert rank_columns(columns, 30).tolist() == rank_columns(ListingColumns(listings), 30).tolist()
+    
+    keep = rank_columns(columns, 100)
+    subset = [listings[index] for index in keep]
+    survivors = columns.take(keep)
+    assert [subset[index].external_id for index in rank_columns(survivors, 10)] == _ids(rank_listings(subset, 10))
+
+
+def test_empty_input():
+    assert rank_listings([]) == []
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 99, 100, 150, None])
+def test_top_k_matches_stable_sort(k):
+    rng = np.random.default_rng(1)
+    # Few distinct values, so ties are common
+    scores = rng.integers(0, 10, size=100).astype(np.float64)
+    expected = sorted(range(len(scores)), key=lambda index: -scores[index])
+    assert top_k(scores, k).tolist() == expected[:k]
+
+
+def test_top_k_respects_mask():
+    scores = np.array([5.0, 9.0, 1.0, 9.0, 7.0])
+    mask = np.array([True, False, True, True, True])
+    assert top_k(scores, 2, mask).tolist() == [3, 4]
+    assert top_k(scores, None, mask).tolist() == [3, 4, 0, 2]
@@ -0,0 +1,159 @@
+"""
+Retry tests - backoff bounds, retry budget accounting and request deadlines
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from services import retry
+from services.retry import RetryBudget, RetryPolicy, deadline, remaining, with_retry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(retry.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def fast_policy(monkeypatch):
+    monkeypatch.setitem(retry.RETRY_POLICIES, "test", RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002))
+    monkeypatch.setattr(retry, "retry_budget", RetryBudget(ratio=0.2, min_per_second=0.0, capacity=10))
+
+
+def test_backoff_upper_bound_doubles_until_capped(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=3.0)
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_is_jittered_within_bounds():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=3.0)
+    for attempt in (1, 2, 3, 10):
+        for _ in range(200):
+            assert 0.0 <= policy.backoff(attempt) <= min(3.0, 0.5 * 2 ** (attempt - 1))
+
+
+def test_backoff_honours_retry_after_up_to_max_delay(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: low)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=3.0)
+    assert policy.backoff(1, retry_after=2.0) == 2.0
+    assert policy.backoff(1, retry_after=3600.0) == 3.0
+    assert policy.backoff(1, retry_after=0.0) == 0.0
+
+
+def test_budget_spends_deposits_and_refills(clock):
+    budget = RetryBudget(ratio=0.5, min_per_second=1.0, capacity=2.0)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    
+    # Two first attempts earn one retry
+    budget.record_call()
+    budget.record_call()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    
+    # The time-based allowance refills, but never beyond capacity
+    clock.now += 1.0
+    assert budget.try_spend()
+    clock.now += 60.0
+    budget._refill()
+    assert budget.tokens == 2.0
+
+
+def test_deadline_nesting_only_shortens(clock):
+    assert remaining() is None
+    with deadline(10):
+        assert remaining() == 10
+        with deadline(30):
+            assert remaining() == 10
+        with deadline(4):
+            assert remaining() == 4
+            clock.now += 1.5
+            assert remaining() == 2.5
+        assert remaining() == 8.5
+    assert remaining() is None
+
+
+def test_retry_after_header_parsing():
+    assert retry._retry_after(httpx.Response(429, headers={"retry-after": "7"})) == 7.0
+    assert retry._retry_after(httpx.Response(429, headers={"retry-after": "-3"})) == 0.0
+    assert retry._retry_after(httpx.Response(429, headers={"retry-after": "soon"})) is None
+    assert retry._retry_after(httpx.Response(429)) is None
+
+
+def _responses(*statuses):
+    calls = []
+    
+    async def call():
+        calls.append(len(calls))
+        return httpx.Response(statuses[min(len(calls) - 1, len(statuses) - 1)])
+    
+    return call, calls
+
+
+def test_retries_transient_status(fast_policy):
+    call, calls = _responses(503, 502, 200)
+    response = asyncio.run(with_retry("test", call))
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_returns_last_response_when_attempts_run_out(fast_policy):
+    call, calls = _responses(503)
+    response = asyncio.run(with_retry("test", call))
+    assert response.status_code == 503
+    assert len(calls) == 3
+
+
+def test_non_idempotent_only_retries_rejections(fast_policy):
+    call, calls = _responses(500, 200)
+    assert asyncio.run(with_retry("test", call, idempotent=False)).status_code == 500
+    assert len(calls) == 1
+    
+    call, calls = _responses(429, 200)
+    assert asyncio.run(with_retry("test", call, idempotent=False)).status_code == 200
+    assert len(calls) == 2
+
+
+def test_empty_budget_fails_fast(fast_policy, monkeypatch):
+    monkeypatch.setattr(retry, "retry_budget", RetryBudget(ratio=0.0, min_per_second=0.0, capacity=0.0))
+    call, calls = _responses(503, 200)
+    assert asyncio.run(with_retry("test", call)).status_code == 503
+    assert len(calls) == 1
+
+
+def test_expired_deadline_skips_the_call(fast_policy):
+    call, calls = _responses(200)
+    
+    async def run():
+        with deadline(0):
+            return await with_retry("test", call)
+    
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert calls == []
+
+
+def test_deadline_cuts_a_slow_call(fast_policy):
+    async def slow():
+        await asyncio.sleep(5)
+    
+    async def run():
+        with deadline(0.05):
+            return await with_retry("test", slow)
+    
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())